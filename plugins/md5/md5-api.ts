@@ -1,9 +1,93 @@
 declare const require: any;
 declare const process: any;
 declare const module: any;
+declare const __dirname: string;
+declare const __filename: string;
+declare const Bun: any;
+declare const performance: any;
+declare type Buffer = any;
 
 const fs = require("fs");
-const md5_module = require("./md5.js");
+
+/**
+ * 加载 md5.js 的耗时和代码缓存的情况, serve 模式下发 info 请求可以拿到
+ * - cache: off (没开) / hit (用上了缓存) / miss (这次现编译, 顺便写了缓存) / bun (交给 bun 自己管)
+ */
+const load_info = { load_ms: 0, cache: "off" };
+
+/**
+ * 加载 md5.js
+ * 设置了 NAMER_CODE_CACHE 环境变量的话, 把 V8 的编译结果缓存到这个目录里, 下次启动不用重新编译
+ * - node 22+: 直接用 module.enableCompileCache
+ * - 更老的 node: 用 vm.Script 的 cachedData
+ * - bun: 外面会设置 BUN_RUNTIME_TRANSPILER_CACHE_PATH, 这里照常 require
+ * 目录由调用方按 md5.js 的 hash 区分, 这里只管读写
+ */
+function load_md5_module(): any {
+	const start = performance.now();
+	const path = require("path");
+	const node_module = require("module");
+	const md5_path = path.join(__dirname, "md5.js");
+	const cache_dir: string | undefined = process.env.NAMER_CODE_CACHE;
+	let loaded: any;
+
+	if (!cache_dir) {
+		loaded = require(md5_path);
+	} else if (typeof Bun !== "undefined") {
+		load_info.cache = "bun";
+		loaded = require(md5_path);
+	} else {
+		fs.mkdirSync(cache_dir, { recursive: true });
+		if (typeof node_module.enableCompileCache === "function") {
+			load_info.cache = fs.readdirSync(cache_dir).length > 0 ? "hit" : "miss";
+			node_module.enableCompileCache(cache_dir);
+			loaded = require(md5_path);
+		} else {
+			const vm = require("vm");
+			// 缓存只对同一个 V8 版本有效
+			const cache_path = path.join(cache_dir, `md5-${process.versions.v8}.cache`);
+			let cached_data: Buffer | undefined;
+			try {
+				cached_data = fs.readFileSync(cache_path);
+			} catch (e) {
+				cached_data = undefined;
+			}
+			const script = new vm.Script(node_module.wrap(fs.readFileSync(md5_path, "utf8")), {
+				filename: md5_path,
+				cachedData: cached_data,
+			});
+			const md5_module = new node_module(md5_path, module);
+			md5_module.filename = md5_path;
+			md5_module.paths = node_module._nodeModulePaths(__dirname);
+			script.runInThisContext()(
+				md5_module.exports,
+				node_module.createRequire(md5_path),
+				md5_module,
+				md5_path,
+				__dirname,
+			);
+			md5_module.loaded = true;
+			loaded = md5_module.exports;
+			if (cached_data !== undefined && !script.cachedDataRejected) {
+				load_info.cache = "hit";
+			} else {
+				load_info.cache = "miss";
+				// 先写到临时文件再改名, 免得几个进程同时启动的时候读到写了一半的缓存
+				const tmp_path = `${cache_path}.${process.pid}.tmp`;
+				try {
+					fs.writeFileSync(tmp_path, script.createCachedData());
+					fs.renameSync(tmp_path, cache_path);
+				} catch (e) {
+					// 写不了缓存不影响运行
+				}
+			}
+		}
+	}
+	load_info.load_ms = performance.now() - start;
+	return loaded;
+}
+
+const md5_module = load_md5_module();
 
 /**
  * 对战结果的数据结构
@@ -170,6 +254,294 @@ async function wrap_any(names: string, round: number): Promise<string> {
 	return output_str;
 }
 
+/**
+ * 按精度跑的时候, 至少要跑这么多轮才允许提前停
+ */
+const adaptive_min_round: number = 500;
+
+/**
+ * 输入是哪种模式, 和 md5.js 里 parse_names 的分队方式保持一致
+ * 有空行的话按空行分队, 否则一行一队
+ * - !test! + 1 队: 评分
+ * - !test! + 2 队: 胜率
+ */
+function bench_kind(names: string): "fight" | "win-rate" | "score" {
+	if (!test_check(names)) {
+		return "fight";
+	}
+	const lines = names.split(/\r?\n/).map((line) => line.trim());
+	while (lines.length > 0 && lines[lines.length - 1] === "") {
+		lines.pop();
+	}
+	let teams = lines.length;
+	if (lines.includes("")) {
+		teams = 0;
+		let in_team = false;
+		for (const line of lines) {
+			if (line === "") {
+				in_team = false;
+			} else if (!in_team) {
+				in_team = true;
+				teams += 1;
+			}
+		}
+	}
+	if (teams === 3) {
+		return "win-rate";
+	}
+	if (teams === 2) {
+		return "score";
+	}
+	return "fight";
+}
+
+/**
+ * 95% Wilson 置信区间
+ * @param success 成功次数
+ * @param total 总次数
+ * @returns [下界, 上界], 0~1
+ */
+function wilson_interval(success: number, total: number): [number, number] {
+	const z = 1.96;
+	const p = success / total;
+	const denom = 1 + (z * z) / total;
+	const center = (p + (z * z) / (2 * total)) / denom;
+	const half =
+		(z / denom) *
+		Math.sqrt((p * (1 - p)) / total + (z * z) / (4 * total * total));
+	return [Math.max(0, center - half), Math.min(1, center + half)];
+}
+
+/**
+ * 进度回调, 参数是一行和 wrap_any 里每 1000 轮那一行一样格式的文本
+ */
+type ProgressCallback = (checkpoint: string) => void;
+
+/**
+ * --json 模式下输出的结构化结果
+ */
+type BenchRecord = {
+	kind: "fight" | "win-rate" | "score";
+	/**
+	 * 给人看的文本, 和不加 --json 时的输出一样
+	 */
+	text: string;
+	/**
+	 * 对战的赢家
+	 */
+	winners?: string[];
+	/**
+	 * 胜率是百分比, 评分是万分比
+	 */
+	value?: number;
+	round?: number;
+	/**
+	 * [半宽, 下界, 上界], 单位和 value 一样, 只有按精度跑的时候有
+	 */
+	ci?: [number, number, number];
+	/**
+	 * 每 1000 轮的 [轮数, value]
+	 */
+	checkpoints?: [number, number][];
+};
+
+/**
+ * 一段分片的结果, 用来在外面拼回完整的胜率/评分
+ */
+type ShardRecord = {
+	kind: "win-rate" | "score";
+	/**
+	 * 这一段从整体的第几轮开始
+	 */
+	offset: number;
+	round: number;
+	/**
+	 * 这一段里每 100 轮累计的 胜场/分数
+	 */
+	counts: number[];
+};
+
+/**
+ * 只跑整体里 [offset, offset + round) 这一段
+ * 种子和从头连续跑的时候一样, 所以几段拼起来和一次跑完的结果完全一致
+ * @param names 原始的输入框输入
+ * @param offset 从整体的第几轮开始, 需要是 100 的倍数
+ * @param round 这一段跑多少轮, 需要是 100 的倍数
+ */
+async function shard_record(
+	names: string,
+	offset: number,
+	round: number,
+): Promise<ShardRecord> {
+	const kind = bench_kind(names);
+	if (kind === "fight") {
+		throw new Error("对战不能分片跑");
+	}
+	let finished = false;
+	const counts: number[] = [];
+	const callback = (run_round: number, count: number): boolean => {
+		if (finished) {
+			return true;
+		}
+		counts.push(count);
+		if (run_round >= round) {
+			finished = true;
+			return false;
+		}
+		return true;
+	};
+	md5_module.run_env.fight_only = false;
+	md5_module.run_env.bench_seed_offset = offset;
+	try {
+		if (kind === "win-rate") {
+			await win_rate_callback(names, callback);
+		} else {
+			await score_callback(names, callback);
+		}
+	} finally {
+		md5_module.run_env.bench_seed_offset = 0;
+	}
+	return { kind: kind, offset: offset, round: round, counts: counts };
+}
+
+/**
+ * 用回调的方式跑胜率/评分, 可以中途汇报进度, 也可以按精度提前停
+ * precision 为 0 时跑满 max_round 轮, 文本和 wrap_any 完全一样
+ * @param names 原始的输入框输入
+ * @param max_round 最多跑的轮数
+ * @param precision 目标的 95% 置信区间半宽, 单位是百分比, 0 表示不提前停
+ * @param on_progress 每 progress_every 轮调用一次
+ * @param progress_every 汇报进度的间隔轮数
+ * @returns 结构化的结果
+ */
+async function bench_record(
+	names: string,
+	max_round: number,
+	precision = 0,
+	on_progress?: ProgressCallback,
+	progress_every: number = out_limit,
+): Promise<BenchRecord> {
+	const kind = bench_kind(names);
+	if (kind === "fight") {
+		const result = await fight(names);
+		return {
+			kind: "fight",
+			text: `赢家:|${result.source_plr}|`,
+			winners: [result.source_plr],
+		};
+	}
+
+	// 胜率按百分比显示, 评分按万分比显示
+	const scale = kind === "win-rate" ? 100 : 10000;
+	const unit = kind === "win-rate" ? "%" : "";
+	const checkpoint_str = (round: number, count: number) =>
+		`${((count * scale) / round).toFixed(2)}${unit}(${round})`;
+
+	let finished = false;
+	let used = 0;
+	let success = 0;
+	const checkpoints: [number, number][] = [];
+	const callback = (run_round: number, count: number): boolean => {
+		// 上一次留下来的监听器不要再管事了
+		if (finished) {
+			return true;
+		}
+		used = run_round;
+		success = count;
+		if (run_round % out_limit === 0) {
+			checkpoints.push([run_round, count]);
+		}
+		if (run_round >= max_round) {
+			finished = true;
+			return false;
+		}
+		if (on_progress && progress_every > 0 && run_round % progress_every === 0) {
+			on_progress(checkpoint_str(run_round, count));
+		}
+		if (precision <= 0 || run_round < adaptive_min_round) {
+			return true;
+		}
+		const [low, high] = wilson_interval(count, run_round);
+		if (((high - low) / 2) * 100 > precision) {
+			return true;
+		}
+		finished = true;
+		return false;
+	};
+	if (kind === "win-rate") {
+		await win_rate_callback(names, callback);
+	} else {
+		await score_callback(names, callback);
+	}
+
+	const digits = kind === "win-rate" ? 4 : 2;
+	const value = (success * scale) / used;
+	let output_str =
+		kind === "win-rate"
+			? `最终胜率:|${value.toFixed(digits)}%|(${used}轮)`
+			: `分数:|${value.toFixed(digits)}|(${used}轮)`;
+	const record: BenchRecord = { kind: kind, text: "", value: value, round: used };
+
+	if (precision <= 0) {
+		// 和 wrap_any 保持一致
+		if (used > out_limit) {
+			checkpoints.forEach(([round, count]) => {
+				output_str += `\n${checkpoint_str(round, count)}`;
+			});
+		}
+	} else {
+		const [low, high] = wilson_interval(success, used);
+		const half = ((high - low) / 2) * scale;
+		record.ci = [half, low * scale, high * scale];
+		output_str += `\n置信区间:|±${half.toFixed(2)}${unit}|${(low * scale).toFixed(2)}${unit}~${(high * scale).toFixed(2)}${unit}|(${used}轮)`;
+		if (checkpoints.length === 0 || checkpoints[checkpoints.length - 1][0] !== used) {
+			checkpoints.push([used, success]);
+		}
+		checkpoints.forEach(([round, count]) => {
+			output_str += `\n${checkpoint_str(round, count)}`;
+		});
+	}
+	record.text = output_str;
+	record.checkpoints = checkpoints.map(([round, count]) => [
+		round,
+		(count * scale) / round,
+	]);
+	return record;
+}
+
+/**
+ * bench_record 的文本版本
+ * 对战输入直接按 wrap_any 处理
+ */
+async function wrap_bench(
+	names: string,
+	max_round: number,
+	precision = 0,
+	on_progress?: ProgressCallback,
+	progress_every: number = out_limit,
+): Promise<string> {
+	if (bench_kind(names) === "fight") {
+		return await wrap_any(names, max_round);
+	}
+	return (await bench_record(names, max_round, precision, on_progress, progress_every))
+		.text;
+}
+
+/**
+ * 按精度跑胜率/评分: 95% 置信区间的半宽小于 precision (百分比) 就提前停
+ * 最多跑 max_round 轮, 对战输入直接按 wrap_any 处理
+ * @param names 原始的输入框输入
+ * @param max_round 最多跑的轮数
+ * @param precision 目标半宽, 单位是百分比
+ */
+async function wrap_adaptive(
+	names: string,
+	max_round: number,
+	precision: number,
+): Promise<string> {
+	return await wrap_bench(names, max_round, precision);
+}
+
 async function read_stdin(): Promise<string> {
 	return await new Promise((resolve, reject) => {
 		let data = "";
@@ -182,34 +554,620 @@ async function read_stdin(): Promise<string> {
 	});
 }
 
-async function cli() {
-	const args = process.argv.slice(2);
-	const mode = args[0] || "any";
-	const round = Number.parseInt(args[1] || "10000", 10);
-	const input = args[2] ? fs.readFileSync(args[2], "utf8") : await read_stdin();
+/**
+ * 批量对战, 每一行是一个 "AAA+BBB+seed:123@!" 格式的对战, 空行会被跳过
+ * 每跑完一场就调用一次 on_result, 出错的那一场会返回 "错误: ..."
+ * @param lines 每一行的对战
+ * @param on_result 用于接收每一场结果的回调函数
+ */
+async function fight_batch(
+	lines: string[],
+	on_result: (winner: string) => void,
+): Promise<void> {
+	md5_module.run_env.fight_only = true;
+	for (const line of lines) {
+		if (line.trim() === "") {
+			continue;
+		}
+		try {
+			const result = await fight(line.split("+").join("\n"));
+			on_result(result.source_plr);
+		} catch (e) {
+			on_result(`错误: ${String(e).split("\n")[0]}`);
+		}
+	}
+}
+
+/**
+ * 常驻进程收到的请求, 一行一个 JSON
+ */
+type WorkerRequest = {
+	id: number;
+	mode: string;
+	round?: number;
+	input?: string;
+	precision?: number;
+	/**
+	 * 每跑这么多轮就回一条进度, 0 或者不填表示不要进度
+	 */
+	progress?: number;
+	/**
+	 * 为 true 时 output 是 JSON.stringify 过的 BenchRecord
+	 */
+	json?: boolean;
+	/**
+	 * shard 模式下从整体的第几轮开始
+	 */
+	offset?: number;
+};
+
+/**
+ * 常驻进程的回复, 一行一个 JSON
+ */
+type WorkerResponse = {
+	id: number;
+	ok: boolean;
+	output?: string;
+	error?: string;
+	/**
+	 * 有这个字段的是中途的进度, 后面还会有最终结果
+	 */
+	progress?: string;
+	/**
+	 * agent 因为超时杀掉了子进程
+	 */
+	timeout?: boolean;
+};
+
+/**
+ * 按模式运行一次, 返回结构化的结果
+ * @param mode fight / score / win-rate / any
+ * @param input 原始的输入框输入
+ * @param round 战斗的回合数 (按精度跑的时候是最多的回合数)
+ * @param precision any 模式下的目标置信区间半宽 (百分比), 0 表示跑满 round
+ * @param on_progress any 模式下的进度回调
+ * @param progress_every 汇报进度的间隔轮数
+ */
+async function run_record(
+	mode: string,
+	input: string,
+	round: number,
+	precision = 0,
+	on_progress?: ProgressCallback,
+	progress_every: number = out_limit,
+): Promise<BenchRecord> {
+	md5_module.run_env.fight_only = mode === "fight";
 
 	if (mode === "fight") {
-		md5_module.run_env.fight_only = true;
 		const result = await fight(input);
-		console.log(result.source_plr);
-		return;
+		return { kind: "fight", text: result.source_plr, winners: [result.source_plr] };
 	}
 
 	if (mode === "score") {
 		const result = await score(input, round);
-		const win_rate = ((result.score * 10000) / round).toFixed(2);
-		console.log(`分数:|${win_rate}|(${round}轮)`);
-		return;
+		const value = (result.score * 10000) / round;
+		return {
+			kind: "score",
+			text: `分数:|${value.toFixed(2)}|(${round}轮)`,
+			value: value,
+			round: round,
+		};
 	}
 
 	if (mode === "win-rate") {
 		const result = await win_rate(input, round);
-		const rate = ((result.win_count * 100) / round).toFixed(4);
-		console.log(`最终胜率:|${rate}%|(${round}轮)`);
+		const value = (result.win_count * 100) / round;
+		return {
+			kind: "win-rate",
+			text: `最终胜率:|${value.toFixed(4)}%|(${round}轮)`,
+			value: value,
+			round: round,
+		};
+	}
+
+	return await bench_record(input, round, precision, on_progress, progress_every);
+}
+
+/**
+ * 按模式运行一次, 返回和命令行模式一样的输出
+ * @param mode fight / fight-batch / score / win-rate / any
+ * @param input 原始的输入框输入
+ * @param round 战斗的回合数 (按精度跑的时候是最多的回合数)
+ * @param precision any 模式下的目标置信区间半宽 (百分比), 0 表示跑满 round
+ * @param on_progress any 模式下的进度回调
+ * @param progress_every 汇报进度的间隔轮数
+ * @param json 为 true 时返回 JSON 格式的 BenchRecord (fight-batch 本来就是一行一个赢家, 不受影响)
+ * @param offset shard 模式下从整体的第几轮开始, shard 模式总是返回 JSON 格式的 ShardRecord
+ */
+async function run_mode(
+	mode: string,
+	input: string,
+	round: number,
+	precision = 0,
+	on_progress?: ProgressCallback,
+	progress_every: number = out_limit,
+	json = false,
+	offset = 0,
+): Promise<string> {
+	if (mode === "shard") {
+		return JSON.stringify(await shard_record(input, offset, round));
+	}
+
+	if (mode === "fight-batch") {
+		const winners: string[] = [];
+		await fight_batch(input.split("\n"), (winner) => winners.push(winner));
+		return winners.join("\n");
+	}
+
+	if (!json && mode === "any" && !(precision > 0 || on_progress)) {
+		md5_module.run_env.fight_only = false;
+		return await wrap_any(input, round);
+	}
+	const record = await run_record(
+		mode,
+		input,
+		round,
+		precision,
+		on_progress,
+		progress_every,
+	);
+	return json ? JSON.stringify(record) : record.text;
+}
+
+function write_response(response: WorkerResponse) {
+	process.stdout.write(`${JSON.stringify(response)}\n`);
+}
+
+/**
+ * 常驻模式: 从 stdin 一行读一个请求, 往 stdout 一行写一个回复
+ * md5.js 里面有全局状态, 所以请求是一个一个按顺序跑的
+ */
+async function serve(): Promise<void> {
+	const readline = require("readline");
+	const rl = readline.createInterface({ input: process.stdin, terminal: false });
+	let chain: Promise<void> = Promise.resolve();
+
+	const handle = async (line: string) => {
+		let request: WorkerRequest;
+		try {
+			request = JSON.parse(line);
+		} catch (e) {
+			write_response({ id: -1, ok: false, error: `无法解析请求: ${e}` });
+			return;
+		}
+		if (request.mode === "ping") {
+			write_response({ id: request.id, ok: true, output: "pong" });
+			return;
+		}
+		if (request.mode === "info") {
+			write_response({ id: request.id, ok: true, output: JSON.stringify(load_info) });
+			return;
+		}
+		if (request.mode === "exit") {
+			rl.close();
+			return;
+		}
+		const on_progress = request.progress
+			? (checkpoint: string) =>
+					write_response({ id: request.id, ok: true, progress: checkpoint })
+			: undefined;
+		try {
+			const output = await run_mode(
+				request.mode,
+				request.input || "",
+				request.round || 10000,
+				request.precision || 0,
+				on_progress,
+				request.progress || out_limit,
+				request.json || false,
+				request.offset || 0,
+			);
+			write_response({ id: request.id, ok: true, output: output });
+		} catch (e) {
+			const error = e instanceof Error ? e.stack || e.message : String(e);
+			write_response({ id: request.id, ok: false, error: error });
+		}
+	};
+
+	rl.on("line", (line: string) => {
+		if (line.trim() === "") {
+			return;
+		}
+		chain = chain.then(() => handle(line));
+	});
+
+	await new Promise((resolve) => rl.on("close", resolve));
+	await chain;
+}
+
+/**
+ * agent 模式下挂着的一个 serve 子进程
+ */
+type AgentChild = {
+	proc: any;
+	pending: Map<number, (response: WorkerResponse) => void>;
+	dead: boolean;
+};
+
+/**
+ * 发给 agent 的请求
+ * engine 为 namerena 时其余字段和 WorkerRequest 一样, 为 tswn 时用 args + input
+ */
+type AgentRequest = Partial<WorkerRequest> & {
+	engine?: "namerena" | "tswn";
+	args?: string[];
+	/**
+	 * 超时 (秒), 超时就杀掉子进程, 不填表示不限
+	 */
+	timeout?: number;
+};
+
+/**
+ * tswn-cli 里允许远程调用的子命令
+ */
+const agent_tswn_modes = ["fight", "raw", "namer-pf"];
+
+/**
+ * 请求体最大字节数, 超过直接 413
+ */
+const agent_max_body = 4 * 1024 * 1024;
+
+/**
+ * tswn 的轮数上限, 和本地 /namer-pf 的上限一个量级就够了
+ */
+const agent_max_tswn_rounds = 1000000;
+
+/**
+ * 检查子命令后面的参数, 只认 "-n 轮数" 和 "--json", 返回错误信息, 没问题返回 null
+ */
+function check_tswn_args(args: string[]): string | null {
+	for (let i = 1; i < args.length; i++) {
+		if (args[i] === "--json") {
+			continue;
+		}
+		if (args[i] === "-n" && i + 1 < args.length && /^[0-9]+$/.test(args[i + 1])) {
+			const rounds = Number.parseInt(args[i + 1], 10);
+			if (rounds > 0 && rounds <= agent_max_tswn_rounds) {
+				i++;
+				continue;
+			}
+		}
+		return `不支持的 tswn 参数: ${args[i]}`;
+	}
+	return null;
+}
+
+/**
+ * 只在回环地址上监听的话可以不要 token
+ */
+function is_loopback(host: string): boolean {
+	return host === "localhost" || host === "::1" || host.startsWith("127.");
+}
+
+/**
+ * 远程 agent: 一个 HTTP 服务, 下面挂 workers 个 serve 子进程, 同时最多跑 workers 个请求
+ * - GET /info: {capacity, md5_hash, runtime, tswn}
+ * - POST /run: AgentRequest, 回复 {ok, output?, error?}
+ * 设置了 token 的话请求头里要带 X-Namer-Token
+ * @param port 监听的端口, 0 表示随便挑一个
+ * @param host 监听的地址, 不是回环地址的话必须设置 token
+ * @param workers 子进程数量
+ * @param token 共享密钥, 空字符串表示不检查 (只允许回环地址)
+ * @param tswn_path tswn-cli 的路径, 空字符串表示不提供 tswn
+ */
+async function agent(
+	port: number,
+	host: string,
+	workers: number,
+	token: string,
+	tswn_path: string,
+): Promise<void> {
+	if (!token && !is_loopback(host)) {
+		throw new Error(`在 ${host} 上监听必须设置 --token, 不然谁都能提交任务`);
+	}
+	const http = require("http");
+	const path = require("path");
+	const crypto = require("crypto");
+	const readline = require("readline");
+	const child_process = require("child_process");
+
+	const md5_hash = crypto
+		.createHash("sha256")
+		.update(fs.readFileSync(path.join(__dirname, "md5.js")))
+		.digest("hex");
+	const runtime =
+		typeof Bun !== "undefined" ? `bun ${Bun.version}` : `node ${process.version}`;
+	let tswn_version: string | null = null;
+	if (tswn_path) {
+		try {
+			tswn_version = child_process
+				.execFileSync(tswn_path, ["--version"], {
+					encoding: "utf8",
+					// 卡住的 tswn-cli 不能让 agent 起不来
+					timeout: 10000,
+					killSignal: "SIGKILL",
+				})
+				.trim()
+				.replace(/^tswn-cli /, "");
+		} catch (e) {
+			console.error(`tswn-cli 不可用: ${e}`);
+		}
+	}
+
+	let next_id = 0;
+	const children: AgentChild[] = [];
+	const idle: AgentChild[] = [];
+	const waiters: ((child: AgentChild) => void)[] = [];
+
+	const spawn_child = (): AgentChild => {
+		const proc = child_process.spawn(process.execPath, [__filename, "serve"], {
+			stdio: ["pipe", "pipe", "inherit"],
+		});
+		const child: AgentChild = { proc: proc, pending: new Map(), dead: false };
+		readline.createInterface({ input: proc.stdout }).on("line", (line: string) => {
+			let response: WorkerResponse;
+			try {
+				response = JSON.parse(line);
+			} catch (e) {
+				return;
+			}
+			if (response.progress !== undefined) {
+				return;
+			}
+			const resolve = child.pending.get(response.id);
+			if (resolve) {
+				child.pending.delete(response.id);
+				resolve(response);
+			}
+		});
+		proc.on("exit", () => {
+			// 子进程挂了, 手上的请求直接报错, 下次用的时候换一个新的
+			child.dead = true;
+			for (const resolve of child.pending.values()) {
+				resolve({ id: -1, ok: false, error: "子进程意外退出" });
+			}
+			child.pending.clear();
+		});
+		children.push(child);
+		return child;
+	};
+
+	const acquire = (): Promise<AgentChild> =>
+		new Promise((resolve) => {
+			const child = idle.pop();
+			if (child) {
+				resolve(child);
+			} else {
+				waiters.push(resolve);
+			}
+		});
+
+	const release = (child: AgentChild) => {
+		const usable = child.dead ? spawn_child() : child;
+		const waiter = waiters.shift();
+		if (waiter) {
+			waiter(usable);
+		} else {
+			idle.push(usable);
+		}
+	};
+
+	const run_namerena = (child: AgentChild, request: AgentRequest) =>
+		new Promise<WorkerResponse>((resolve) => {
+			const id = ++next_id;
+			const { engine, args, timeout, ...rest } = request;
+			let timer: any = null;
+			child.pending.set(id, (response: WorkerResponse) => {
+				if (timer) {
+					clearTimeout(timer);
+				}
+				resolve(response);
+			});
+			if (timeout && timeout > 0) {
+				timer = setTimeout(() => {
+					// 卡住了: 杀掉子进程, 归还的时候会换一个新的
+					child.pending.delete(id);
+					child.dead = true;
+					child.proc.kill("SIGKILL");
+					resolve({ id: id, ok: false, error: `超时 (${timeout}s)`, timeout: true });
+				}, timeout * 1000);
+			}
+			child.proc.stdin.write(`${JSON.stringify({ ...rest, id: id })}\n`);
+		});
+
+	const run_tswn = (args: string[], input: string, timeout?: number) =>
+		new Promise<WorkerResponse>((resolve) => {
+			const proc = child_process.spawn(tswn_path, args, {
+				stdio: ["pipe", "pipe", "pipe"],
+			});
+			let timed_out = false;
+			const timer =
+				timeout && timeout > 0
+					? setTimeout(() => {
+							timed_out = true;
+							proc.kill("SIGKILL");
+						}, timeout * 1000)
+					: null;
+			let stdout = "";
+			let stderr = "";
+			proc.stdout.setEncoding("utf8");
+			proc.stderr.setEncoding("utf8");
+			proc.stdout.on("data", (chunk: string) => {
+				stdout += chunk;
+			});
+			proc.stderr.on("data", (chunk: string) => {
+				stderr += chunk;
+			});
+			proc.on("error", (e: unknown) => resolve({ id: 0, ok: false, error: String(e) }));
+			proc.on("close", (code: number) => {
+				if (timer) {
+					clearTimeout(timer);
+				}
+				if (timed_out) {
+					resolve({ id: 0, ok: false, error: `超时 (${timeout}s)`, timeout: true });
+					return;
+				}
+				resolve(
+					code === 0
+						? { id: 0, ok: true, output: stdout }
+						: { id: 0, ok: false, error: stderr || stdout },
+				);
+			});
+			proc.stdin.end(input);
+		});
+
+	const handle = async (request: AgentRequest): Promise<WorkerResponse> => {
+		if (request.engine === "tswn") {
+			const args = request.args || [];
+			if (!tswn_version) {
+				return { id: 0, ok: false, error: "这个 agent 没有 tswn-cli" };
+			}
+			if (!agent_tswn_modes.includes(args[0])) {
+				return { id: 0, ok: false, error: `不支持的 tswn 命令: ${args[0]}` };
+			}
+			const error = check_tswn_args(args);
+			if (error) {
+				return { id: 0, ok: false, error: error };
+			}
+		}
+		let child = await acquire();
+		try {
+			if (child.dead) {
+				child = spawn_child();
+			}
+			if (request.engine === "tswn") {
+				return await run_tswn(request.args || [], request.input || "", request.timeout);
+			}
+			return await run_namerena(child, request);
+		} finally {
+			release(child);
+		}
+	};
+
+	for (let i = 0; i < workers; i++) {
+		idle.push(spawn_child());
+	}
+	process.on("exit", () => {
+		for (const child of children) {
+			child.proc.kill();
+		}
+	});
+
+	const server = http.createServer((req: any, res: any) => {
+		const reply = (status: number, body: object) => {
+			res.writeHead(status, { "Content-Type": "application/json" });
+			res.end(JSON.stringify(body));
+		};
+		if (token && req.headers["x-namer-token"] !== token) {
+			reply(403, { ok: false, error: "token 不对" });
+			return;
+		}
+		if (req.method === "GET" && req.url === "/info") {
+			reply(200, {
+				capacity: workers,
+				md5_hash: md5_hash,
+				runtime: runtime,
+				tswn: tswn_version,
+			});
+			return;
+		}
+		if (req.method !== "POST" || req.url !== "/run") {
+			reply(404, { ok: false, error: "没有这个接口" });
+			return;
+		}
+		let body = "";
+		let size = 0;
+		let too_large = false;
+		req.setEncoding("utf8");
+		req.on("data", (chunk: string) => {
+			if (too_large) {
+				return;
+			}
+			size += Buffer.byteLength(chunk);
+			if (size > agent_max_body) {
+				too_large = true;
+				reply(413, { ok: false, error: `请求太大, 上限 ${agent_max_body} 字节` });
+				req.destroy();
+				return;
+			}
+			body += chunk;
+		});
+		req.on("end", async () => {
+			if (too_large) {
+				return;
+			}
+			let request: AgentRequest;
+			try {
+				request = JSON.parse(body);
+			} catch (e) {
+				reply(400, { ok: false, error: `无法解析请求: ${e}` });
+				return;
+			}
+			const response = await handle(request);
+			reply(200, {
+				ok: response.ok,
+				output: response.output,
+				error: response.error,
+				timeout: response.timeout,
+			});
+		});
+	});
+	await new Promise((resolve) => server.listen(port, host, resolve));
+	console.log(`namer-agent listening on ${host}:${server.address().port}`);
+}
+
+async function cli() {
+	// --precision=0.5 这种参数单独拿出来, 剩下的按位置来
+	const flags = process.argv.slice(2).filter((arg: string) => arg.startsWith("--"));
+	const args = process.argv.slice(2).filter((arg: string) => !arg.startsWith("--"));
+	const mode = args[0] || "any";
+	const precision_flag = flags.find((arg: string) => arg.startsWith("--precision="));
+	const precision = precision_flag
+		? Number.parseFloat(precision_flag.slice("--precision=".length))
+		: 0;
+	const json = flags.includes("--json");
+	const offset_flag = flags.find((arg: string) => arg.startsWith("--offset="));
+	const offset = offset_flag
+		? Number.parseInt(offset_flag.slice("--offset=".length), 10)
+		: 0;
+
+	if (mode === "serve") {
+		await serve();
+		process.exit(0);
+	}
+
+	if (mode === "agent") {
+		const flag = (name: string, fallback: string) => {
+			const found = flags.find((arg: string) => arg.startsWith(`--${name}=`));
+			return found ? found.slice(name.length + 3) : fallback;
+		};
+		if (flags.includes("--watch-stdin")) {
+			// 本机起的 agent: 父进程没了就跟着退出
+			process.stdin.on("end", () => process.exit(0));
+			process.stdin.resume();
+		}
+		await agent(
+			Number.parseInt(flag("port", "9400"), 10),
+			flag("host", "127.0.0.1"),
+			Number.parseInt(flag("workers", String(require("os").cpus().length)), 10),
+			flag("token", ""),
+			flag("tswn", ""),
+		);
+		return;
+	}
+
+	const round = Number.parseInt(args[1] || "10000", 10);
+	const input = args[2] ? fs.readFileSync(args[2], "utf8") : await read_stdin();
+
+	if (mode === "fight-batch") {
+		// 跑完一场就输出一行
+		await fight_batch(input.split("\n"), (winner) => console.log(winner));
 		return;
 	}
 
-	console.log(await wrap_any(input, round));
+	console.log(
+		await run_mode(mode, input, round, precision, undefined, out_limit, json, offset),
+	);
 }
 
 if (require.main === module) {
@@ -227,6 +1185,13 @@ export {
 	type Score,
 	type ScoreResult,
 	type ScoreCallback,
+	type WorkerRequest,
+	type WorkerResponse,
+	type ProgressCallback,
+	type BenchRecord,
+	type ShardRecord,
+	type AgentRequest,
+	check_tswn_args,
 	fight,
 	win_rate,
 	win_rate_callback,
@@ -234,4 +1199,16 @@ export {
 	score_callback,
 	run_any,
 	wrap_any,
+	wrap_bench,
+	wrap_adaptive,
+	bench_record,
+	shard_record,
+	run_record,
+	wilson_interval,
+	bench_kind,
+	fight_batch,
+	run_mode,
+	serve,
+	agent,
+	load_info,
 };
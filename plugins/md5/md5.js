@@ -58,6 +58,11 @@ let run_env = {
      * 是否抓取对战过程日志 (仅代码运行模式)
      */
     capture_fight_log: false,
+    /**
+     * 胜率/评分从第几轮开始跑 (仅代码运行模式)
+     * 用于把一次测号拆成几段分开跑, 每段的种子和从头连续跑的时候一样
+     */
+    bench_seed_offset: 0,
 };
 
 /**
@@ -13018,7 +13023,8 @@ L.ProfileWinChance.prototype = {
                         break
                     }
                     h = H.b([m, l, [H.b([H.as_string("seed:") + this_.d++, "!"], k)]], j)
-                    if (this_.z === 0) h.pop()
+                    // 只有整体的第一轮不带种子
+                    if (this_.z === 0 && !this_.seed_offset) h.pop()
                     async_goto = 5
                     return P._asyncAwait(T.start_main(h), $async$O)
                 case 5:
@@ -22544,6 +22550,11 @@ function main(input_name) {
                             profiler = new V.ProfileMain(team_2, team_1, a3, a4, a5, P.cu(t.X, t.B), new Float64Array(1))
                             profiler.dZ(team_1, team_2)
                             profiler.d = 1000
+                            if (run_env.from_code && run_env.bench_seed_offset) {
+                                // 每轮要用掉的对手数, 和 O() 里面一样
+                                let per_round = profiler.b.length === 1 && !profiler.c ? 3 : profiler.b.length
+                                profiler.e += run_env.bench_seed_offset * per_round
+                            }
 
                             c = HtmlRenderer.outer_main(profiler)
 
@@ -22565,6 +22576,10 @@ function main(input_name) {
                         profiler = new L.ProfileWinChance(team_1, team_2, a4, a3, a5, a6, new Float64Array(1))
                         profiler.dY(team_1, team_2)
                         profiler.c = 1000
+                        if (run_env.from_code && run_env.bench_seed_offset) {
+                            profiler.seed_offset = run_env.bench_seed_offset
+                            profiler.d += run_env.bench_seed_offset
+                        }
 
                         a = HtmlRenderer.outer_main(profiler)
 
@@ -1,4 +1,14 @@
 import io
+from array import array
+from functools import lru_cache
+
+try:
+    # 可选依赖, 不在 requirements.txt 里: 只有 load_many 用来批量加速, 没有的话逐个算, 结果一样
+    import numpy as np
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
 
 sklname = [
     "火球术",
@@ -56,87 +66,165 @@ prop_names = [
 ]
 
 
+def split_name(raw_name: str) -> list[str]:
+    """拆成 [名字, "@", 战队名], 没写战队的时候战队名就是名字"""
+    if raw_name == "":
+        raise ValueError("错误：输入不能为空。")
+    if raw_name.count("@") > 1:
+        raise ValueError("错误：无法分割名字与战队名，请检查输入。")
+    name_lst = list(raw_name.rpartition("@"))
+    if len(name_lst[0]) > 256 or len(name_lst[2]) > 256:
+        raise ValueError("错误：名字或战队名长度过大。")
+    if name_lst[1] == "@":
+        if name_lst[2] == "":
+            name_lst[2] = name_lst[0]
+    else:
+        name_lst[0] = name_lst[2]
+    return name_lst
+
+
+TEAM_CACHE_SIZE = 1024
+"""
+战队那一遍打乱只和战队名有关, 最近用过的这么多个战队的结果留着
+"""
+
+
+@lru_cache(maxsize=TEAM_CACHE_SIZE)
+def team_key_schedule(team_bytes: bytes) -> bytes:
+    """从 0~255 开始, 用战队名打乱一遍, 后面两遍名字的打乱从这个结果的拷贝开始"""
+    team_str = [0, *team_bytes]
+    team_len = len(team_str)
+    val = bytearray(range(256))
+    s = 0
+    for i in range(256):
+        s += team_str[i % team_len] + val[i]
+        s %= 256
+        val[i], val[s] = val[s], val[i]
+    return bytes(val)
+
+
+def padded_str(raw: str) -> bytearray:
+    """第 0 位是 0, 后面接上 utf-8, 补 0 到 256 位"""
+    data = raw.encode(encoding="utf-8")
+    return bytearray(b"\0" + data + b"\0" * (255 - len(data)))
+
+
 class Player:
+    """
+    打乱的结果 val 和 name_base 存在 bytearray 里
+    name_prop / skl_id / skl_freq 第一次用到的时候才算, 算完留着
+    """
+
+    __slots__ = (
+        "name",
+        "team",
+        "val",
+        "name_base",
+        "name_len",
+        "team_len",
+        "_name_prop",
+        "_skl_id",
+        "_skl_freq",
+    )
+
     def __init__(self) -> None:
         self.name = ""
         self.team = ""
-        self.val = [i for i in range(0, 256)]
-        self.name_base = [0] * 128
-        self.name_str = [0] * 256
-        self.team_str = [0] * 256
+        self.val = bytearray(range(256))
+        self.name_base = bytearray(128)
         self.name_len = 0
         self.team_len = 0
-        self.name_prop = [0] * 8
-        self.skl_id = [i for i in range(0, 40)]
-        self.skl_freq = [0] * 40
+        self._name_prop: array | None = array("H", [0] * 8)
+        self._skl_id: bytearray | None = bytearray(range(40))
+        self._skl_freq: bytearray | None = bytearray(40)
+
+    @property
+    def name_str(self) -> bytearray:
+        return padded_str(self.name)
+
+    @property
+    def team_str(self) -> bytearray:
+        return padded_str(self.team)
+
+    @property
+    def name_prop(self) -> array:
+        if self._name_prop is None:
+            self._name_prop = self._calc_props()
+        return self._name_prop
+
+    @property
+    def skl_id(self) -> bytearray:
+        if self._skl_id is None:
+            self._calc_skills()
+        return self._skl_id  # type: ignore
+
+    @property
+    def skl_freq(self) -> bytearray:
+        if self._skl_freq is None:
+            self._calc_skills()
+        return self._skl_freq  # type: ignore
 
     def load(self, raw_name: str):
-        if raw_name == "":
-            print("错误：输入不能为空。")
-            return False
-        if raw_name.count("@") > 1:
-            print("错误：无法分割名字与战队名，请检查输入。")
+        try:
+            name_lst = split_name(raw_name)
+        except ValueError as e:
+            print(e)
             return False
-        name_lst = list(raw_name.rpartition("@"))
-        if len(name_lst[0]) > 256 or len(name_lst[2]) > 256:
-            print("错误：名字或战队名长度过大。")
-            return False
-        if name_lst[1] == "@":
-            if name_lst[2] == "":
-                name_lst[2] = name_lst[0]
-        else:
-            name_lst[0] = name_lst[2]
         name_bytes = name_lst[0].encode(encoding="utf-8")
         team_bytes = name_lst[2].encode(encoding="utf-8")
+        # name_str / team_str 只有 256 位, 第 0 位固定是 0
+        if len(name_bytes) > 255 or len(team_bytes) > 255:
+            print("错误：名字或战队名长度过大。")
+            return False
         self.name = name_lst[0]
         self.team = name_lst[2]
-        self.name_len = len(name_bytes)
-        self.team_len = len(team_bytes)
-        for i in range(self.name_len):
-            self.name_str[i + 1] = name_bytes[i]
-        for i in range(self.team_len):
-            self.team_str[i + 1] = team_bytes[i]
-        self.name_len += 1
-        self.team_len += 1
-
-        s = 0
-        for i in range(256):
-            s += self.team_str[i % self.team_len] + self.val[i]
-            s %= 256
-            self.val[i], self.val[s] = self.val[s], self.val[i]
+        self.name_len = len(name_bytes) + 1
+        self.team_len = len(team_bytes) + 1
+        name_str = [0, *name_bytes]
 
+        # 在 list 上打乱比 bytearray 快, 打乱完再存成 bytearray
+        val = list(team_key_schedule(team_bytes))
         for i in range(2):
             s = 0
             for j in range(256):
-                s += self.name_str[j % self.name_len] + self.val[j]
+                s += name_str[j % self.name_len] + val[j]
                 s %= 256
-                self.val[j], self.val[s] = self.val[s], self.val[j]
-        s = 0
+                val[j], val[s] = val[s], val[j]
+        self.val = bytearray(val)
+        name_base = []
         for i in range(256):
-            m = ((self.val[i] * 181) + 160) % 256
+            m = ((val[i] * 181) + 160) % 256
             if m >= 89 and m < 217:
-                self.name_base[s] = m & 63
-                s += 1
+                name_base.append(m & 63)
+        self.name_base = bytearray(name_base)
+
+        self._name_prop = None
+        self._skl_id = None
+        self._skl_freq = None
+        return True
 
+    def _calc_props(self) -> array:
+        name_prop = array("H", [0] * 8)
         propcnt = 0
-        r = self.name_base[0:32]
+        r = list(self.name_base[0:32])
         for i in range(10, 31, 3):
             r[i : i + 3] = sorted(r[i : i + 3])
-            self.name_prop[propcnt] = r[i + 1]
+            name_prop[propcnt] = r[i + 1]
             propcnt += 1
         r[0:10] = sorted(r[0:10])
-        self.name_prop[propcnt] = 154
+        name_prop[propcnt] = 154
         propcnt += 1
         for i in range(3, 7):
-            self.name_prop[propcnt - 1] += r[i]
+            name_prop[propcnt - 1] += r[i]
         for i in range(7):
-            self.name_prop[i] += 36
+            name_prop[i] += 36
+        return name_prop
 
-        self.skl_id = list(range(0, 40))
-        self.skl_freq = [0] * 40
+    def _calc_skills(self) -> None:
+        skl_id = bytearray(range(40))
+        skl_freq = bytearray(40)
         a = b = 0
-        randbase = []
-        randbase[:] = self.val[:]
+        randbase = list(self.val)
 
         def randgen():
             def m():
@@ -152,8 +240,8 @@ class Player:
         for i in range(2):
             for j in range(40):
                 rand = randgen()
-                s = (s + rand + self.skl_id[j]) % 40
-                self.skl_id[j], self.skl_id[s] = self.skl_id[s], self.skl_id[j]
+                s = (s + rand + skl_id[j]) % 40
+                skl_id[j], skl_id[s] = skl_id[s], skl_id[j]
         last = -1
         j = 0
         for i in range(64, 128, 4):
@@ -166,22 +254,19 @@ class Player:
                 )
                 % 256
             )
-            if p > 10 and self.skl_id[j] < 35:
-                self.skl_freq[j] = p - 10
-                if self.skl_id[j] < 25:
+            if p > 10 and skl_id[j] < 35:
+                skl_freq[j] = p - 10
+                if skl_id[j] < 25:
                     last = j
             j += 1
         if last != -1:
-            self.skl_freq[last] *= 2
-        if self.skl_freq[14] > 0 and last != 14:
-            self.skl_freq[14] += min(
-                self.name_base[60], self.name_base[61], self.skl_freq[14]
-            )
-        if self.skl_freq[15] > 0 and last != 15:
-            self.skl_freq[15] += min(
-                self.name_base[62], self.name_base[63], self.skl_freq[15]
-            )
-        return True
+            skl_freq[last] *= 2
+        if skl_freq[14] > 0 and last != 14:
+            skl_freq[14] += min(self.name_base[60], self.name_base[61], skl_freq[14])
+        if skl_freq[15] > 0 and last != 15:
+            skl_freq[15] += min(self.name_base[62], self.name_base[63], skl_freq[15])
+        self._skl_id = skl_id
+        self._skl_freq = skl_freq
 
     def display(self) -> str:
         cache = io.StringIO()
@@ -206,3 +291,171 @@ class Player:
             )
         )
         return cache.getvalue()
+
+
+LOAD_BATCH_SIZE = 2048
+"""
+load_many 每次向量化算这么多个, 太大了反而被建 Player 的列表拖慢
+"""
+
+
+def load_many(raw_names: list[str]) -> list[Player | None]:
+    """
+    一次算一批名字, 结果和逐个 Player().load 完全一样, 解析不了的位置是 None
+    有 numpy 的时候把每一步都摊到整批名字上一起算, 没有就逐个算
+    """
+    if not HAS_NUMPY:
+        return [_load_one(raw_name) for raw_name in raw_names]
+    results: list[Player | None] = []
+    for start in range(0, len(raw_names), LOAD_BATCH_SIZE):
+        results.extend(_load_batch(raw_names[start : start + LOAD_BATCH_SIZE]))
+    return results
+
+
+def _load_batch(raw_names: list[str]) -> list[Player | None]:
+    results: list[Player | None] = [None] * len(raw_names)
+    indexes: list[int] = []
+    names: list[tuple[str, str, bytes, bytes]] = []
+    for index, raw_name in enumerate(raw_names):
+        try:
+            name, _, team = split_name(raw_name)
+        except ValueError:
+            continue
+        name_bytes = name.encode(encoding="utf-8")
+        team_bytes = team.encode(encoding="utf-8")
+        if len(name_bytes) > 255 or len(team_bytes) > 255:
+            continue
+        indexes.append(index)
+        names.append((name, team, name_bytes, team_bytes))
+    if not names:
+        return results
+
+    # 下面的数组都是 (位置, 名字) 排的, 每一步取一整行, uint8 的加法正好按 256 回绕
+    count = len(names)
+    rows = np.arange(count)
+    name_str = _padded_bytes([item[2] for item in names])
+    name_len = np.array([len(item[2]) + 1 for item in names])
+    team_len = np.array([len(item[3]) + 1 for item in names])
+
+    # 同一个战队的打乱只算一次, 再按列展开
+    team_index: dict[bytes, int] = {}
+    team_columns = np.array([team_index.setdefault(item[3], len(team_index)) for item in names])
+    teams = list(team_index)
+    team_val = np.repeat(np.arange(256, dtype=np.uint8)[:, None], len(teams), axis=1)
+    _key_schedule(
+        team_val,
+        _cycled_key(_padded_bytes(teams), np.array([len(team) + 1 for team in teams])),
+        np.arange(len(teams)),
+    )
+    val = np.ascontiguousarray(team_val[:, team_columns])
+    name_key = _cycled_key(name_str, name_len)
+    for _ in range(2):
+        _key_schedule(val, name_key, rows)
+
+    # val 是 0~255 的排列, *181+160 是双射, 正好有 128 个落在 [89, 217)
+    m = val * np.uint8(181) + np.uint8(160)
+    keep = (m >= 89) & (m < 217)
+    name_base = (m.T[keep.T] & 63).reshape(count, 128).astype(np.int64)
+
+    r = name_base[:, 0:32]
+    name_prop = np.empty((count, 8), dtype=np.int64)
+    name_prop[:, 0:7] = np.sort(r[:, 10:31].reshape(count, 7, 3), axis=2)[:, :, 1] + 36
+    name_prop[:, 7] = np.sort(r[:, 0:10], axis=1)[:, 3:7].sum(axis=1) + 154
+
+    randbase = val.copy()
+    flat = randbase.reshape(-1)
+    a = 0
+    b = np.zeros(count, dtype=np.uint8)
+
+    def m_next():
+        nonlocal a, b
+        a = (a + 1) % 256
+        b += randbase[a]
+        target = b.astype(np.intp) * count + rows
+        swap = randbase[a].copy()
+        randbase[a] = flat[target]
+        flat[target] = swap
+        pick = (randbase[a] + swap).astype(np.intp) * count + rows
+        return flat[pick].astype(np.int64)
+
+    skl_id = np.repeat(np.arange(40, dtype=np.int64)[:, None], count, axis=1)
+    skl_flat = skl_id.reshape(-1)
+    s = np.zeros(count, dtype=np.int64)
+    for _ in range(2):
+        for j in range(40):
+            high = m_next()
+            rand = ((high << 8) | m_next()) % 40
+            s = (s + rand + skl_id[j]) % 40
+            target = s * count + rows
+            swap = skl_id[j].copy()
+            skl_id[j] = skl_flat[target]
+            skl_flat[target] = swap
+    skl_id = skl_id.T
+
+    p = name_base[:, 64:128].reshape(count, 16, 4).min(axis=2)
+    ids = skl_id[:, 0:16]
+    used = (p > 10) & (ids < 35)
+    skl_freq = np.zeros((count, 40), dtype=np.int64)
+    skl_freq[:, 0:16] = np.where(used, p - 10, 0)
+    doubled = used & (ids < 25)
+    has_last = doubled.any(axis=1)
+    last = np.where(has_last, 15 - np.argmax(doubled[:, ::-1], axis=1), -1)
+    skl_freq[rows[has_last], last[has_last]] *= 2
+    for j, first in ((14, 60), (15, 62)):
+        bonus = (skl_freq[:, j] > 0) & (last != j)
+        extra = np.minimum(np.minimum(name_base[:, first], name_base[:, first + 1]), skl_freq[:, j])
+        skl_freq[:, j] += np.where(bonus, extra, 0)
+
+    # 每个名字的各段直接从连续内存里切出来, 不经过 Python 的 int 列表
+    val_bytes = np.ascontiguousarray(val.T).tobytes()
+    name_base_bytes = name_base.astype(np.uint8).tobytes()
+    name_prop_bytes = name_prop.astype(np.uint16).tobytes()
+    skl_id_bytes = skl_id.astype(np.uint8).tobytes()
+    skl_freq_bytes = skl_freq.astype(np.uint8).tobytes()
+    for row, index in enumerate(indexes):
+        # 属性全部会被覆盖, 不走 __init__
+        player = Player.__new__(Player)
+        player.name, player.team = names[row][0], names[row][1]
+        player.name_len = int(name_len[row])
+        player.team_len = int(team_len[row])
+        player.val = bytearray(val_bytes[row * 256 : row * 256 + 256])
+        player.name_base = bytearray(name_base_bytes[row * 128 : row * 128 + 128])
+        player._name_prop = array("H")
+        player._name_prop.frombytes(name_prop_bytes[row * 16 : row * 16 + 16])
+        player._skl_id = bytearray(skl_id_bytes[row * 40 : row * 40 + 40])
+        player._skl_freq = bytearray(skl_freq_bytes[row * 40 : row * 40 + 40])
+        results[index] = player
+    return results
+
+
+def _load_one(raw_name: str) -> Player | None:
+    player = Player()
+    return player if player.load(raw_name) else None
+
+
+def _padded_bytes(values: list[bytes]) -> "np.ndarray":
+    """(256, 批量), 每列第 0 位是 0, 后面接上字节, 和 name_str / team_str 的排法一样"""
+    padded = np.zeros((len(values), 256), dtype=np.uint8)
+    for row, value in enumerate(values):
+        padded[row, 1 : len(value) + 1] = np.frombuffer(value, dtype=np.uint8)
+    return np.ascontiguousarray(padded.T)
+
+
+def _cycled_key(padded: "np.ndarray", lengths: "np.ndarray") -> "np.ndarray":
+    """key[i] = padded[i % 长度], 每个名字长度不一样"""
+    index = np.arange(256)[:, None] % lengths[None, :]
+    return np.take_along_axis(padded, index, axis=0)
+
+
+def _key_schedule(val: "np.ndarray", key: "np.ndarray", rows: "np.ndarray") -> None:
+    """一遍 256 步的打乱, 原地改 val, 每一步整批名字一起换"""
+    count = len(rows)
+    flat = val.reshape(-1)
+    s = np.zeros(count, dtype=np.uint8)
+    for i in range(256):
+        swap = val[i].copy()
+        s += key[i]
+        s += swap
+        target = s.astype(np.intp) * count + rows
+        val[i] = flat[target]
+        flat[target] = swap
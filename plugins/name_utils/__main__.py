@@ -0,0 +1,57 @@
+"""
+python -m name_utils [--count N] [--seed S]
+
+拿一批随机名字对比 Player().load 逐个算和 load_many 批量算的速度, 顺便核对结果一致
+"""
+
+import sys
+import time
+import random
+import argparse
+
+from . import HAS_NUMPY, Player, load_many
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789张王李赵天地玄黄宇宙洪荒"
+
+
+def random_names(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    names = []
+    for _ in range(count):
+        name = "".join(rng.choices(ALPHABET, k=rng.randint(1, 12)))
+        if rng.random() < 0.3:
+            name += "@" + "".join(rng.choices(ALPHABET, k=rng.randint(1, 8)))
+        names.append(name)
+    return names
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m name_utils")
+    parser.add_argument("--count", type=int, default=5000, help="名字数量")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args(argv)
+
+    names = random_names(args.count, args.seed)
+
+    start_time = time.perf_counter()
+    scalar = []
+    for name in names:
+        player = Player()
+        player.load(name)
+        scalar.append(player.display())
+    scalar_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    batch = [player.display() for player in load_many(names)]
+    batch_time = time.perf_counter() - start_time
+
+    mismatched = sum(1 for left, right in zip(scalar, batch) if left != right)
+    print(f"名字数: {len(names)}  numpy: {'有' if HAS_NUMPY else '没有, load_many 逐个算'}")
+    print(f"逐个 load: {scalar_time:.3f}s  {len(names) / scalar_time:.0f} 个/s")
+    print(f"load_many: {batch_time:.3f}s  {len(names) / batch_time:.0f} 个/s")
+    print(f"加速: {scalar_time / batch_time:.1f}x  结果不一致: {mismatched}")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+"""
+namerena 插件的评测部分
+
+- config: 可以在配置里改的参数, 插件加载的时候按配置改
+- process: 子进程, 超时, 资源上限, 取消
+- records / runtimes: 结果格式, JS 运行时和版本号
+- js_pool / distributed / evaluation: 常驻进程池, 远程 agent, 跑 namerena
+- tswn_cli: tswn-cli 对比
+- result_cache / scores / telemetry / eta_model / job_queue: 缓存, 评分索引, 遥测, 耗时模型, 调度
+- corpus: 离线跑语料对比 (python -m namer_eval.corpus)
+
+命令处理都在 namerena.py 里, 这里只放跟消息无关的东西
+"""
+
+from pathlib import Path
+
+PLUGIN_ROOT = Path(__file__).resolve().parent.parent
+"""
+插件目录, md5/ 和 name_utils/ 都在这下面
+"""
@@ -0,0 +1,83 @@
+"""
+可以在配置里改的参数
+
+默认值写在这里, 插件的 on_load 按配置改成 config.XXX = ..., 其他模块用的时候都从这里读
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+USE_BUN = False
+JS_RUNTIME = ""
+RUNTIME_CALIBRATION = True
+USE_TSWN_COMPARE = True
+TSWN_CLI_PATH = ""
+TSWN_COMPARE_ROUNDS = 10000
+USE_TSWN_SERVER = True
+TSWN_JSON = True
+BENCH_PRECISION = 0.0
+PROGRESS_INTERVAL = 15.0
+TELEMETRY_ENABLED = True
+TELEMETRY_DSN = ""
+TELEMETRY_QUEUE_SIZE = 10000
+PROGRESS_ROUNDS = 1000
+"""
+常驻进程每跑这么多轮回一条进度
+"""
+VERSION_TIMEOUT = 10.0
+"""
+--version 的超时, cargo run 要先编译, 放宽 12 倍
+"""
+BACKGROUND_DISCOVERY = True
+USE_WORKER_POOL = True
+WORKER_COUNT = 0
+SIBLING_WORKER_COUNT = 0
+USE_CODE_CACHE = True
+BENCH_SHARDS = 0
+REMOTE_AGENTS = ""
+REMOTE_TOKEN = ""
+LOCAL_AGENTS = 0
+LOCAL_AGENT_WORKERS = 1
+JOB_WORKERS = 2
+JOB_QUEUE_SIZE = 20
+JOB_USER_LIMIT = 1
+JOB_USER_QUEUE = 3
+JOB_ROOM_LIMIT = 0
+FIGHT_TIMEOUT = 60.0
+WIN_RATE_TIMEOUT = 600.0
+SCORE_TIMEOUT = 600.0
+CHILD_CPU_LIMIT = 900
+CHILD_MEMORY_LIMIT = 4096
+CHILD_MEMORY_LIMIT_MIN = 1024
+"""
+node 光启动 V8 就要预留好几百 MB 地址空间, RLIMIT_AS 比这个小直接 abort
+"""
+USE_CACHE = True
+CACHE_MEMORY_SIZE = 1024
+CACHE_DISK_SIZE = 100000
+USE_SCORE_INDEX = True
+SCORE_MAX_AGE = 30.0
+SEARCH_WORKERS = 0
+SEARCH_MAX_CANDIDATES = 200000
+SEARCH_MAX_SECONDS = 300.0
+SEARCH_TOP_K = 20
+SEARCH_START_METHOD = ""
+SEARCH_TIMEOUT_MARGIN = 60.0
+"""
+搜索子进程到时间以后还要等手上的几段跑完再存盘, 超时多给这么多秒
+"""
+
+
+@contextmanager
+def override(**values):
+    """
+    临时改几个参数, 退出时改回去
+    给离线工具用的, 插件还是在 on_load 里直接改
+    """
+    old = {name: globals()[name] for name in values}
+    globals().update(values)
+    try:
+        yield
+    finally:
+        globals().update(old)
@@ -0,0 +1,337 @@
+"""
+离线跑一份语料, 对比 namerena 和 tswn 的速度和结果差异
+换 md5.js / tswn 之前先跑一遍, 看看有没有变慢或者结果对不上
+
+在 plugins 目录下:
+python -m namer_eval.corpus corpus.txt --tswn path/to/tswn-cli --csv out.csv
+"""
+
+from __future__ import annotations
+
+import csv
+import argparse
+import json
+import sys
+import time
+
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from . import (
+    config,
+    evaluation,
+    js_pool,
+    process,
+    records,
+    result_cache,
+    tswn_cli,
+)
+
+
+class CorpusSettings(NamedTuple):
+    """命令行给的参数, 跑的时候临时盖掉 config 里的"""
+
+    rounds: int
+    workers: int
+    tswn: str
+    cache: bool
+
+
+class CorpusCase(NamedTuple):
+    """语料里的一行, 拆成两边各自要跑的东西"""
+
+    entry: str
+    namerena_inputs: list[str]
+    fight_mode: bool
+    tswn: Callable[[], records.EvalResult | None]
+
+
+def load_corpus(path: Path) -> list[str]:
+    """一行一条, 空行和 # 开头的行跳过"""
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+
+
+def corpus_case(mode: str, entry: str) -> CorpusCase:
+    """
+    - pf: 一个名字 (多人用 + 连接), 跑四个评分
+    - win-rate: 两队用 | 分开, 队伍里多人用 + 连接
+    - fight: 和 /namer-fight 一样, "AAA+BBB+seed:xxx"
+    """
+    if mode == "pf":
+        test = "\n".join(entry.split("+"))
+        return CorpusCase(
+            entry,
+            [run.format(test=test) for run in records.PF_RUNS],
+            False,
+            lambda: tswn_cli.run_tswn_pf_compare(entry),
+        )
+    if mode == "win-rate":
+        teams = ["\n".join(team.strip().split("+")) for team in entry.split("|")]
+        input_text = "!test!\n\n" + "\n\n".join(teams)
+        return CorpusCase(
+            entry, [input_text], False, lambda: tswn_cli.run_tswn_bench_compare(input_text)
+        )
+    input_text = "\n".join(entry.split("+"))
+    return CorpusCase(
+        entry, [input_text], True, lambda: tswn_cli.run_tswn_cli(input_text, "fight")
+    )
+
+
+def corpus_values(
+    mode: str, case: CorpusCase, engine: str, results: list[records.EvalResult | None]
+) -> list[float] | None:
+    """
+    把一条语料的结果变成可以比较的数字, 解析不了就返回 None
+    - pf: [pp, pd, qp, qd, sum]
+    - win-rate: [胜率百分比]
+    - fight: [赢家下标], 差异只记 0 / 1
+    """
+    if any(result is None for result in results):
+        return None
+    if mode == "fight":
+        names = case.namerena_inputs[0].split("\n")
+        result = results[0]
+        assert result is not None
+        if engine == "tswn":
+            winner = tswn_cli.tswn_fight_for_names(result, names)
+            return [float(winner)] if winner.isdigit() else None
+        winners = (result.data or {}).get("winners") or [result.output]
+        if len(winners) == 1 and winners[0] in names:
+            return [float(names.index(winners[0]))]
+        return None
+    if engine == "tswn" and mode == "pf":
+        rows = (results[0].data or {}).get("rows") if results[0] is not None else None
+        return [float(value) for value in records._complete_pf_row(rows[0])] if rows else None
+    values = []
+    for result in results:
+        assert result is not None
+        if not result.data or "value" not in result.data:
+            return None
+        values.append(float(result.data["value"]))
+    if mode == "pf":
+        values.append(sum(values))
+    return values
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """最近秩的分位数, 空列表返回 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(-(-len(ordered) * pct // 100) - 1, 0)
+    return ordered[min(int(index), len(ordered) - 1)]
+
+
+def distribution(values: list[float]) -> dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": max(values, default=0.0),
+    }
+
+
+def timed(func: Callable, *args) -> tuple[records.EvalResult | None, float]:
+    """
+    在线程池里跑, 返回 (结果, 跑完的时间), 出错算 None
+    跑完的时间要在线程里记, done 回调可能比 result() 返回得还晚
+    """
+    try:
+        result = func(*args)
+    except Exception:
+        result = None
+    return result, time.time()
+
+
+def run_corpus(
+    mode: str, entries: list[str], settings: CorpusSettings
+) -> tuple[list[dict], dict]:
+    """
+    两个引擎同时跑整份语料
+    namerena 走 eval 线程池 + 常驻进程池, tswn 走对比线程池, 和机器人里跑的一样
+    每条的延迟是从提交到这一条的结果全部出来的时间, 失败的不算进延迟和条数
+    返回 (每条语料一行, 汇总)
+    """
+    with config.override(
+        TSWN_CLI_PATH=settings.tswn,
+        USE_TSWN_COMPARE=bool(settings.tswn),
+        TSWN_COMPARE_ROUNDS=settings.rounds,
+        WORKER_COUNT=settings.workers,
+        USE_CACHE=settings.cache,
+    ):
+        js_pool.start_js_pool()
+        result_cache.start_eval_cache()
+        try:
+            return _run_corpus(mode, entries)
+        finally:
+            evaluation.stop_eval_executor()
+            js_pool.stop_js_pool()
+            result_cache.stop_eval_cache()
+            tswn_cli.stop_tswn_server()
+
+
+def _run_corpus(mode: str, entries: list[str]) -> tuple[list[dict], dict]:
+    cases = [corpus_case(mode, entry) for entry in entries]
+    has_tswn = config.USE_TSWN_COMPARE and tswn_cli.resolve_tswn_runner() is not None
+
+    start_time = time.time()
+    eval_executor = evaluation.get_eval_executor()
+    compare_executor = evaluation.get_compare_executor()
+    submitted: list[float] = []
+    namerena_futures: list[list[Future]] = []
+    tswn_futures: list[Future | None] = []
+    for case in cases:
+        submitted.append(time.time())
+        namerena_futures.append(
+            [
+                process.submit_in_context(
+                    eval_executor,
+                    timed,
+                    evaluation.run_namerena,
+                    input_text,
+                    case.fight_mode,
+                    0.0,
+                )
+                for input_text in case.namerena_inputs
+            ]
+        )
+        tswn_futures.append(
+            process.submit_in_context(compare_executor, timed, case.tswn) if has_tswn else None
+        )
+
+    rows = []
+    finished: dict[str, list[float]] = {"namerena": [], "tswn": []}
+    latencies: dict[str, list[float]] = {"namerena": [], "tswn": []}
+    failed = {"namerena": 0, "tswn": 0}
+    diffs: dict[str, list[float]] = {}
+    labels = records.PF_LABELS if mode == "pf" else ("winner" if mode == "fight" else mode,)
+    for case, submit_time, futures, tswn_future in zip(
+        cases, submitted, namerena_futures, tswn_futures
+    ):
+        namerena_runs = [future.result() for future in futures]
+        namerena_done = max(done for _, done in namerena_runs)
+        finished["namerena"].append(namerena_done)
+        namerena_values = corpus_values(
+            mode, case, "namerena", [result for result, _ in namerena_runs]
+        )
+        namerena_latency = namerena_done - submit_time if namerena_values is not None else None
+        tswn_values = None
+        tswn_latency = None
+        if tswn_future is not None:
+            tswn_result, tswn_done = tswn_future.result()
+            finished["tswn"].append(tswn_done)
+            if tswn_result is not None:
+                tswn_values = corpus_values(mode, case, "tswn", [tswn_result])
+            if tswn_values is not None:
+                tswn_latency = tswn_done - submit_time
+        for engine, latency in (("namerena", namerena_latency), ("tswn", tswn_latency)):
+            if engine == "tswn" and not has_tswn:
+                continue
+            if latency is None:
+                failed[engine] += 1
+            else:
+                latencies[engine].append(latency)
+        for index, label in enumerate(labels):
+            row = {
+                "entry": case.entry,
+                "label": label,
+                "namerena": namerena_values[index] if namerena_values else None,
+                "tswn": tswn_values[index] if tswn_values else None,
+                "diff": None,
+                "namerena_latency": (
+                    round(namerena_latency, 4) if namerena_latency is not None else None
+                ),
+                "tswn_latency": round(tswn_latency, 4) if tswn_latency is not None else None,
+            }
+            if row["namerena"] is not None and row["tswn"] is not None:
+                # 对战只看赢家是不是同一个
+                row["diff"] = (
+                    float(row["namerena"] != row["tswn"])
+                    if mode == "fight"
+                    else abs(row["namerena"] - row["tswn"])
+                )
+                diffs.setdefault(label, []).append(row["diff"])
+            rows.append(row)
+
+    summary: dict = {
+        "mode": mode,
+        "rounds": config.TSWN_COMPARE_ROUNDS,
+        "entries": len(cases),
+        "engines": {},
+        "diff": {},
+    }
+    for engine in ("namerena", "tswn") if has_tswn else ("namerena",):
+        wall = max(finished[engine], default=start_time) - start_time
+        evals = len(latencies[engine])
+        summary["engines"][engine] = {
+            "evals": evals,
+            "failed": failed[engine],
+            "wall": round(wall, 3),
+            "evals_per_s": round(evals / wall, 3) if wall > 0 else 0.0,
+            "latency": distribution(latencies[engine]),
+        }
+    for label, values in diffs.items():
+        summary["diff"][label] = {
+            **distribution(values),
+            "nonzero": sum(1 for value in values if value != 0),
+        }
+    return rows, summary
+
+
+def format_corpus_summary(summary: dict) -> str:
+    lines = [f"模式: {summary['mode']}, {summary['entries']} 条, 每条 {summary['rounds']} 轮"]
+    for engine, stats in summary["engines"].items():
+        latency = stats["latency"]
+        lines.append(
+            f"{engine}: {stats['evals_per_s']:.2f} 条/s (共 {stats['wall']:.2f}s, 失败 {stats['failed']})"
+            f", 延迟 p50 {latency['p50']:.3f}s p90 {latency['p90']:.3f}s"
+            f" p99 {latency['p99']:.3f}s max {latency['max']:.3f}s"
+        )
+    for label, stats in summary["diff"].items():
+        lines.append(
+            f"diff {label}: 不一致 {stats['nonzero']}/{stats['count']}"
+            f", 平均 {stats['mean']:.3f} p50 {stats['p50']:g} p90 {stats['p90']:g}"
+            f" p99 {stats['p99']:g} max {stats['max']:g}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m namer_eval.corpus", description="namerena / tswn 语料对比"
+    )
+    parser.add_argument("corpus", type=Path, help="语料文件, 一行一条")
+    parser.add_argument("--mode", choices=("pf", "win-rate", "fight"), default="pf")
+    parser.add_argument("--rounds", type=int, default=config.TSWN_COMPARE_ROUNDS, help="评分/胜率的轮数")
+    parser.add_argument("--workers", type=int, default=0, help="常驻进程数量, 0 表示按 CPU 核数")
+    parser.add_argument("--tswn", default="", help="tswn-cli 路径, 不给就只跑 namerena")
+    parser.add_argument("--cache", action="store_true", help="使用结果缓存 (测速的时候别开)")
+    parser.add_argument("--csv", type=Path, help="每条结果写到这个 CSV")
+    parser.add_argument("--json", type=Path, help="汇总写到这个 JSON")
+    args = parser.parse_args(argv)
+
+    entries = load_corpus(args.corpus)
+    if not entries:
+        print("语料是空的")
+        return 1
+    settings = CorpusSettings(args.rounds, args.workers, args.tswn, args.cache)
+    rows, summary = run_corpus(args.mode, entries, settings)
+    print(format_corpus_summary(summary))
+    if args.csv is not None:
+        with args.csv.open("w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()) if rows else ["entry"])
+            writer.writeheader()
+            writer.writerows(rows)
+    if args.json is not None:
+        args.json.write_text(
+            json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,487 @@
+"""
+分布式执行器: 本机进程池和远程 md5-api.js agent 一起从同一个任务列表里拿活
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import queue
+import time
+import threading
+import contextvars
+import subprocess
+import urllib.request
+
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from pathlib import Path
+from typing import Callable
+from . import PLUGIN_ROOT, config, js_pool, process, runtimes, tswn_cli
+
+AGENT_TIMEOUT = 600.0
+# agent 自己按 payload 里的 timeout 杀子进程, HTTP 这边多等一会儿
+AGENT_TIMEOUT_MARGIN = 10.0
+AGENT_RETRY_INTERVAL = 30.0
+AGENT_MAX_ATTEMPTS = 3
+EVAL_BACKEND: DistributedPool | None = None
+LOCAL_AGENT_PROCS: list[subprocess.Popen[str]] = []
+LOCAL_AGENT_THREAD: threading.Thread | None = None
+
+
+class RemoteAgent:
+    """一个 md5-api.js agent, 走 HTTP + JSON"""
+
+    def __init__(self, address: str, token: str) -> None:
+        self.address = address if "://" in address else f"http://{address}"
+        self.token = token
+        self.capacity = 0
+        self.md5_hash = ""
+        self.runtime = ""
+        self.tswn_version: str | None = None
+        self.down_until = 0.0
+        self.done = 0
+        self.failed = 0
+        self.last_error = ""
+
+    def _request(self, path: str, payload: dict | None, timeout: float) -> dict:
+        request = urllib.request.Request(
+            self.address + path,
+            data=None if payload is None else json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json", "X-Namer-Token": self.token},
+            method="GET" if payload is None else "POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except (OSError, ValueError) as e:
+            raise process.WorkerError(f"{self.address}: {e}") from e
+
+    def refresh(self) -> bool:
+        """拉一下 /info, 拉不到就先当它挂了"""
+        try:
+            info = self._request("/info", None, process.WORKER_PING_TIMEOUT)
+        except process.WorkerError as e:
+            self.mark_down(str(e))
+            return False
+        self.capacity = int(info.get("capacity") or 0)
+        self.md5_hash = str(info.get("md5_hash") or "")
+        self.runtime = str(info.get("runtime") or "")
+        self.tswn_version = info.get("tswn")
+        return True
+
+    def mark_down(self, error: str) -> None:
+        self.failed += 1
+        self.last_error = error
+        self.down_until = time.time() + AGENT_RETRY_INTERVAL
+
+    def run(self, payload: dict) -> dict:
+        timeout = payload.get("timeout")
+        return self._request(
+            "/run", payload, timeout + AGENT_TIMEOUT_MARGIN if timeout else AGENT_TIMEOUT
+        )
+
+    def describe(self, md5_hash: str) -> str:
+        if self.capacity == 0:
+            state = "连不上"
+        elif self.md5_hash != md5_hash:
+            state = "md5.js 不一致, 不分配"
+        elif self.down_until > time.time():
+            state = "暂停中"
+        else:
+            state = f"{self.capacity} 并发"
+        line = f"{self.address}: {state}, 完成 {self.done}, 失败 {self.failed}"
+        if self.last_error and self.down_until > time.time():
+            line += f" ({self.last_error})"
+        return line
+
+
+class DistributedJob:
+    def __init__(
+        self,
+        engine: str,
+        payload: dict,
+        on_progress: Callable[[str], None] | None = None,
+        kind: str = "score",
+    ) -> None:
+        self.engine = engine
+        self.payload = payload
+        # 超时按哪种模式算, 统计被杀的次数用
+        self.kind = kind
+        self.on_progress = on_progress
+        self.future: Future[dict] = Future()
+        self.attempts = 0
+        self.failed_on: set[str] = set()
+        # 本机执行位跑的时候带上提交时的命令, 取消才找得到进程
+        self.context = contextvars.copy_context()
+
+
+class DistributedPool:
+    """
+    分布式执行器: 本机的进程池和远程 agent 一起从同一个任务列表里拿活
+    每个执行位 (本机的一个 worker / agent 的一个并发) 一个线程, 空闲了就去拿下一个自己能跑的任务
+    跑得快的机器自然拿得多; 某台机器出错了, 任务放回去给别的机器
+    run 的接口和 JsWorkerPool.run 一样, 所以分片也会被分到不同的机器上
+    """
+
+    def __init__(self, local: js_pool.JsWorkerPool | None, agents: list[RemoteAgent]) -> None:
+        self.local = local
+        self.agents = agents
+        self.jobs: deque[DistributedJob] = deque()
+        self.cond = threading.Condition()
+        self.stopping = threading.Event()
+        self.tswn_slots = False
+        self.md5_hash = runtimes.get_md5_js_hash()
+        # 加载的时候不去跑 --version, 后台查到了 / 第一次要用的时候再填上
+        self.tswn_version: str | None = None
+        self.tswn_checked = False
+
+    @property
+    def size(self) -> int:
+        size = self.local.size if self.local is not None else 0
+        return max(1, size + sum(agent.capacity for agent in self.usable_agents()))
+
+    def usable_agents(self) -> list[RemoteAgent]:
+        return [
+            agent
+            for agent in self.agents
+            if agent.capacity > 0 and agent.md5_hash == self.md5_hash
+        ]
+
+    def available(self) -> bool:
+        """有没有哪个执行位能跑 namerena"""
+        return self.local is not None or bool(self.usable_agents())
+
+    def has_remote_tswn(self) -> bool:
+        if not self.tswn_checked:
+            self.set_tswn_version(tswn_cli.get_tswn_version())
+        return self.tswn_version is not None and any(
+            agent.tswn_version == self.tswn_version for agent in self.agents
+        )
+
+    def set_tswn_version(self, version: str | None) -> None:
+        """本机的 tswn 版本查到了: 版本对得上的 agent 才接 tswn, 第一次查到的时候拉起本机的 tswn 执行位"""
+        with self.cond:
+            spawn = self.local is not None and version is not None and not self.tswn_slots
+            self.tswn_version = version
+            self.tswn_checked = True
+            if spawn:
+                self.tswn_slots = True
+            self.cond.notify_all()
+        if spawn:
+            assert self.local is not None
+            for _ in range(self.local.size):
+                self._spawn(self._local_tswn_slot)
+
+    def add_agent(self, agent: RemoteAgent) -> None:
+        with self.cond:
+            if self.stopping.is_set():
+                return
+            self.agents.append(agent)
+        self._spawn(self._wait_agent, agent)
+
+    def _spawn(self, target: Callable[..., None], *args) -> None:
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+    def start(self) -> None:
+        if self.local is not None:
+            for _ in range(self.local.size):
+                self._spawn(self._local_slot)
+        for agent in self.agents:
+            self._spawn(self._wait_agent, agent)
+
+    def _wait_agent(self, agent: RemoteAgent) -> None:
+        """在后台连 agent, 连不上的隔一会儿再试, 连上了再给它分活"""
+        while not self.stopping.is_set():
+            if agent.refresh():
+                self._start_agent(agent)
+                return
+            self.stopping.wait(AGENT_RETRY_INTERVAL)
+
+    def _start_agent(self, agent: RemoteAgent) -> None:
+        for _ in range(agent.capacity):
+            self._spawn(self._agent_slot, agent)
+
+    def _submit(
+        self,
+        engine: str,
+        payload: dict,
+        on_progress: Callable[[str], None] | None = None,
+        kind: str = "score",
+    ) -> dict:
+        if self.stopping.is_set():
+            raise process.WorkerError("执行器已关闭")
+        job = DistributedJob(engine, payload, on_progress, kind)
+        with process.kill_on_cancel(lambda: self._drop(job)):
+            self._put(job)
+            response = job.future.result()
+        process.check_cancelled()
+        return response
+
+    def _put(self, job: DistributedJob) -> None:
+        with self.cond:
+            self.jobs.append(job)
+            self.cond.notify_all()
+
+    @staticmethod
+    def _resolve(job: DistributedJob, response: dict) -> None:
+        try:
+            job.future.set_result(response)
+        except InvalidStateError:
+            # 已经被取消了, 结果不要了
+            pass
+
+    def _drop(self, job: DistributedJob) -> None:
+        """命令取消了: 还没开始的直接拿掉, 远程已经在跑的只能等它跑完再扔掉结果"""
+        with self.cond:
+            if job in self.jobs:
+                self.jobs.remove(job)
+        self._resolve(job, {"ok": False, "error": "命令已取消"})
+
+    def _take(self, accepts: Callable[[DistributedJob], bool]) -> DistributedJob | None:
+        """拿第一个自己能跑的任务, 关闭的时候返回 None"""
+        with self.cond:
+            while not self.stopping.is_set():
+                for job in self.jobs:
+                    if accepts(job):
+                        self.jobs.remove(job)
+                        return job
+                self.cond.wait(timeout=1.0)
+        return None
+
+    def _local_slot(self) -> None:
+        assert self.local is not None
+        while (job := self._take(lambda job: job.engine == "namerena")) is not None:
+            payload = job.payload
+            try:
+                output = job.context.run(
+                    self.local.run,
+                    payload["mode"],
+                    payload["input"],
+                    payload["round"],
+                    payload["precision"],
+                    job.on_progress,
+                    as_json=payload["json"],
+                    offset=payload["offset"],
+                )
+                self._resolve(job, {"ok": True, "output": output})
+            except Exception as e:
+                self._resolve(job, {"ok": False, "error": str(e)})
+
+    def _local_tswn_slot(self) -> None:
+        while (job := self._take(lambda job: job.engine == "tswn")) is not None:
+            result = job.context.run(
+                tswn_cli._exec_tswn_local, job.payload["input"], *job.payload["args"]
+            )
+            if result is None:
+                self._resolve(job, {"ok": False, "error": "tswn-cli 不可用"})
+            else:
+                self._resolve(job, {"ok": result[2], "output": result[0]})
+
+    def _agent_accepts(self, agent: RemoteAgent, job: DistributedJob) -> bool:
+        if agent.address in job.failed_on:
+            return False
+        if job.engine == "tswn":
+            return self.tswn_version is not None and agent.tswn_version == self.tswn_version
+        # md5.js 不一样的话结果对不上, 也没法进缓存
+        return agent.md5_hash == self.md5_hash
+
+    def _agent_slot(self, agent: RemoteAgent) -> None:
+        while not self.stopping.is_set():
+            wait = agent.down_until - time.time()
+            if wait > 0:
+                self.stopping.wait(wait)
+                continue
+            job = self._take(lambda job: self._agent_accepts(agent, job))
+            if job is None:
+                return
+            try:
+                response = agent.run({"engine": job.engine, **job.payload})
+            except process.WorkerError as e:
+                agent.mark_down(str(e))
+                job.attempts += 1
+                job.failed_on.add(agent.address)
+                if job.attempts >= AGENT_MAX_ATTEMPTS or not self._can_retry(job):
+                    self._resolve(job, {"ok": False, "error": str(e)})
+                elif not job.future.done():
+                    self._put(job)
+                continue
+            agent.done += 1
+            if response.get("timeout"):
+                process.count_kill("timeout", job.kind)
+            self._resolve(job, response)
+
+    def _can_retry(self, job: DistributedJob) -> bool:
+        """还有没有别的执行位能接这个任务"""
+        if self.local is not None and (job.engine == "namerena" or self.tswn_version):
+            return True
+        return any(self._agent_accepts(agent, job) for agent in self.agents)
+
+    def run(
+        self,
+        mode: str,
+        input_text: str,
+        round: int,
+        precision: float = 0.0,
+        on_progress: Callable[[str], None] | None = None,
+        as_json: bool = False,
+        offset: int = 0,
+    ) -> str:
+        kind = runtimes.runtime_kind(mode, input_text)
+        count = len(input_text.split("\n")) if mode == "fight-batch" else 1
+        response = self._submit(
+            "namerena",
+            {
+                "mode": mode,
+                "input": input_text,
+                "round": round,
+                "precision": precision,
+                "json": as_json,
+                "offset": offset,
+                # 远程 agent 按这个杀子进程, 本机执行位自己会算
+                "timeout": process.eval_timeout(kind, count),
+            },
+            on_progress,
+            kind,
+        )
+        if not response.get("ok"):
+            raise process.WorkerError(str(response.get("error") or "未知错误"))
+        return str(response.get("output") or "")
+
+    def run_tswn(self, input_text: str, *args: str) -> tuple[str, float, bool]:
+        start_time = time.time()
+        kind, count = tswn_cli.tswn_kind(input_text, *args)
+        response = self._submit(
+            "tswn",
+            {"args": list(args), "input": input_text, "timeout": process.eval_timeout(kind, count)},
+            kind=kind,
+        )
+        output = str(response.get("output") or response.get("error") or "")
+        return output.strip(), time.time() - start_time, bool(response.get("ok"))
+
+    def describe(self) -> str:
+        lines = [f"分布式执行: 共 {self.size} 个执行位, 排队 {len(self.jobs)} 个"]
+        if self.local is not None:
+            lines.append(f"本机: {self.local.size} 并发, 重启 {self.local.restarts} 次")
+        lines.extend(agent.describe(self.md5_hash) for agent in self.agents)
+        return "\n".join(lines)
+
+    def shutdown(self) -> None:
+        self.stopping.set()
+        with self.cond:
+            pending = list(self.jobs)
+            self.jobs.clear()
+            self.cond.notify_all()
+        for job in pending:
+            self._resolve(job, {"ok": False, "error": "执行器已关闭"})
+
+
+def start_local_agents(backend: DistributedPool) -> None:
+    """
+    在后台起 LOCAL_AGENTS 个本机 agent 子进程, 起来一个就交给执行器一个
+    找 tswn-cli 和等 agent 报地址都不放在加载里做
+    """
+    runner_path = PLUGIN_ROOT / "md5" / "md5-api.js"
+    tswn_runner = tswn_cli.resolve_tswn_runner() if config.USE_TSWN_COMPARE else None
+    command = [
+        runtimes.get_js_runtime(),
+        str(runner_path),
+        "agent",
+        "--host=127.0.0.1",
+        "--port=0",
+        f"--workers={config.LOCAL_AGENT_WORKERS}",
+        f"--token={config.REMOTE_TOKEN}",
+        "--watch-stdin",
+    ]
+    # cargo run 的 tswn 没法直接交给 agent
+    if tswn_runner is not None and tswn_runner[1] is None and len(tswn_runner[0]) == 1:
+        command.append(f"--tswn={Path(tswn_runner[0][0]).resolve()}")
+
+    for _ in range(config.LOCAL_AGENTS):
+        if backend.stopping.is_set():
+            return
+        try:
+            proc = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                cwd=runner_path.parent,
+                env=runtimes.code_cache_env(command[0]),
+            )
+        except OSError:
+            break
+        LOCAL_AGENT_PROCS.append(proc)
+        lines: queue.Queue[str] = queue.Queue()
+        threading.Thread(
+            target=lambda proc=proc: lines.put(proc.stdout.readline() if proc.stdout else ""),
+            daemon=True,
+        ).start()
+        try:
+            line = lines.get(timeout=process.WORKER_PING_TIMEOUT)
+        except queue.Empty:
+            continue
+        match = re.search(r"listening on (\S+)$", line.strip())
+        if match is not None:
+            backend.add_agent(RemoteAgent(match.group(1), config.REMOTE_TOKEN))
+
+
+def start_eval_backend() -> None:
+    global EVAL_BACKEND, LOCAL_AGENT_THREAD
+
+    stop_eval_backend()
+    addresses = [address.strip() for address in config.REMOTE_AGENTS.split(",") if address.strip()]
+    if not addresses and config.LOCAL_AGENTS <= 0:
+        return
+    backend = DistributedPool(
+        js_pool.JS_POOL, [RemoteAgent(address, config.REMOTE_TOKEN) for address in addresses]
+    )
+    backend.start()
+    EVAL_BACKEND = backend
+    if config.LOCAL_AGENTS > 0:
+        thread = threading.Thread(target=start_local_agents, args=(backend,), daemon=True)
+        thread.start()
+        LOCAL_AGENT_THREAD = thread
+
+
+def stop_eval_backend() -> None:
+    global EVAL_BACKEND, LOCAL_AGENT_THREAD
+
+    backend = EVAL_BACKEND
+    EVAL_BACKEND = None
+    if backend is not None:
+        backend.shutdown()
+    thread = LOCAL_AGENT_THREAD
+    LOCAL_AGENT_THREAD = None
+    if thread is not None:
+        # 还在等 agent 报地址的话最多等 WORKER_PING_TIMEOUT, 等它停了再杀进程, 免得漏掉
+        thread.join(timeout=process.WORKER_PING_TIMEOUT + 1.0)
+    while LOCAL_AGENT_PROCS:
+        proc = LOCAL_AGENT_PROCS.pop()
+        try:
+            if proc.stdin is not None:
+                proc.stdin.close()
+            proc.wait(timeout=3.0)
+        except Exception:
+            proc.kill()
+            proc.wait()
+
+
+def eval_pool() -> js_pool.JsWorkerPool | DistributedPool | None:
+    """namerena 跑在哪: 有远程 agent 就走分布式执行器, 否则用本机进程池"""
+    backend = EVAL_BACKEND
+    if backend is not None and backend.available():
+        return backend
+    return js_pool.JS_POOL
+
+
+def eval_parallelism() -> int:
+    """同时能跑几个 namerena, 和进程池大小保持一致"""
+    pool = eval_pool()
+    if pool is not None:
+        return pool.size
+    if config.WORKER_COUNT > 0:
+        return config.WORKER_COUNT
+    return os.cpu_count() or 1
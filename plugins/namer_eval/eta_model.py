@@ -0,0 +1,190 @@
+"""
+耗时模型: 按 (模式, 运行时) 在线拟合, 用来估计排队的命令要跑多久
+"""
+
+from __future__ import annotations
+
+import json
+import heapq
+import threading
+
+from pathlib import Path
+from . import PLUGIN_ROOT, config, evaluation, records, runtimes
+
+ETA_MODEL: EtaModel | None = None
+ETA_MODEL_PATH = PLUGIN_ROOT / "md5" / "eta_model.json"
+ETA_PRIOR_SECONDS = {"fight": 0.02, "win-rate": 0.00015, "score": 0.000275}
+"""
+还没有观测的时候, 每轮每人大概要多少秒 (评分一项 10000 轮 2.75s 左右)
+"""
+ETA_DECAY = 0.98
+"""
+每来一个新的观测, 旧的累加量乘上这个数, 换了机器也能慢慢跟上
+"""
+
+
+def eta_units(kind: str, input_text: str, rounds: int) -> float:
+    """模型的自变量: 对战是人数, 评分/胜率是 轮数 * 人数"""
+    if kind == "fight":
+        return float(records.count_players(input_text))
+    return float(rounds * records.count_players(input_text))
+
+
+class EtaModel:
+    """
+    按 (模式, 运行时) 拟合 耗时 = a + b * 自变量 (见 eta_units)
+    在线最小二乘, 每组只存几个累加量, 旧的观测按 ETA_DECAY 慢慢淡出
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.sums: dict[str, list[float]] = {}
+        """
+        "模式/运行时" -> [n, Σx, Σy, Σxx, Σxy, 相对误差的滑动平均]
+        """
+        self.observed = 0
+
+    def _fit(self, key: str) -> tuple[float, float] | None:
+        """返回 (a, b), 数据不够就只用比例, 没有数据返回 None"""
+        sums = self.sums.get(key)
+        if sums is None or sums[0] <= 0 or sums[1] <= 0:
+            return None
+        n, sx, sy, sxx, sxy = sums[:5]
+        ratio = (0.0, sy / sx)
+        denominator = n * sxx - sx * sx
+        # 只有一种大小的输入没法分出截距, 就当作纯比例
+        if n < 2 or denominator <= 1e-9 * n * sxx:
+            return ratio
+        b = (n * sxy - sx * sy) / denominator
+        a = (sy - b * sx) / n
+        if b <= 0 or a < 0:
+            return ratio
+        return a, b
+
+    def predict(self, kind: str, runtime: str, units: float) -> float:
+        with self.lock:
+            fit = self._fit(f"{kind}/{runtime}")
+        if fit is None:
+            return ETA_PRIOR_SECONDS.get(kind, ETA_PRIOR_SECONDS["score"]) * units
+        return fit[0] + fit[1] * units
+
+    def observe(self, kind: str, runtime: str, units: float, seconds: float) -> None:
+        if units <= 0 or seconds <= 0:
+            return
+        predicted = self.predict(kind, runtime, units)
+        with self.lock:
+            sums = self.sums.setdefault(f"{kind}/{runtime}", [0.0] * 6)
+            error = abs(predicted - seconds) / seconds
+            sums[5] = error if sums[0] == 0 else sums[5] * 0.9 + error * 0.1
+            for index, value in enumerate((1.0, units, seconds, units * units, units * seconds)):
+                sums[index] = sums[index] * ETA_DECAY + value
+            self.observed += 1
+
+    def describe(self) -> str:
+        lines = ["耗时模型 (耗时 = a + b * 自变量, 对战按人数, 评分/胜率按 轮数 * 人数):"]
+        with self.lock:
+            keys = sorted(self.sums)
+        if not keys:
+            lines.append("  还没有数据, 先按默认值估计")
+        for key in keys:
+            with self.lock:
+                fit = self._fit(key)
+                sums = list(self.sums[key])
+            if fit is None:
+                continue
+            kind, runtime = key.split("/", 1)
+            unit = "每人" if kind == "fight" else "每轮每人"
+            lines.append(
+                f"  {runtimes.RUNTIME_KINDS.get(kind, kind)}/{runtime}: "
+                f"a={fit[0]:.3f}s, {unit} {fit[1] * 1000:.4f}ms"
+                f", 有效样本 {sums[0]:.1f}, 误差 {sums[5] * 100:.0f}%"
+            )
+        return "\n".join(lines)
+
+    def save(self, path: Path) -> None:
+        with self.lock:
+            data = {"sums": self.sums}
+        try:
+            path.write_text(json.dumps(data), encoding="utf-8")
+        except OSError as e:
+            print(f"[namer] 无法保存耗时模型 {path}: {e}")
+
+    def load(self, path: Path) -> None:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        sums = data.get("sums") if isinstance(data, dict) else None
+        if isinstance(sums, dict):
+            with self.lock:
+                self.sums = {
+                    str(key): [float(value) for value in values]
+                    for key, values in sums.items()
+                    if isinstance(values, list) and len(values) == 6
+                }
+
+
+def observe_eta(
+    kind: str,
+    runtime: str,
+    mode: str,
+    input_text: str,
+    rounds: int,
+    output: str,
+    seconds: float,
+) -> None:
+    """记一次真正跑了的 namerena (不算缓存), 按精度提前停的用实际跑的轮数"""
+    model = ETA_MODEL
+    if model is None:
+        return
+    if mode == "fight-batch":
+        units = float(
+            sum(records.count_players(line) for line in input_text.split("\n") if line.strip())
+        )
+    else:
+        data = records.parse_record(output)
+        if data is not None and data.get("round"):
+            rounds = int(data["round"])
+        units = eta_units(kind, input_text, rounds)
+    model.observe(kind, runtime, units, seconds)
+
+
+def predict_inputs(inputs: list[tuple[str, str]], parallel: int) -> float:
+    """
+    预计跑完一堆 (md5-api 模式, 输入) 要多久
+    按 parallel 个位置, 每次把下一个交给最先空出来的位置
+    会分片跑的评分/胜率拆成 bench_shard_count 段, 每段按自己的轮数估计, 各占一个位置
+    """
+    model = ETA_MODEL
+    free_at = [0.0] * max(parallel, 1)
+    for mode, input_text in inputs:
+        kind = runtimes.runtime_kind(mode, input_text)
+        shards = 1 if kind == "fight" else evaluation.bench_shard_count(input_text)
+        units = eta_units(kind, input_text, config.TSWN_COMPARE_ROUNDS) / shards
+        runtime = runtimes.get_js_runtime(kind)
+        seconds = (
+            model.predict(kind, runtime, units)
+            if model is not None
+            else ETA_PRIOR_SECONDS.get(kind, ETA_PRIOR_SECONDS["score"]) * units
+        )
+        for _ in range(shards):
+            heapq.heappush(free_at, heapq.heappop(free_at) + seconds)
+    return max(free_at)
+
+
+def start_eta_model() -> None:
+    global ETA_MODEL
+
+    stop_eta_model()
+    model = EtaModel()
+    model.load(ETA_MODEL_PATH)
+    ETA_MODEL = model
+
+
+def stop_eta_model() -> None:
+    global ETA_MODEL
+
+    model = ETA_MODEL
+    ETA_MODEL = None
+    if model is not None:
+        model.save(ETA_MODEL_PATH)
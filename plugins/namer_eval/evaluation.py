@@ -0,0 +1,449 @@
+"""
+跑 namerena: 线程池, 分片, 批量对战, 以及加载时的后台准备
+"""
+
+from __future__ import annotations
+
+import json
+import time
+import threading
+import traceback
+
+from decimal import ROUND_HALF_UP, Decimal
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable
+from . import (
+    PLUGIN_ROOT,
+    config,
+    distributed,
+    eta_model,
+    js_pool,
+    process,
+    records,
+    result_cache,
+    runtimes,
+    tswn_cli,
+)
+
+DISCOVERY_THREAD: threading.Thread | None = None
+DISCOVERY_STOP = threading.Event()
+SHARD_STEP = 100
+"""
+分片的边界必须是这个数的倍数, md5.js 每 100 轮回报一次
+"""
+SHARD_MIN_ROUNDS = 1000
+"""
+每一段至少跑这么多轮, 太碎了反而不划算
+"""
+EVAL_EXECUTOR: ThreadPoolExecutor | None = None
+COMPARE_EXECUTOR: ThreadPoolExecutor | None = None
+SHARD_EXECUTOR: ThreadPoolExecutor | None = None
+
+
+def run_discovery() -> None:
+    """
+    加载时在后台把第一条命令要用的东西准备好:
+    每个 JS 运行时的版本号, tswn-cli 在哪 / 版本号, tswn 常驻进程
+    """
+    try:
+        for runtime in runtimes.available_js_runtimes():
+            if DISCOVERY_STOP.is_set():
+                return
+            runtimes.resolve_command_version([runtime])
+        if not config.USE_TSWN_COMPARE or DISCOVERY_STOP.is_set():
+            return
+        runner = tswn_cli.resolve_tswn_runner()
+        if runner is None or DISCOVERY_STOP.is_set():
+            return
+        tswn_version = tswn_cli.get_tswn_version()
+        backend = distributed.EVAL_BACKEND
+        if backend is not None:
+            backend.set_tswn_version(tswn_version)
+        if config.USE_TSWN_SERVER and not DISCOVERY_STOP.is_set():
+            # 先拉起一个放着, 第一次对比不用等启动
+            server = tswn_cli.acquire_tswn_server(runner)
+            if server is not None:
+                tswn_cli.release_tswn_server(server, True)
+    except Exception:
+        traceback.print_exc()
+
+
+def start_discovery() -> None:
+    global DISCOVERY_THREAD
+
+    stop_discovery()
+    runtimes.load_version_cache()
+    if not config.BACKGROUND_DISCOVERY:
+        return
+    DISCOVERY_STOP.clear()
+    thread = threading.Thread(target=run_discovery, daemon=True)
+    thread.start()
+    DISCOVERY_THREAD = thread
+
+
+def stop_discovery() -> None:
+    global DISCOVERY_THREAD
+
+    thread = DISCOVERY_THREAD
+    DISCOVERY_THREAD = None
+    if thread is not None:
+        DISCOVERY_STOP.set()
+        thread.join(timeout=5.0)
+
+
+def get_eval_executor() -> ThreadPoolExecutor:
+    global EVAL_EXECUTOR
+
+    if EVAL_EXECUTOR is None:
+        EVAL_EXECUTOR = ThreadPoolExecutor(
+            max_workers=distributed.eval_parallelism(), thread_name_prefix="namerena-eval"
+        )
+    return EVAL_EXECUTOR
+
+
+def get_compare_executor() -> ThreadPoolExecutor:
+    """tswn 对比单独一个池子, 不跟 namerena 抢位置, 两边才能真的同时跑"""
+    global COMPARE_EXECUTOR
+
+    if COMPARE_EXECUTOR is None:
+        COMPARE_EXECUTOR = ThreadPoolExecutor(
+            max_workers=distributed.eval_parallelism(), thread_name_prefix="tswn-compare"
+        )
+    return COMPARE_EXECUTOR
+
+
+def get_shard_executor() -> ThreadPoolExecutor:
+    """
+    分片单独一个池子: 分片是在 eval 池子的线程里提交的
+    如果共用一个池子, 线程全在等分片的时候就没人跑分片了
+    """
+    global SHARD_EXECUTOR
+
+    if SHARD_EXECUTOR is None:
+        SHARD_EXECUTOR = ThreadPoolExecutor(
+            max_workers=distributed.eval_parallelism(), thread_name_prefix="namerena-shard"
+        )
+    return SHARD_EXECUTOR
+
+
+def stop_eval_executor() -> None:
+    global EVAL_EXECUTOR, COMPARE_EXECUTOR, SHARD_EXECUTOR
+
+    for executor in (EVAL_EXECUTOR, COMPARE_EXECUTOR, SHARD_EXECUTOR):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    EVAL_EXECUTOR = None
+    COMPARE_EXECUTOR = None
+    SHARD_EXECUTOR = None
+
+
+def submit_tswn(
+    func: Callable[..., records.EvalResult | None], *args: str
+) -> Future[records.EvalResult | None] | None:
+    """在后台开始跑 tswn 对比, 没开对比就返回 None"""
+    if not config.USE_TSWN_COMPARE or tswn_cli.resolve_tswn_runner() is None:
+        return None
+    return process.submit_in_context(get_compare_executor(), func, *args)
+
+
+def tswn_result_of(
+    future: Future[records.EvalResult | None] | None,
+) -> records.EvalResult | None:
+    if future is None:
+        return None
+    try:
+        result = future.result()
+    except Exception as e:
+        return records.EvalResult(f"发生错误: {e}", 0.0)
+    if result is None:
+        return None
+    return records.EvalResult(*result)
+
+
+def run_namerena_many(
+    inputs: list[str],
+    precision: float | None = None,
+    on_progress: list[Callable[[str], None] | None] | None = None,
+) -> list[records.EvalResult]:
+    """
+    并行运行一堆 namerena 输入, 结果按输入顺序返回
+    on_progress 和 inputs 一一对应
+    """
+    callbacks = on_progress if on_progress is not None else [None] * len(inputs)
+
+    def run_one(job: tuple[str, Callable[[str], None] | None]) -> records.EvalResult:
+        return run_namerena(job[0], precision=precision, on_progress=job[1])
+
+    if len(inputs) <= 1:
+        return [run_one(job) for job in zip(inputs, callbacks)]
+    executor = get_eval_executor()
+    futures = [process.submit_in_context(executor, run_one, job) for job in zip(inputs, callbacks)]
+    return [future.result() for future in futures]
+
+
+def run_namerena(
+    input_text: str,
+    fight_mode: bool = False,
+    precision: float | None = None,
+    on_progress: Callable[[str], None] | None = None,
+) -> records.EvalResult:
+    """
+    运行namerena
+    precision: 评分/胜率的目标置信区间半宽 (百分比), None 表示用配置里的
+    on_progress: 跑评分/胜率时的进度回调 (只有常驻进程池支持)
+    """
+    mode = "fight" if fight_mode else "any"
+    if precision is None:
+        precision = config.BENCH_PRECISION
+    cache_mode = f"namerena-{mode}.json"
+    if precision > 0 and not fight_mode:
+        cache_mode += f"@{precision:g}"
+    runtime = runtimes.get_js_runtime(runtimes.runtime_kind(mode, input_text))
+    result = result_cache.cached_eval(
+        result_cache.cache_key(cache_mode, input_text, runtime),
+        lambda: _run_namerena(input_text, fight_mode, precision, on_progress),
+    )
+    assert result is not None
+    return records.decode_record(result)
+
+
+def _run_namerena(
+    input_text: str,
+    fight_mode: bool = False,
+    precision: float = 0.0,
+    on_progress: Callable[[str], None] | None = None,
+) -> tuple[str, float, bool]:
+    """真正运行namerena, 返回 (JSON 输出, 耗时, 是否成功)"""
+    runner_path = PLUGIN_ROOT / "md5" / "md5-api.js"
+    if not runner_path.exists():
+        return "未找到namerena运行文件", 0.0, False
+    mode = "fight" if fight_mode else "any"
+    runtime = runtimes.get_js_runtime(runtimes.runtime_kind(mode, input_text))
+    run_cmd = [
+        runtime,
+        str(runner_path),
+        mode,
+        str(config.TSWN_COMPARE_ROUNDS),
+        "--json",
+    ]
+    if precision > 0 and not fight_mode:
+        run_cmd.append(f"--precision={precision}")
+
+    start_time = time.time()
+    ok = False
+    pool = distributed.eval_pool()
+    if pool is not None and not fight_mode and precision <= 0:
+        shards = bench_shard_count(input_text)
+        if shards > 1:
+            return _run_namerena_sharded(pool, input_text, shards, on_progress)
+    if pool is not None:
+        try:
+            result = pool.run(
+                mode,
+                input_text,
+                config.TSWN_COMPARE_ROUNDS,
+                precision,
+                None if fight_mode else on_progress,
+                as_json=True,
+            )
+            ok = True
+        except process.WorkerError as e:
+            result = f"发生错误: {e}"
+        except Exception as e:
+            result = f"发生错误: {e}\n{traceback.format_exc()}"
+        return result.strip(), time.time() - start_time, ok
+
+    try:
+        returncode, stdout, stderr = process.run_child(
+            run_cmd,
+            input_text,
+            PLUGIN_ROOT / "md5",
+            runtimes.code_cache_env(runtime),
+            runtimes.runtime_kind(mode, input_text),
+        )
+        ok = returncode == 0
+        result = stdout if ok else stderr
+        if ok:
+            eta_model.observe_eta(
+                runtimes.runtime_kind(mode, input_text),
+                runtime,
+                mode,
+                input_text,
+                config.TSWN_COMPARE_ROUNDS,
+                stdout.strip(),
+                time.time() - start_time,
+            )
+    except process.WorkerError as e:
+        result = f"发生错误: {e}"
+    except Exception as e:
+        result = f"发生错误: {e}\n{traceback.format_exc()}"
+    end_time = time.time()
+    return result.strip(), end_time - start_time, ok
+
+
+def bench_shard_count(input_text: str) -> int:
+    """这个输入拆成几段跑, 1 表示不拆"""
+    pool = distributed.eval_pool()
+    if pool is None or records.bench_kind(input_text) == "fight":
+        return 1
+    if config.TSWN_COMPARE_ROUNDS % SHARD_STEP != 0:
+        return 1
+    shards = config.BENCH_SHARDS if config.BENCH_SHARDS > 0 else pool.size
+    return max(1, min(shards, config.TSWN_COMPARE_ROUNDS // SHARD_MIN_ROUNDS))
+
+
+def shard_ranges(total_round: int, shards: int) -> list[tuple[int, int]]:
+    """把 total_round 轮按 SHARD_STEP 对齐切成 shards 段, 返回 [(起始轮数, 轮数)]"""
+    steps = total_round // SHARD_STEP
+    ranges = []
+    for i in range(shards):
+        start = steps * i // shards * SHARD_STEP
+        end = steps * (i + 1) // shards * SHARD_STEP
+        ranges.append((start, end - start))
+    return ranges
+
+
+def js_fixed(value: float, digits: int) -> str:
+    """和 JS 的 toFixed 一样 .5 往上进, Python 自己的格式化是银行家舍入"""
+    return str(
+        Decimal(value).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP)
+    )
+
+
+def merge_shards(shards: list[dict]) -> dict:
+    """
+    把几段分片的结果拼成和 md5-api.ts 里 bench_record (不按精度跑) 一样的结果
+    每段的种子和连续跑的时候一样, 所以拼出来的数字也一模一样
+    """
+    kind = shards[0]["kind"]
+    counts: list[int] = []
+    for shard in sorted(shards, key=lambda shard: shard["offset"]):
+        base = counts[-1] if counts else 0
+        counts.extend(base + count for count in shard["counts"])
+    used = len(counts) * SHARD_STEP
+    success = counts[-1]
+    # 胜率按百分比显示, 评分按万分比显示
+    scale = 100 if kind == "win-rate" else 10000
+    unit = "%" if kind == "win-rate" else ""
+    value = success * scale / used
+    if kind == "win-rate":
+        text = f"最终胜率:|{js_fixed(value, 4)}%|({used}轮)"
+    else:
+        text = f"分数:|{js_fixed(value, 2)}|({used}轮)"
+    checkpoints = [
+        [round_count, count * scale / round_count]
+        for round_count, count in (
+            ((i + 1) * SHARD_STEP, count) for i, count in enumerate(counts)
+        )
+        if round_count % config.PROGRESS_ROUNDS == 0
+    ]
+    if used > config.PROGRESS_ROUNDS:
+        for round_count, checkpoint in checkpoints:
+            text += f"\n{js_fixed(checkpoint, 2)}{unit}({round_count})"
+    return {
+        "kind": kind,
+        "text": text,
+        "value": value,
+        "round": used,
+        "checkpoints": checkpoints,
+    }
+
+
+def _run_namerena_sharded(
+    pool: js_pool.JsWorkerPool | distributed.DistributedPool,
+    input_text: str,
+    shards: int,
+    on_progress: Callable[[str], None] | None = None,
+) -> tuple[str, float, bool]:
+    """把一次评分/胜率拆成几段分给不同的常驻进程跑, 再拼回来"""
+    start_time = time.time()
+    executor = get_shard_executor()
+    futures = [
+        process.submit_in_context(executor, pool.run, "shard", input_text, size, offset=offset)
+        for offset, size in shard_ranges(config.TSWN_COMPARE_ROUNDS, shards)
+    ]
+    results = []
+    try:
+        for done, future in enumerate(as_completed(futures), start=1):
+            results.append(json.loads(future.result()))
+            if on_progress is not None:
+                on_progress(f"分片 {done}/{len(futures)}")
+        output = json.dumps(merge_shards(results), ensure_ascii=False)
+        ok = True
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        output = f"发生错误: {e}\n{traceback.format_exc()}"
+        ok = False
+    return output.strip(), time.time() - start_time, ok
+
+
+def run_namerena_fights(fights: list[list[str]]) -> list[records.EvalResult]:
+    """
+    批量跑对战, 每一个元素是一场对战的名字列表
+    先查缓存, 没命中的放在一起交给 md5-api.js fight-batch, 只启动一次
+    """
+    results: list[records.EvalResult | None] = [None] * len(fights)
+    runtime = runtimes.get_js_runtime("fight")
+    keys = [
+        result_cache.cache_key("namerena-fight", "\n".join(names), runtime) for names in fights
+    ]
+    cache = result_cache.EVAL_CACHE
+    missing = []
+    for idx, key in enumerate(keys):
+        start_time = time.time()
+        output = cache.get(key) if cache is not None else None
+        if output is not None:
+            results[idx] = records.EvalResult(output, time.time() - start_time, True)
+        else:
+            missing.append(idx)
+
+    if missing:
+        batch_input = "\n".join("+".join(fights[idx]) for idx in missing)
+        output, cost_time, ok = _run_namerena_batch(batch_input)
+        winners = output.split("\n")
+        if ok and len(winners) != len(missing):
+            ok = False
+            output = f"批量对战结果数量不对: {len(winners)}/{len(missing)}\n{output}"
+        # 总耗时平摊到每一场
+        each_cost = cost_time / len(missing)
+        for pos, idx in enumerate(missing):
+            if not ok:
+                results[idx] = records.EvalResult(output, each_cost)
+                continue
+            results[idx] = records.EvalResult(winners[pos], each_cost)
+            if cache is not None and not winners[pos].startswith("错误: "):
+                cache.put(keys[idx], winners[pos], each_cost)
+    return [result for result in results if result is not None]
+
+
+def _run_namerena_batch(batch_input: str) -> tuple[str, float, bool]:
+    """一次跑多场对战, 输出一行一个赢家"""
+    runner_path = PLUGIN_ROOT / "md5" / "md5-api.js"
+    if not runner_path.exists():
+        return "未找到namerena运行文件", 0.0, False
+
+    start_time = time.time()
+    pool = distributed.eval_pool()
+    try:
+        if pool is not None:
+            output = pool.run("fight-batch", batch_input, config.TSWN_COMPARE_ROUNDS)
+            ok = True
+        else:
+            returncode, stdout, stderr = process.run_child(
+                [runtimes.get_js_runtime("fight"), str(runner_path), "fight-batch"],
+                batch_input,
+                PLUGIN_ROOT / "md5",
+                runtimes.code_cache_env(runtimes.get_js_runtime("fight")),
+                "fight",
+                len(batch_input.split("\n")),
+            )
+            ok = returncode == 0
+            output = stdout if ok else stderr
+    except process.WorkerError as e:
+        output = f"发生错误: {e}"
+        ok = False
+    except Exception as e:
+        output = f"发生错误: {e}\n{traceback.format_exc()}"
+        ok = False
+    return output.strip(), time.time() - start_time, ok
@@ -0,0 +1,346 @@
+"""
+命令调度: 房间之间 / 用户之间轮流, 有并发和排队上限
+"""
+
+from __future__ import annotations
+
+import heapq
+import time
+import threading
+import traceback
+import contextvars
+
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Callable
+
+from . import config, process
+
+if TYPE_CHECKING:
+    from ica_typing import ReciveMessage
+
+JOB_SCHEDULER: JobScheduler | None = None
+
+
+class NamerJob:
+    """排队中的一条命令"""
+
+    def __init__(
+        self,
+        msg: ReciveMessage,
+        client,
+        command: str,
+        func: Callable[..., None],
+        args: tuple,
+        predicted: float,
+    ) -> None:
+        self.msg = msg
+        self.client = client
+        self.command = command
+        self.func = func
+        self.args = args
+        self.user = msg_user(msg)
+        self.room = msg_room(msg)
+        self.user_name = msg_user_name(msg)
+        self.predicted = predicted
+        """
+        按耗时模型估计的执行时间
+        """
+        self.created = time.time()
+        self.started = 0.0
+        self.cancelled = threading.Event()
+        self.kill_hooks: list[Callable[[], None]] = []
+        self.hooks_lock = threading.Lock()
+
+    def cancel(self) -> None:
+        with self.hooks_lock:
+            self.cancelled.set()
+            hooks = list(self.kill_hooks)
+        for hook in hooks:
+            hook()
+
+
+class JobClient:
+    """转发给真正的 client, 命令取消之后就不再往外发消息了"""
+
+    def __init__(self, job: NamerJob) -> None:
+        self.job = job
+
+    def send_message(self, message):
+        if self.job.cancelled.is_set():
+            return None
+        return self.job.client.send_message(message)
+
+
+def msg_user(msg: ReciveMessage) -> str:
+    return str(getattr(msg, "sender_id", ""))
+
+
+def msg_room(msg: ReciveMessage) -> str:
+    # ica 是 room_id, tailchat 是 converse_id
+    room = getattr(msg, "room_id", None)
+    if room is None:
+        room = getattr(msg, "converse_id", None)
+    return str(room)
+
+
+def msg_user_name(msg: ReciveMessage) -> str:
+    return str(getattr(msg, "sender_name", None) or msg_user(msg))
+
+
+class JobScheduler:
+    """
+    跑 namerena 的命令的调度器
+    - 房间之间轮流, 同一个房间里的用户之间轮流, 谁也不能一直霸占
+    - 每个用户 / 房间同时执行的命令数有上限
+    - 排队总数有上限, 满了直接拒绝
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queued: int,
+        user_limit: int,
+        user_queue: int,
+        room_limit: int,
+    ) -> None:
+        self.workers = max(workers, 1)
+        self.max_queued = max_queued
+        self.user_limit = max(user_limit, 1)
+        self.user_queue = user_queue
+        self.room_limit = room_limit
+        self.rooms: OrderedDict[str, OrderedDict[str, deque[NamerJob]]] = OrderedDict()
+        self.queued = 0
+        self.running: list[NamerJob] = []
+        self.user_running: dict[str, int] = {}
+        self.room_running: dict[str, int] = {}
+        self.done = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._loop, name=f"namerena-job-{index}", daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self) -> None:
+        with self.condition:
+            self.stopping = True
+            self.rooms.clear()
+            self.queued = 0
+            self.condition.notify_all()
+
+    def _startable(self, job: NamerJob) -> bool:
+        if self.user_running.get(job.user, 0) >= self.user_limit:
+            return False
+        if self.room_limit > 0 and self.room_running.get(job.room, 0) >= self.room_limit:
+            return False
+        return True
+
+    @staticmethod
+    def _pick(
+        rooms: OrderedDict[str, OrderedDict[str, deque[NamerJob]]],
+        startable: Callable[[NamerJob], bool] | None,
+    ) -> NamerJob | None:
+        """按轮转顺序取下一个能开始的任务, 取到之后把对应的房间和用户挪到队尾"""
+        for room, users in rooms.items():
+            for user, jobs in users.items():
+                if startable is not None and not startable(jobs[0]):
+                    continue
+                job = jobs.popleft()
+                if jobs:
+                    users.move_to_end(user)
+                else:
+                    del users[user]
+                if users:
+                    rooms.move_to_end(room)
+                else:
+                    del rooms[room]
+                return job
+        return None
+
+    def _order(self) -> list[NamerJob]:
+        """不考虑并发上限的话, 排着的任务会按这个顺序开始"""
+        rooms = OrderedDict(
+            (room, OrderedDict((user, deque(jobs)) for user, jobs in users.items()))
+            for room, users in self.rooms.items()
+        )
+        order = []
+        while True:
+            job = self._pick(rooms, None)
+            if job is None:
+                return order
+            order.append(job)
+
+    @staticmethod
+    def estimate(job: NamerJob) -> float:
+        return job.predicted
+
+    def _eta(self, order: list[NamerJob], target: NamerJob) -> float:
+        """把正在跑的和排在前面的任务按估计耗时摊到 workers 个位置上, 算出 target 什么时候开始"""
+        now = time.time()
+        free_at = [
+            max(self.estimate(job) - (now - job.started), 0.0) for job in self.running
+        ]
+        free_at += [0.0] * (self.workers - len(free_at))
+        heapq.heapify(free_at)
+        for job in order:
+            start = heapq.heappop(free_at)
+            if job is target:
+                return start
+            heapq.heappush(free_at, start + self.estimate(job))
+        return 0.0
+
+    def submit(self, job: NamerJob) -> None:
+        with self.condition:
+            if self.stopping:
+                job.client.send_message(job.msg.reply_with("插件正在卸载, 请稍后再试"))
+                return
+            if self.queued >= self.max_queued:
+                self.rejected += 1
+                job.client.send_message(
+                    job.msg.reply_with(f"排队的命令太多了 ({self.queued} 个), 请稍后再试")
+                )
+                return
+            user_jobs = self.rooms.get(job.room, OrderedDict()).get(job.user)
+            queued_by_user = sum(
+                len(users.get(job.user, ())) for users in self.rooms.values()
+            )
+            if self.user_queue > 0 and queued_by_user >= self.user_queue:
+                self.rejected += 1
+                job.client.send_message(
+                    job.msg.reply_with(f"你已经有 {queued_by_user} 个命令在排队了, 等跑完再来")
+                )
+                return
+            if user_jobs is None:
+                user_jobs = self.rooms.setdefault(job.room, OrderedDict())[job.user] = deque()
+            # 同一个人的命令之间短的先跑, 不同人之间还是轮流
+            position = len(user_jobs)
+            while position > 0 and user_jobs[position - 1].predicted > job.predicted:
+                position -= 1
+            user_jobs.insert(position, job)
+            self.queued += 1
+            order = self._order()
+            position = order.index(job)
+            free = self.workers - len(self.running)
+            starts_now = position < free and self._startable(job)
+            eta = 0.0 if starts_now else self._eta(order, job)
+            self.condition.notify()
+        if not starts_now:
+            job.client.send_message(
+                job.msg.reply_with(
+                    f"排队中, 前面还有 {position} 个命令, {len(self.running)} 个正在跑"
+                    f", 预计 {eta:.0f}s 后开始"
+                )
+            )
+
+    def _loop(self) -> None:
+        while True:
+            with self.condition:
+                while True:
+                    if self.stopping:
+                        return
+                    job = (
+                        self._pick(self.rooms, self._startable)
+                        if len(self.running) < self.workers
+                        else None
+                    )
+                    if job is not None:
+                        break
+                    self.condition.wait()
+                self.queued -= 1
+                job.started = time.time()
+                self.running.append(job)
+                self.user_running[job.user] = self.user_running.get(job.user, 0) + 1
+                self.room_running[job.room] = self.room_running.get(job.room, 0) + 1
+            client = JobClient(job)
+            context = contextvars.copy_context()
+            context.run(process.CURRENT_JOB.set, job)
+            try:
+                context.run(job.func, job.msg, client, *job.args)
+            except Exception as e:
+                client.send_message(
+                    job.msg.reply_with(f"发生错误: {e}\n{traceback.format_exc()}")
+                )
+            finally:
+                with self.condition:
+                    self.running.remove(job)
+                    self.user_running[job.user] -= 1
+                    self.room_running[job.room] -= 1
+                    if job.cancelled.is_set():
+                        self.cancelled += 1
+                    else:
+                        self.done += 1
+                    self.condition.notify_all()
+
+    def cancel(self, user: str) -> tuple[int, int]:
+        """取消一个用户的所有命令, 返回 (正在跑的个数, 排队的个数)"""
+        with self.condition:
+            queued = 0
+            for room in list(self.rooms):
+                users = self.rooms[room]
+                jobs = users.pop(user, None)
+                if jobs:
+                    queued += len(jobs)
+                if not users:
+                    del self.rooms[room]
+            self.queued -= queued
+            self.cancelled += queued
+            running = [
+                job
+                for job in self.running
+                if job.user == user and not job.cancelled.is_set()
+            ]
+        # 杀进程在锁外面做, 被杀的命令收尾的时候也要拿锁
+        for job in running:
+            job.cancel()
+        return len(running), queued
+
+    def describe(self) -> str:
+        with self.condition:
+            now = time.time()
+            lines = [
+                f"正在跑 {len(self.running)}/{self.workers} 个, 排队 {self.queued}/{self.max_queued} 个"
+                f", 已完成 {self.done} 个, 拒绝 {self.rejected} 个, 取消 {self.cancelled} 个"
+            ]
+            for job in self.running:
+                lines.append(
+                    f"  [跑] {job.user_name} {job.command} 已跑 {now - job.started:.0f}s"
+                    f" / 预计 {self.estimate(job):.0f}s"
+                )
+            order = self._order()
+            for position, job in enumerate(order, 1):
+                lines.append(
+                    f"  [{position}] {job.user_name} {job.command}"
+                    f" 等了 {now - job.created:.0f}s, 预计 {self._eta(order, job):.0f}s 后开始"
+                )
+        return "\n".join(lines)
+
+
+def start_job_scheduler() -> None:
+    global JOB_SCHEDULER
+
+    stop_job_scheduler()
+    scheduler = JobScheduler(
+        config.JOB_WORKERS,
+        config.JOB_QUEUE_SIZE,
+        config.JOB_USER_LIMIT,
+        config.JOB_USER_QUEUE,
+        config.JOB_ROOM_LIMIT,
+    )
+    scheduler.start()
+    JOB_SCHEDULER = scheduler
+
+
+def stop_job_scheduler() -> None:
+    global JOB_SCHEDULER
+
+    scheduler = JOB_SCHEDULER
+    JOB_SCHEDULER = None
+    if scheduler is not None:
+        scheduler.stop()
@@ -0,0 +1,416 @@
+"""
+常驻的 md5-api.js 进程池, 以及加载时给每个运行时测速
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import time
+import threading
+
+from pathlib import Path
+from typing import Callable
+from . import PLUGIN_ROOT, config, distributed, eta_model, process, runtimes
+
+RUNTIME_CALIBRATION_THREAD: threading.Thread | None = None
+RUNTIME_CALIBRATION_STOP = threading.Event()
+CALIBRATION_BENCHES: dict[str, tuple[str, int, int]] = {
+    "fight": ("fight", 0, 20),
+    "win-rate": ("any", 1000, 1),
+    "score": ("any", 1000, 1),
+}
+"""
+每种模式的测速方式 (md5-api 的模式, 轮数, 重复次数)
+"""
+CALIBRATION_INPUTS = {
+    "fight": "calibrate@shenjack\nnamerena@shenjack",
+    "win-rate": "!test!\n\ncalibrate@shenjack\n\nnamerena@shenjack",
+    "score": "!test!\n\ncalibrate@shenjack",
+}
+SIBLING_IDLE_TIMEOUT = 600.0
+"""
+另一个运行时的进程池多久没用就关掉 (秒)
+"""
+WORKER_HEALTH_INTERVAL = 30.0
+"""
+常驻进程健康检查间隔 (秒)
+"""
+JS_POOL: JsWorkerPool | None = None
+
+
+class JsWorkerPool:
+    """
+    md5-api.js 常驻进程池
+    每个进程同时只跑一个请求, 空闲的进程放在 idle 队列里
+    """
+
+    def __init__(self, size: int, runtime: str, runner_path: Path) -> None:
+        self.size = size
+        self.runtime = runtime
+        self.runner_path = runner_path
+        self.workers = [process.JsWorker(runtime, runner_path) for _ in range(size)]
+        self.idle: queue.Queue[process.JsWorker] = queue.Queue()
+        self.restarts = 0
+        self.startups: list[tuple[str, float, float]] = []
+        """
+        每次启动进程的 (缓存状态, 启动毫秒数, 加载毫秒数), 只留最近的
+        """
+        self.siblings: dict[str, JsWorkerPool] = {}
+        """
+        测速之后某些模式换了运行时, 用到的时候再拉起一个小的池子, 太久没用就关掉
+        """
+        self.siblings_lock = threading.Lock()
+        self.last_used = time.time()
+        self.stopping = threading.Event()
+        self.health_thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """
+        这里只拉起进程 (运行时找不到会直接报错), 等进程准备好放在后台
+        准备好一个放进 idle 一个, 加载不用等, 第一条命令也不用等所有进程
+        """
+        env = runtimes.code_cache_env(self.runtime)
+        for worker in self.workers:
+            worker.env = env
+            worker.start()
+        self.health_thread = threading.Thread(target=self._health_loop, daemon=True)
+        self.health_thread.start()
+
+    def _record_startup(self, worker: process.JsWorker) -> None:
+        startup = worker.startup_info()
+        if startup is not None:
+            self.startups.append(startup)
+            del self.startups[:-100]
+
+    def _restart(self, worker: process.JsWorker) -> None:
+        worker.stop(timeout=1.0)
+        if not self.stopping.is_set():
+            worker.runtime = self.runtime
+            worker.env = runtimes.code_cache_env(self.runtime)
+            worker.start()
+            self._record_startup(worker)
+            self.restarts += 1
+
+    def describe(self) -> str:
+        lines = [f"常驻进程: {self.size} 个 ({self.runtime}), 重启 {self.restarts} 次"]
+        groups: dict[str, list[tuple[str, float, float]]] = {}
+        for startup in self.startups:
+            groups.setdefault(startup[0], []).append(startup)
+        names = {"miss": "冷启动", "hit": "热启动", "off": "无缓存", "bun": "bun 缓存"}
+        for cache, startups in groups.items():
+            ready_ms = sum(startup[1] for startup in startups) / len(startups)
+            load_ms = sum(startup[2] for startup in startups) / len(startups)
+            lines.append(
+                f"  {names.get(cache, cache)}: {len(startups)} 次, "
+                f"平均 {ready_ms:.0f}ms (加载 md5.js {load_ms:.0f}ms)"
+            )
+        for pool in list(self.siblings.values()):
+            lines.append(pool.describe())
+        return "\n".join(lines)
+
+    def _health_loop(self) -> None:
+        # 进程在 start 里已经一起拉起来了, 挨个等的时候启动时间可以重叠
+        for worker in self.workers:
+            if self.stopping.is_set():
+                return
+            self._record_startup(worker)
+            if worker.runtime != self.runtime:
+                # 还没准备好就测完速换了运行时
+                self._switch(worker)
+            self.idle.put(worker)
+        while not self.stopping.wait(WORKER_HEALTH_INTERVAL):
+            self._stop_idle_siblings()
+            self._check_idle()
+
+    def _check_idle(self) -> None:
+        """
+        只检查当前空闲的进程, 忙的进程在用的时候自然会暴露问题
+        还是旧运行时的 (换运行时的时候正忙着) 顺便换掉
+        """
+        for _ in range(self.idle.qsize()):
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker.runtime != self.runtime:
+                self._switch(worker)
+            elif not worker.ping():
+                self._restart(worker)
+            self.idle.put(worker)
+
+    def _switch(self, worker: process.JsWorker) -> None:
+        old_runtime = worker.runtime
+        try:
+            self._restart(worker)
+        except OSError:
+            # 新的运行时起不来, 整个池子退回原来的
+            self.runtime = old_runtime
+            self._restart(worker)
+
+    def switch_runtime(self, runtime: str) -> None:
+        """
+        测速之后主运行时变了, 把进程换成新的运行时
+        空闲的马上换, 正忙的等健康检查的时候再换, 换的时候别的进程照常接活
+        """
+        if runtime == self.runtime or self.stopping.is_set():
+            return
+        self.runtime = runtime
+        self._check_idle()
+
+    def sibling(self, runtime: str) -> JsWorkerPool:
+        """
+        换一个运行时的进程池, 大小按 sibling_worker_count, 默认只有主进程池的四分之一
+        不然换了运行时进程数就翻倍了
+        """
+        if runtime == self.runtime:
+            return self
+        with self.siblings_lock:
+            pool = self.siblings.get(runtime)
+            if pool is None:
+                size = (
+                    config.SIBLING_WORKER_COUNT
+                    if config.SIBLING_WORKER_COUNT > 0
+                    else self.size // 4
+                )
+                pool = JsWorkerPool(max(min(size, self.size), 1), runtime, self.runner_path)
+                pool.start()
+                self.siblings[runtime] = pool
+            pool.last_used = time.time()
+            return pool
+
+    def _stop_idle_siblings(self) -> None:
+        """关掉太久没用, 而且现在没有请求在跑的另一个运行时的进程池"""
+        deadline = time.time() - SIBLING_IDLE_TIMEOUT
+        with self.siblings_lock:
+            idle = {
+                runtime: pool
+                for runtime, pool in self.siblings.items()
+                if pool.last_used < deadline and pool.idle.qsize() == pool.size
+            }
+            for runtime in idle:
+                del self.siblings[runtime]
+        for pool in idle.values():
+            pool.shutdown()
+
+    def run(
+        self,
+        mode: str,
+        input_text: str,
+        round: int,
+        precision: float = 0.0,
+        on_progress: Callable[[str], None] | None = None,
+        as_json: bool = False,
+        offset: int = 0,
+    ) -> str:
+        if self.stopping.is_set():
+            raise process.WorkerError("进程池已关闭")
+        kind = runtimes.runtime_kind(mode, input_text)
+        runtime = runtimes.get_js_runtime(kind)
+        if runtime != self.runtime:
+            try:
+                pool = self.sibling(runtime)
+            except OSError:
+                # 另一个运行时起不来, 还是用自己
+                pool = self
+            if pool is not self:
+                return pool.run(
+                    mode, input_text, round, precision, on_progress, as_json, offset
+                )
+        worker = self._acquire()
+        try:
+            payload = {
+                "mode": mode,
+                "input": input_text,
+                "round": round,
+                "precision": precision,
+                "json": as_json,
+                "offset": offset,
+            }
+            if on_progress is not None:
+                payload["progress"] = config.PROGRESS_ROUNDS
+            count = len(input_text.split("\n")) if mode == "fight-batch" else 1
+            for attempt in range(2):
+                if not worker.alive():
+                    self._restart(worker)
+                try:
+                    request_start = time.time()
+                    with process.kill_on_cancel(worker.kill):
+                        response = worker.request(
+                            payload, process.eval_timeout(kind, count), on_progress
+                        )
+                    if response.get("ok"):
+                        eta_model.observe_eta(
+                            kind,
+                            worker.runtime,
+                            mode,
+                            input_text,
+                            round,
+                            str(response.get("output") or ""),
+                            time.time() - request_start,
+                        )
+                    break
+                except process.WorkerTimeout:
+                    # 卡住了, 杀掉换一个, 再试多半也一样
+                    self._restart(worker)
+                    process.count_kill("timeout", kind)
+                    raise
+                except process.JobCancelled:
+                    raise
+                except process.WorkerError:
+                    self._restart(worker)
+                    if process.is_cancelled():
+                        process.count_kill("cancel", kind)
+                        raise process.JobCancelled("命令已取消") from None
+                    # 崩了就重启, 再试一次
+                    process.count_kill("crash", kind)
+                    if attempt == 1:
+                        raise
+            if not response.get("ok"):
+                raise process.WorkerError(str(response.get("error") or "未知错误"))
+            return str(response.get("output") or "")
+        finally:
+            self.idle.put(worker)
+
+    def _acquire(self) -> process.JsWorker:
+        """等一个空闲的进程, 等的过程中命令被取消了就不等了"""
+        while True:
+            process.check_cancelled()
+            try:
+                return self.idle.get(timeout=1.0)
+            except queue.Empty:
+                if self.stopping.is_set():
+                    raise process.WorkerError("进程池已关闭") from None
+
+    def shutdown(self) -> None:
+        self.stopping.set()
+        for worker in self.workers:
+            worker.stop()
+        with self.siblings_lock:
+            siblings = list(self.siblings.values())
+            self.siblings = {}
+        for pool in siblings:
+            pool.shutdown()
+
+
+def start_js_pool() -> None:
+    global JS_POOL
+
+    stop_js_pool()
+    if not config.USE_WORKER_POOL:
+        return
+    runner_path = PLUGIN_ROOT / "md5" / "md5-api.js"
+    if not runner_path.exists():
+        return
+    runtimes.prune_code_cache()
+    size = config.WORKER_COUNT if config.WORKER_COUNT > 0 else (os.cpu_count() or 1)
+    pool = JsWorkerPool(size, runtimes.get_js_runtime(), runner_path)
+    try:
+        pool.start()
+    except OSError:
+        # 找不到 runtime 之类的, 退回每次单独起进程
+        pool.shutdown()
+        return
+    JS_POOL = pool
+
+
+def stop_js_pool() -> None:
+    global JS_POOL
+
+    pool = JS_POOL
+    JS_POOL = None
+    if pool is not None:
+        pool.shutdown()
+
+
+def calibrate_runtime(runtime: str, runner_path: Path) -> dict[str, float]:
+    """
+    用一个常驻进程给 runtime 跑一遍固定的小测速, 不算启动时间
+    返回 {模式: 每秒轮数}
+    """
+    worker = process.JsWorker(runtime, runner_path)
+    worker.env = runtimes.code_cache_env(runtime)
+    speeds: dict[str, float] = {}
+    try:
+        worker.start()
+        if not worker.ping():
+            return speeds
+        for kind, (mode, rounds, repeat) in CALIBRATION_BENCHES.items():
+            if RUNTIME_CALIBRATION_STOP.is_set():
+                break
+            payload = {"mode": mode, "input": CALIBRATION_INPUTS[kind], "round": rounds}
+            start_time = time.time()
+            for _ in range(repeat):
+                if not worker.request(payload, distributed.AGENT_TIMEOUT).get("ok"):
+                    raise process.WorkerError("测速失败")
+            cost_time = max(time.time() - start_time, 1e-6)
+            speeds[kind] = (rounds or 1) * repeat / cost_time
+    except (OSError, process.WorkerError):
+        pass
+    finally:
+        worker.stop(timeout=1.0)
+    return speeds
+
+
+def run_runtime_calibration() -> None:
+    runner_path = PLUGIN_ROOT / "md5" / "md5-api.js"
+    if not runner_path.exists():
+        return
+    speed: dict[str, dict[str, float]] = {}
+    for runtime in runtimes.available_js_runtimes():
+        if RUNTIME_CALIBRATION_STOP.is_set():
+            return
+        for kind, value in calibrate_runtime(runtime, runner_path).items():
+            speed.setdefault(kind, {})[runtime] = value
+    if RUNTIME_CALIBRATION_STOP.is_set():
+        return
+    runtimes.RUNTIME_SPEED = speed
+    # 进程池是按测速之前的运行时建的
+    pool = JS_POOL
+    if pool is not None:
+        pool.switch_runtime(runtimes.get_js_runtime())
+
+
+def start_runtime_calibration() -> None:
+    """在后台测速, 测完之前先用默认的运行时"""
+    global RUNTIME_CALIBRATION_THREAD
+
+    stop_runtime_calibration()
+    if not config.RUNTIME_CALIBRATION:
+        return
+    RUNTIME_CALIBRATION_STOP.clear()
+    thread = threading.Thread(target=run_runtime_calibration, daemon=True)
+    thread.start()
+    RUNTIME_CALIBRATION_THREAD = thread
+
+
+def stop_runtime_calibration() -> None:
+    global RUNTIME_CALIBRATION_THREAD
+
+    thread = RUNTIME_CALIBRATION_THREAD
+    RUNTIME_CALIBRATION_THREAD = None
+    runtimes.RUNTIME_SPEED = {}
+    if thread is not None:
+        RUNTIME_CALIBRATION_STOP.set()
+        thread.join(timeout=5.0)
+
+
+def describe_runtimes() -> str:
+    pinned = runtimes.pinned_js_runtime()
+    if pinned is not None:
+        lines = [f"JS 运行时: {pinned} (配置指定)"]
+    else:
+        lines = [f"JS 运行时: {runtimes.get_js_runtime()} (按模式自动选择)"]
+    speed = runtimes.RUNTIME_SPEED
+    if not speed:
+        thread = RUNTIME_CALIBRATION_THREAD
+        lines.append("  测速中..." if thread is not None and thread.is_alive() else "  没有测速结果")
+        return "\n".join(lines)
+    for kind, name in runtimes.RUNTIME_KINDS.items():
+        speeds = speed.get(kind)
+        if not speeds:
+            continue
+        unit = "场/s" if kind == "fight" else "轮/s"
+        parts = [f"{runtime} {value:.0f}{unit}" for runtime, value in speeds.items()]
+        lines.append(f"  {name}: {', '.join(parts)} -> {runtimes.get_js_runtime(kind)}")
+    return "\n".join(lines)
@@ -0,0 +1,359 @@
+"""
+子进程: 超时, 资源上限, 取消, 以及常驻的 md5-api.js 子进程 (JsWorker)
+
+每条命令 (NamerJob) 放在 CURRENT_JOB 里跟着线程池走, 取消的时候按它找到要杀的进程
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import queue
+import signal
+import time
+import threading
+import contextvars
+import subprocess
+
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from . import config, job_queue, runtimes
+
+RESOURCE_LIMITS = False
+try:
+    # Windows 上没有, macOS 上没有 prlimit, 就只靠超时
+    import resource
+
+    RESOURCE_LIMITS = hasattr(resource, "prlimit")
+except ImportError:
+    pass
+CURRENT_JOB: contextvars.ContextVar[job_queue.NamerJob | None] = contextvars.ContextVar(
+    "namer_job", default=None
+)
+"""
+当前线程在替哪条命令干活, 取消的时候靠它找到在跑的进程
+"""
+EVAL_KILLS: dict[str, dict[str, int]] = {}
+"""
+被终止的任务 {原因: {模式: 次数}}
+"""
+EVAL_KILLS_LOCK = threading.Lock()
+
+
+class WorkerError(Exception):
+    """常驻进程出错 (崩溃/超时/返回错误)"""
+
+
+class WorkerTimeout(WorkerError):
+    """等太久了, 进程已经 (或者应该) 被杀掉"""
+
+
+class JobCancelled(WorkerError):
+    """命令被 /namer-cancel 取消了"""
+
+
+def apply_child_limits(proc: subprocess.Popen, cpu: bool = True) -> None:
+    """
+    子进程启动以后用 prlimit 设置资源上限
+    父进程是多线程的, fork 和 exec 之间跑 preexec_fn 不安全, 所以不用 preexec_fn
+    cpu: 常驻进程会一直累计 CPU 时间, 不能设 RLIMIT_CPU
+    """
+    if not RESOURCE_LIMITS:
+        return
+    cpu_limit = config.CHILD_CPU_LIMIT if cpu else 0
+    memory_limit = config.CHILD_MEMORY_LIMIT * 1024 * 1024
+    try:
+        if cpu_limit > 0:
+            # 到软上限发 SIGXCPU, 再多给 5 秒到硬上限直接 SIGKILL
+            resource.prlimit(proc.pid, resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 5))
+        if memory_limit > 0:
+            resource.prlimit(proc.pid, resource.RLIMIT_AS, (memory_limit, memory_limit))
+    except (ValueError, OSError):
+        # 比当前的硬上限还高, 或者进程已经退出了, 设不了就算了
+        pass
+
+
+def eval_timeout(kind: str, count: int = 1) -> float | None:
+    """
+    每种模式的超时 (秒), None 表示不限
+    count: 一次里面跑几个 (批量对战 / tswn 的 namer-pf)
+    """
+    timeout = {
+        "fight": config.FIGHT_TIMEOUT,
+        "win-rate": config.WIN_RATE_TIMEOUT,
+        "score": config.SCORE_TIMEOUT,
+        "search": config.SEARCH_MAX_SECONDS + config.SEARCH_TIMEOUT_MARGIN,
+        "version": config.VERSION_TIMEOUT,
+    }.get(kind, config.SCORE_TIMEOUT)
+    if timeout <= 0:
+        return None
+    return timeout * max(count, 1)
+
+
+def count_kill(reason: str, kind: str) -> None:
+    """reason: timeout (超时) / cancel (取消) / crash (崩溃或者超出资源上限)"""
+    with EVAL_KILLS_LOCK:
+        kinds = EVAL_KILLS.setdefault(reason, {})
+        kinds[kind] = kinds.get(kind, 0) + 1
+
+
+def describe_kills() -> str:
+    names = {"timeout": "超时", "cancel": "取消", "crash": "崩溃/超出资源上限"}
+    with EVAL_KILLS_LOCK:
+        parts = []
+        for reason, kinds in EVAL_KILLS.items():
+            detail = ", ".join(
+                f"{runtimes.RUNTIME_KINDS.get(kind, kind)} {count}" for kind, count in kinds.items()
+            )
+            parts.append(f"{names.get(reason, reason)} {sum(kinds.values())} ({detail})")
+    return f"被终止的任务: {'; '.join(parts) if parts else '无'}"
+
+
+def is_cancelled() -> bool:
+    job = CURRENT_JOB.get()
+    return job is not None and job.cancelled.is_set()
+
+
+def check_cancelled() -> None:
+    if is_cancelled():
+        raise JobCancelled("命令已取消")
+
+
+@contextmanager
+def kill_on_cancel(hook: Callable[[], None]):
+    """这段时间里如果当前命令被取消了, 就调用 hook (一般是杀进程)"""
+    job = CURRENT_JOB.get()
+    if job is None:
+        yield
+        return
+    with job.hooks_lock:
+        cancelled = job.cancelled.is_set()
+        if not cancelled:
+            job.kill_hooks.append(hook)
+    if cancelled:
+        hook()
+        raise JobCancelled("命令已取消")
+    try:
+        yield
+    finally:
+        with job.hooks_lock:
+            job.kill_hooks.remove(hook)
+
+
+def submit_in_context(executor: ThreadPoolExecutor, func: Callable, *args, **kwargs) -> Future:
+    """提交到线程池, 带上当前命令, 取消的时候才找得到线程池里在跑的进程"""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def run_child(
+    command: list[str],
+    input_text: str,
+    cwd: str | Path | None,
+    env: dict[str, str] | None,
+    kind: str,
+    count: int = 1,
+    limits: bool = True,
+    group: bool = False,
+) -> tuple[int, str, str]:
+    """
+    单独起一个子进程跑完, 返回 (返回码, stdout, stderr)
+    超时 / 被取消都会杀掉进程, 分别抛 WorkerTimeout / JobCancelled
+    group: 子进程自己还会起子进程 (cargo run, 进程池), 放进单独的进程组, 杀的时候一起杀
+    """
+    check_cancelled()
+    timeout = eval_timeout(kind, count)
+    group = group and os.name == "posix"
+    proc = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        cwd=cwd,
+        env=env,
+        start_new_session=group,
+    )
+    if limits:
+        apply_child_limits(proc)
+
+    def kill() -> None:
+        if not group:
+            proc.kill()
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    with kill_on_cancel(kill):
+        try:
+            stdout, stderr = proc.communicate(input_text, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill()
+            proc.communicate()
+            count_kill("timeout", kind)
+            raise WorkerTimeout(f"超时 ({timeout:g}s), 已终止") from None
+    if is_cancelled():
+        count_kill("cancel", kind)
+        raise JobCancelled("命令已取消")
+    if proc.returncode < 0:
+        # 被信号杀掉的, 基本是 RLIMIT_CPU / RLIMIT_AS
+        count_kill("crash", kind)
+    return proc.returncode, stdout, stderr
+
+
+WORKER_PING_TIMEOUT = 10.0
+
+
+class JsWorker:
+    """
+    一个常驻的 md5-api.js serve 进程
+    协议: stdin 一行一个 JSON 请求, stdout 一行一个 JSON 回复
+    """
+
+    def __init__(self, runtime: str, runner_path: Path) -> None:
+        self.runtime = runtime
+        self.runner_path = runner_path
+        self.cwd: str | Path | None = runner_path.parent
+        self.env: dict[str, str] | None = None
+        self.limits = True
+        self.proc: subprocess.Popen[str] | None = None
+        self.lines: queue.Queue[str | None] = queue.Queue()
+        self.stderr_tail: list[str] = []
+        self.next_id = 0
+        self.started_at = 0.0
+
+    def command(self) -> list[str]:
+        return [self.runtime, str(self.runner_path), "serve"]
+
+    def start(self) -> None:
+        self.lines = queue.Queue()
+        self.stderr_tail = []
+        self.proc = subprocess.Popen(
+            self.command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            cwd=self.cwd,
+            env=self.env,
+        )
+        if self.limits:
+            apply_child_limits(self.proc, cpu=False)
+        self.started_at = time.time()
+        threading.Thread(
+            target=self._read_stdout, args=(self.proc, self.lines), daemon=True
+        ).start()
+        threading.Thread(
+            target=self._read_stderr, args=(self.proc,), daemon=True
+        ).start()
+
+    @staticmethod
+    def _read_stdout(proc: subprocess.Popen[str], lines: queue.Queue) -> None:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            lines.put(line)
+        # EOF, 进程没了
+        lines.put(None)
+
+    def _read_stderr(self, proc: subprocess.Popen[str]) -> None:
+        assert proc.stderr is not None
+        for line in proc.stderr:
+            self.stderr_tail.append(line.rstrip())
+            del self.stderr_tail[:-20]
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def kill(self) -> None:
+        proc = self.proc
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+
+    def request(
+        self,
+        payload: dict,
+        timeout: float | None = None,
+        on_progress: Callable[[str], None] | None = None,
+    ) -> dict:
+        if not self.alive():
+            raise WorkerError("进程未运行")
+        assert self.proc is not None and self.proc.stdin is not None
+        self.next_id += 1
+        req_id = self.next_id
+        try:
+            self.proc.stdin.write(
+                json.dumps({"id": req_id, **payload}, ensure_ascii=False) + "\n"
+            )
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerError(f"写入请求失败: {e}") from e
+
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                line = self.lines.get(timeout=wait)
+            except queue.Empty:
+                raise WorkerTimeout(f"超时 ({timeout:g}s)") from None
+            if line is None:
+                raise WorkerError(
+                    "进程意外退出\n" + "\n".join(self.stderr_tail[-5:])
+                )
+            try:
+                response = json.loads(line)
+            except ValueError:
+                # md5.js 偶尔会自己往 stdout 打东西, 跳过
+                continue
+            if not isinstance(response, dict) or response.get("id") != req_id:
+                continue
+            if "progress" in response:
+                if on_progress is not None:
+                    on_progress(str(response["progress"]))
+                continue
+            return response
+
+    def ping(self, timeout: float = WORKER_PING_TIMEOUT) -> bool:
+        try:
+            return self.request({"mode": "ping"}, timeout).get("output") == "pong"
+        except WorkerError:
+            return False
+
+    def startup_info(self, timeout: float = WORKER_PING_TIMEOUT) -> tuple[str, float, float] | None:
+        """
+        刚启动的进程问一下加载情况
+        返回 (缓存状态, 从启动到能回复的毫秒数, 加载 md5.js 的毫秒数)
+        """
+        try:
+            response = self.request({"mode": "info"}, timeout)
+        except WorkerError:
+            return None
+        ready_ms = (time.time() - self.started_at) * 1000
+        try:
+            info = json.loads(str(response.get("output") or ""))
+        except ValueError:
+            # 旧版本的 md5-api.js 不认识 info
+            return None
+        if not isinstance(info, dict):
+            return None
+        return str(info.get("cache") or "off"), ready_ms, float(info.get("load_ms") or 0.0)
+
+    def stop(self, timeout: float = 3.0) -> None:
+        proc = self.proc
+        self.proc = None
+        if proc is None:
+            return
+        try:
+            if proc.poll() is None and proc.stdin is not None:
+                proc.stdin.write(json.dumps({"id": 0, "mode": "exit"}) + "\n")
+                proc.stdin.close()
+            proc.wait(timeout=timeout)
+        except Exception:
+            proc.kill()
+            proc.wait()
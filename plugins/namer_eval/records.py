@@ -0,0 +1,134 @@
+"""
+namerena / tswn 的结果: EvalResult 和 --json 输出的解析
+"""
+
+from __future__ import annotations
+
+import json
+
+from typing import NamedTuple
+
+
+def last_non_empty_line(output: str) -> str:
+    for line in reversed(output.splitlines()):
+        if line.strip():
+            return line.strip()
+    return ""
+
+
+def is_bench_input(input_text: str) -> bool:
+    raw = input_text.lstrip("\ufeff").lstrip()
+    return raw.startswith("!test!")
+
+
+def parse_record(output: str) -> dict | None:
+    """
+    解析 --json 模式的输出, 一次 json.loads 就拿到所有数字
+    结构见 md5-api.ts 里的 BenchRecord, tswn-cli 的输出额外可能有:
+    - win_idx: 对战里赢家的下标
+    - rows: namer-pf 每个名字的 [pp, pd, qp, qd]
+    不是 JSON (比如报错了) 就返回 None
+    """
+    if not output.startswith("{"):
+        return None
+    try:
+        data = json.loads(output)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or "kind" not in data:
+        return None
+    return data
+
+
+def decode_record(result: EvalResult) -> EvalResult:
+    """把 JSON 输出拆成 展示用的文本 + 结构化数据"""
+    data = parse_record(result.output)
+    if data is None:
+        return result
+    return result._replace(output=str(data.get("text", "")), data=data)
+
+
+def format_record_value(data: dict) -> str:
+    """评分/胜率的数值, 如 '3736.67' / '38.00%'"""
+    unit = "%" if data["kind"] == "win-rate" else ""
+    return f"{data['value']:.2f}{unit}"
+
+
+def format_record_ci(data: dict) -> str:
+    """按精度跑的置信区间, 如 '±0.50%, 2300轮', 没有就返回空"""
+    ci = data.get("ci")
+    if not ci:
+        return ""
+    unit = "%" if data["kind"] == "win-rate" else ""
+    return f"±{ci[0]:.2f}{unit}, {data['round']}轮"
+
+
+PF_LABELS = ("pp", "pd", "qp", "qd", "sum")
+PF_RUNS = (
+    "!test!\n\n{test}",
+    "!test!\n\n{test}\n{test}",
+    "!test!\n!\n\n{test}",
+    "!test!\n!\n\n{test}\n{test}",
+)
+"""
+pf 的四个评分, 和 PF_LABELS 前四个一一对应
+"""
+
+
+def _complete_pf_row(values: list) -> list[int]:
+    values = [int(float(value)) for value in values[: len(PF_LABELS)]]
+    if len(values) == len(PF_LABELS) - 1:
+        values.append(sum(values))
+    return values
+
+
+class EvalResult(NamedTuple):
+    output: str
+    cost: float
+    cached: bool = False
+    data: dict | None = None
+    """--json 模式解析出来的结构化结果, 见 parse_record"""
+
+
+def normalize_input(input_text: str) -> str:
+    return input_text.lstrip("\ufeff").replace("\r\n", "\n").strip("\n")
+
+
+def bench_kind(input_text: str) -> str:
+    """
+    输入是哪种模式, 和 md5-api.ts 里的 bench_kind 一样
+    有空行的话按空行分队, 否则一行一队
+    - !test! + 1 队: 评分
+    - !test! + 2 队: 胜率
+    """
+    if not input_text.strip().startswith("!test!"):
+        return "fight"
+    lines = [line.strip() for line in input_text.replace("\r\n", "\n").split("\n")]
+    while lines and lines[-1] == "":
+        lines.pop()
+    teams = len(lines)
+    if "" in lines:
+        teams = 0
+        in_team = False
+        for line in lines:
+            if line == "":
+                in_team = False
+            elif not in_team:
+                in_team = True
+                teams += 1
+    return {3: "win-rate", 2: "score"}.get(teams, "fight")
+
+
+def count_players(input_text: str) -> int:
+    """输入里有几个真正的名字, 不算 !test! / ! / seed: 这种"""
+    lines = [line.strip() for line in input_text.replace("+", "\n").split("\n")]
+    return max(
+        len(
+            [
+                line
+                for line in lines
+                if line and line not in ("!test!", "!") and not line.startswith("seed:")
+            ]
+        ),
+        1,
+    )
@@ -0,0 +1,204 @@
+"""
+评测结果缓存: 内存 LRU + SQLite
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import hashlib
+import time
+import threading
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+from . import PLUGIN_ROOT, config, records, runtimes, tswn_cli
+
+CACHE_DB_PATH = PLUGIN_ROOT / "md5" / "namerena_cache.db"
+EVAL_CACHE: EvalCache | None = None
+
+
+class EvalCache:
+    """
+    评测结果缓存
+    两层: 内存里一个 LRU, 磁盘上一个 SQLite (插件重载之后还在)
+    """
+
+    def __init__(self, db_path: Path | None, memory_size: int, disk_size: int) -> None:
+        self.memory: OrderedDict[str, str] = OrderedDict()
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.lock = threading.Lock()
+        self.db: sqlite3.Connection | None = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.puts = 0
+        if db_path is not None and disk_size > 0:
+            try:
+                self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS eval_cache ("
+                    "key TEXT PRIMARY KEY, output TEXT NOT NULL, cost REAL NOT NULL, "
+                    "created REAL NOT NULL, used REAL NOT NULL)"
+                )
+                self.db.execute(
+                    "CREATE INDEX IF NOT EXISTS eval_cache_used ON eval_cache(used)"
+                )
+                self.db.commit()
+            except sqlite3.Error as e:
+                print(f"[namer] 无法打开缓存数据库 {db_path}: {e}")
+                self.db = None
+
+    @staticmethod
+    def hash_key(key: tuple[str, ...]) -> str:
+        return hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, output: str) -> None:
+        self.memory[key] = output
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get(self, key: tuple[str, ...]) -> str | None:
+        hashed = self.hash_key(key)
+        with self.lock:
+            if hashed in self.memory:
+                self.memory.move_to_end(hashed)
+                self.memory_hits += 1
+                return self.memory[hashed]
+            if self.db is not None:
+                try:
+                    row = self.db.execute(
+                        "SELECT output FROM eval_cache WHERE key = ?", (hashed,)
+                    ).fetchone()
+                    if row is not None:
+                        self.db.execute(
+                            "UPDATE eval_cache SET used = ? WHERE key = ?",
+                            (time.time(), hashed),
+                        )
+                        self.db.commit()
+                        self.disk_hits += 1
+                        self._remember(hashed, row[0])
+                        return row[0]
+                except sqlite3.Error as e:
+                    print(f"[namer] 读取缓存失败: {e}")
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple[str, ...], output: str, cost: float) -> None:
+        hashed = self.hash_key(key)
+        with self.lock:
+            self._remember(hashed, output)
+            self.puts += 1
+            if self.db is None:
+                return
+            try:
+                now = time.time()
+                self.db.execute(
+                    "INSERT OR REPLACE INTO eval_cache (key, output, cost, created, used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (hashed, output, cost, now, now),
+                )
+                # 别每次都数一遍
+                if self.puts % 64 == 0:
+                    self._prune()
+                self.db.commit()
+            except sqlite3.Error as e:
+                print(f"[namer] 写入缓存失败: {e}")
+
+    def _prune(self) -> None:
+        assert self.db is not None
+        count = self.db.execute("SELECT COUNT(*) FROM eval_cache").fetchone()[0]
+        if count > self.disk_size:
+            self.db.execute(
+                "DELETE FROM eval_cache WHERE key IN "
+                "(SELECT key FROM eval_cache ORDER BY used LIMIT ?)",
+                (count - self.disk_size,),
+            )
+
+    def disk_count(self) -> int:
+        if self.db is None:
+            return 0
+        with self.lock:
+            try:
+                return self.db.execute("SELECT COUNT(*) FROM eval_cache").fetchone()[0]
+            except sqlite3.Error:
+                return 0
+
+    def describe(self) -> str:
+        total = self.memory_hits + self.disk_hits + self.misses
+        hit_rate = (self.memory_hits + self.disk_hits) * 100 / total if total else 0.0
+        disk = (
+            f"{self.disk_count()}/{self.disk_size} 条" if self.db is not None else "未启用"
+        )
+        return "\n".join(
+            [
+                f"内存: {len(self.memory)}/{self.memory_size} 条",
+                f"磁盘: {disk}",
+                f"命中: 内存 {self.memory_hits} / 磁盘 {self.disk_hits} / 未命中 {self.misses}",
+                f"命中率: {hit_rate:.2f}%",
+            ]
+        )
+
+    def close(self) -> None:
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+def cache_key(
+    mode: str, input_text: str, runtime: str = "", tswn: bool = False
+) -> tuple[str, ...]:
+    """
+    (模式, 输入, 轮数, md5.js hash, runtime 版本, tswn 版本)
+    runtime: 真正跑这个输入的 JS 运行时 (按模式选的, 不一定是默认的那个)
+    跟当前引擎无关的那几项留空, 免得升级 tswn 把 namerena 的缓存也冲掉
+    """
+    return (
+        mode,
+        records.normalize_input(input_text),
+        str(config.TSWN_COMPARE_ROUNDS),
+        "" if tswn else runtimes.get_md5_js_hash(),
+        "" if tswn else (runtimes.resolve_command_version([runtime]) or ""),
+        (tswn_cli.get_tswn_version() or "") if tswn else "",
+    )
+
+
+def cached_eval(
+    key: tuple[str, ...],
+    func: Callable[[], tuple[str, float, bool] | None],
+) -> records.EvalResult | None:
+    """先查缓存, 没有再跑, 只缓存成功的结果"""
+    cache = EVAL_CACHE
+    start_time = time.time()
+    if cache is not None:
+        output = cache.get(key)
+        if output is not None:
+            return records.EvalResult(output, time.time() - start_time, True)
+    result = func()
+    if result is None:
+        return None
+    output, cost_time, ok = result
+    if ok and cache is not None:
+        cache.put(key, output, cost_time)
+    return records.EvalResult(output, cost_time)
+
+
+def start_eval_cache() -> None:
+    global EVAL_CACHE
+
+    stop_eval_cache()
+    if not config.USE_CACHE:
+        return
+    EVAL_CACHE = EvalCache(CACHE_DB_PATH, config.CACHE_MEMORY_SIZE, config.CACHE_DISK_SIZE)
+
+
+def stop_eval_cache() -> None:
+    global EVAL_CACHE
+
+    cache = EVAL_CACHE
+    EVAL_CACHE = None
+    if cache is not None:
+        cache.close()
@@ -0,0 +1,236 @@
+"""
+JS 运行时和版本号
+
+- 选哪个运行时: 配置指定 > 测速结果 > 有什么用什么
+- --version 的结果按指纹存盘, 重载插件不用再查
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+from pathlib import Path
+from . import PLUGIN_ROOT, config, process, records
+
+RUNTIME_SPEED: dict[str, dict[str, float]] = {}
+"""
+测速结果 {模式: {运行时: 每秒轮数 (战斗是每秒场数)}}
+"""
+RUNTIME_KINDS = {"fight": "战斗", "win-rate": "胜率", "score": "评分"}
+VERSION_CACHE: dict[tuple[str, ...], str | None] = {}
+VERSION_CACHE_PATH = PLUGIN_ROOT / "md5" / "versions.json"
+"""
+查过的版本号存盘, 按可执行文件的路径和 mtime 校验, 重载之后不用再跑 --version
+"""
+VERSION_DISK: dict[str, dict] | None = None
+"""
+存盘的版本号, 没加载过 (离线工具) 就是 None, 这时候也不存盘, 免得冲掉插件存的
+"""
+VERSION_LOCK = threading.Lock()
+VERSION_KEY_LOCKS: dict[tuple[str, ...], threading.Lock] = {}
+CODE_CACHE_ROOT = PLUGIN_ROOT / "md5" / ".code-cache"
+"""
+md5.js 编译缓存的根目录, 下面按 md5.js 的 hash 分子目录
+"""
+MD5_JS_HASH: tuple[float, str] | None = None
+"""
+(md5.js 的 mtime, sha256)
+"""
+
+
+def version_fingerprint(command: list[str], cwd: str | None) -> list | None:
+    """
+    版本号什么时候要重新查
+    直接跑的 exe 看 (真实路径, mtime, 大小), cargo run 看 Cargo.toml
+    """
+    if cwd is not None:
+        target = Path(cwd) / "Cargo.toml"
+    else:
+        resolved = shutil.which(command[0])
+        if resolved is None:
+            return None
+        target = Path(resolved).resolve()
+    try:
+        stat = target.stat()
+    except OSError:
+        return None
+    return [str(target), stat.st_mtime_ns, stat.st_size]
+
+
+def load_version_cache() -> None:
+    global VERSION_DISK
+
+    try:
+        data = json.loads(VERSION_CACHE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        data = {}
+    entries = data.get("versions") if isinstance(data, dict) else None
+    VERSION_DISK = {
+        str(key): entry
+        for key, entry in (entries or {}).items()
+        if isinstance(entry, dict) and isinstance(entry.get("fingerprint"), list)
+    }
+
+
+def save_version_cache() -> None:
+    with VERSION_LOCK:
+        if VERSION_DISK is None:
+            return
+        data = {"versions": dict(VERSION_DISK)}
+    tmp_path = VERSION_CACHE_PATH.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, VERSION_CACHE_PATH)
+    except OSError as e:
+        print(f"[namer] 无法保存版本号缓存 {VERSION_CACHE_PATH}: {e}")
+
+
+def resolve_command_version(command: list[str], cwd: str | None = None) -> str | None:
+    """
+    跑一次 `command --version`, 结果先看内存, 再看存盘的 (校验指纹), 都没有才真的跑
+    同一条命令同时只跑一次, 后台预热还没跑完的话就等它
+    跑不出来 (超时 / 报错) 也记下来, 指纹不变就不再跑
+    """
+    cache_key = tuple([*command, f"cwd={cwd or ''}"])
+    if cache_key in VERSION_CACHE:
+        return VERSION_CACHE[cache_key]
+
+    with VERSION_LOCK:
+        key_lock = VERSION_KEY_LOCKS.setdefault(cache_key, threading.Lock())
+    with key_lock:
+        if cache_key in VERSION_CACHE:
+            return VERSION_CACHE[cache_key]
+
+        disk_key = "\0".join(cache_key)
+        fingerprint = version_fingerprint(command, cwd)
+        entry = VERSION_DISK.get(disk_key) if VERSION_DISK is not None else None
+        if fingerprint is not None and entry is not None and entry["fingerprint"] == fingerprint:
+            VERSION_CACHE[cache_key] = entry.get("version") or None
+            return VERSION_CACHE[cache_key]
+
+        version = ""
+        try:
+            # cargo run 要编译, 不能套资源上限; 超时连 cargo 起的子进程一起杀
+            returncode, stdout, stderr = process.run_child(
+                [*command, "--version"],
+                "",
+                cwd,
+                None,
+                "version",
+                1 if cwd is None else 12,
+                limits=cwd is None,
+                group=True,
+            )
+            if returncode == 0:
+                version = records.last_non_empty_line(stdout or stderr)
+        except process.JobCancelled:
+            raise
+        except (OSError, process.WorkerError):
+            pass
+
+        VERSION_CACHE[cache_key] = version or None
+        if fingerprint is not None and VERSION_DISK is not None:
+            with VERSION_LOCK:
+                VERSION_DISK[disk_key] = {"fingerprint": fingerprint, "version": version}
+            save_version_cache()
+        return VERSION_CACHE[cache_key]
+
+
+def get_runtime_version() -> str | None:
+    return resolve_command_version([get_js_runtime()])
+
+
+def available_js_runtimes() -> list[str]:
+    return [runtime for runtime in ("node", "bun") if shutil.which(runtime) is not None]
+
+
+def pinned_js_runtime() -> str | None:
+    """配置里指定的运行时, 没指定或者指定的找不到就返回 None"""
+    pinned = config.JS_RUNTIME or ("bun" if config.USE_BUN else "")
+    if pinned and shutil.which(pinned) is not None:
+        return pinned
+    return None
+
+
+def get_js_runtime(kind: str | None = None) -> str:
+    """
+    选一个 JS 运行时
+    kind: fight / win-rate / score, 有测速结果的话选这个模式下最快的
+    不给 kind 的时候选赢的模式最多的那个
+    """
+    pinned = pinned_js_runtime()
+    if pinned is not None:
+        return pinned
+    runtimes = available_js_runtimes()
+    default = "node" if "node" in runtimes or not runtimes else runtimes[0]
+    speed = RUNTIME_SPEED
+    if kind is not None:
+        speeds = speed.get(kind)
+        if speeds:
+            return max(speeds, key=lambda runtime: speeds[runtime])
+        return default
+    wins: dict[str, int] = {}
+    for speeds in speed.values():
+        if speeds:
+            fastest = max(speeds, key=lambda runtime: speeds[runtime])
+            wins[fastest] = wins.get(fastest, 0) + 1
+    if not wins:
+        return default
+    return max(wins, key=lambda runtime: (wins[runtime], runtime == default))
+
+
+def runtime_kind(mode: str, input_text: str) -> str:
+    """md5-api 的模式 + 输入 -> 测速用的模式"""
+    if mode in ("fight", "fight-batch"):
+        return "fight"
+    return records.bench_kind(input_text)
+
+
+def get_md5_js_hash() -> str:
+    global MD5_JS_HASH
+
+    md5_path = PLUGIN_ROOT / "md5" / "md5.js"
+    try:
+        mtime = md5_path.stat().st_mtime
+    except OSError:
+        return ""
+    if MD5_JS_HASH is None or MD5_JS_HASH[0] != mtime:
+        MD5_JS_HASH = (mtime, hashlib.sha256(md5_path.read_bytes()).hexdigest())
+    return MD5_JS_HASH[1]
+
+
+def code_cache_env(runtime: str) -> dict[str, str] | None:
+    """
+    启动 md5-api.js 用的环境变量, 带上编译缓存目录
+    目录按 md5.js 的 hash 分开, md5.js 换了就自然换一个目录
+    返回 None 表示直接继承当前环境
+    """
+    if not config.USE_CODE_CACHE:
+        return None
+    md5_hash = get_md5_js_hash()
+    if not md5_hash:
+        return None
+    cache_dir = CODE_CACHE_ROOT / md5_hash[:16]
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    env = dict(os.environ)
+    env["NAMER_CODE_CACHE"] = str(cache_dir)
+    if runtime == "bun":
+        env["BUN_RUNTIME_TRANSPILER_CACHE_PATH"] = str(cache_dir)
+    return env
+
+
+def prune_code_cache() -> None:
+    """删掉旧版本 md5.js 留下的编译缓存"""
+    if not config.USE_CODE_CACHE or not CODE_CACHE_ROOT.is_dir():
+        return
+    current = get_md5_js_hash()[:16]
+    for path in CODE_CACHE_ROOT.iterdir():
+        if path.name != current and path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
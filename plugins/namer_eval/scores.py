@@ -0,0 +1,171 @@
+"""
+/namer-pf 的评分索引 (SQLite), 给 /namer-top 和 /namer-lookup 用
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+import threading
+
+from pathlib import Path
+from typing import NamedTuple
+from . import PLUGIN_ROOT, config, records, runtimes, tswn_cli
+
+SCORE_DB_PATH = PLUGIN_ROOT / "md5" / "namerena_scores.db"
+SCORE_INDEX: ScoreIndex | None = None
+
+
+class ScoreRow(NamedTuple):
+    name: str
+    engine: str
+    version: str
+    rounds: int
+    values: list[int]
+    """和 PF_LABELS 对应: pp, pd, qp, qd, sum"""
+    created: float
+
+
+class ScoreIndex:
+    """
+    名字评分索引, 存每个名字在每个引擎版本下轮数最多的那次 pf 结果
+    - 查名字走主键 (名字, 引擎, 版本)
+    - 排行榜每一列有一个 (引擎, 版本, 列) 的索引
+    都是 O(log n), 不用重新跑
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.lock = threading.Lock()
+        self.db: sqlite3.Connection | None = None
+        try:
+            self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS name_scores ("
+                "name TEXT NOT NULL, engine TEXT NOT NULL, version TEXT NOT NULL, "
+                "rounds INTEGER NOT NULL, "
+                + ", ".join(f"{label} INTEGER NOT NULL" for label in records.PF_LABELS)
+                + ", created REAL NOT NULL, PRIMARY KEY (name, engine, version))"
+            )
+            for label in records.PF_LABELS:
+                self.db.execute(
+                    f"CREATE INDEX IF NOT EXISTS name_scores_{label} "
+                    f"ON name_scores(engine, version, {label} DESC)"
+                )
+            self.db.commit()
+        except sqlite3.Error as e:
+            print(f"[namer] 无法打开评分索引 {db_path}: {e}")
+            self.db = None
+
+    def put(self, name: str, engine: str, version: str, rounds: int, values: list[int]) -> None:
+        """同一个版本只留轮数多的那次, 一样多就用新的"""
+        if self.db is None:
+            return
+        columns = ", ".join(records.PF_LABELS)
+        updates = ", ".join(f"{label} = excluded.{label}" for label in records.PF_LABELS)
+        with self.lock:
+            try:
+                self.db.execute(
+                    f"INSERT INTO name_scores (name, engine, version, rounds, {columns}, created) "
+                    f"VALUES (?, ?, ?, ?, {', '.join('?' for _ in records.PF_LABELS)}, ?) "
+                    f"ON CONFLICT (name, engine, version) DO UPDATE SET "
+                    f"rounds = excluded.rounds, {updates}, created = excluded.created "
+                    f"WHERE excluded.rounds >= name_scores.rounds",
+                    (name, engine, version, rounds, *values, time.time()),
+                )
+                self.db.commit()
+            except sqlite3.Error as e:
+                print(f"[namer] 写入评分索引失败: {e}")
+
+    def _select(self, where: str, params: tuple, order: str, limit: int) -> list[ScoreRow]:
+        if self.db is None:
+            return []
+        with self.lock:
+            try:
+                rows = self.db.execute(
+                    f"SELECT name, engine, version, rounds, {', '.join(records.PF_LABELS)}, created "
+                    f"FROM name_scores WHERE {where} ORDER BY {order} LIMIT ?",
+                    (*params, limit),
+                ).fetchall()
+            except sqlite3.Error as e:
+                print(f"[namer] 读取评分索引失败: {e}")
+                return []
+        return [
+            ScoreRow(row[0], row[1], row[2], row[3], list(row[4:-1]), row[-1])
+            for row in rows
+        ]
+
+    def lookup(self, name: str, engine: str, version: str) -> ScoreRow | None:
+        rows = self._select(
+            "name = ? AND engine = ? AND version = ?", (name, engine, version), "created", 1
+        )
+        return rows[0] if rows else None
+
+    def top(self, label: str, engine: str, version: str, limit: int) -> list[ScoreRow]:
+        assert label in records.PF_LABELS
+        return self._select(
+            "engine = ? AND version = ?", (engine, version), f"{label} DESC", limit
+        )
+
+    def count(self) -> int:
+        if self.db is None:
+            return 0
+        with self.lock:
+            try:
+                return self.db.execute("SELECT COUNT(*) FROM name_scores").fetchone()[0]
+            except sqlite3.Error:
+                return 0
+
+    def close(self) -> None:
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+def score_version() -> str:
+    """评分索引里 namerena 的版本, 就是 md5.js 的 hash"""
+    return runtimes.get_md5_js_hash()[:16]
+
+
+def index_pf_result(
+    name: str, results: list[records.EvalResult], tswn_row: list | None
+) -> None:
+    """把一个名字的 pf 结果记到评分索引里, 有没解析出来的就不记"""
+    index = SCORE_INDEX
+    if index is None:
+        return
+    if all(result.data is not None and "value" in result.data for result in results):
+        values = records._complete_pf_row([round(result.data["value"]) for result in results])
+        rounds = min(
+            int(result.data.get("round") or config.TSWN_COMPARE_ROUNDS) for result in results
+        )
+        index.put(name, "namerena", score_version(), rounds, values)
+    tswn_version = tswn_cli.get_tswn_version()
+    if tswn_row is not None and tswn_version:
+        try:
+            values = records._complete_pf_row(tswn_row)
+        except ValueError:
+            return
+        index.put(name, "tswn", tswn_version, config.TSWN_COMPARE_ROUNDS, values)
+
+
+def score_fresh(row: ScoreRow) -> bool:
+    return config.SCORE_MAX_AGE <= 0 or time.time() - row.created <= config.SCORE_MAX_AGE * 86400
+
+
+def start_score_index() -> None:
+    global SCORE_INDEX
+
+    stop_score_index()
+    if not config.USE_SCORE_INDEX:
+        return
+    SCORE_INDEX = ScoreIndex(SCORE_DB_PATH)
+
+
+def stop_score_index() -> None:
+    global SCORE_INDEX
+
+    index = SCORE_INDEX
+    SCORE_INDEX = None
+    if index is not None:
+        index.close()
@@ -0,0 +1,246 @@
+"""
+遥测: 后台攒批写进 PostgreSQL, 没装 psycopg 就不写
+"""
+
+from __future__ import annotations
+
+import re
+import queue
+import hashlib
+import time
+import threading
+
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from . import config, records
+
+TELEMETRY = False
+try:
+    import psycopg
+
+    TELEMETRY = True
+except ImportError:
+    pass
+
+DB_VERSION = 1
+"""
+数据库版本号
+- 1: 20250504 初始版本
+"""
+
+DB_MIGRATIONS: dict[int, list[str]] = {
+    1: [
+        """CREATE TABLE IF NOT EXISTS namer_eval (
+            id BIGSERIAL PRIMARY KEY,
+            created TIMESTAMPTZ NOT NULL,
+            command TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            engine TEXT NOT NULL,
+            rounds INTEGER NOT NULL,
+            result TEXT NOT NULL,
+            latency DOUBLE PRECISION NOT NULL,
+            cached BOOLEAN NOT NULL,
+            diff TEXT NOT NULL,
+            version TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS namer_eval_created ON namer_eval (created)",
+        "CREATE INDEX IF NOT EXISTS namer_eval_input_hash ON namer_eval (input_hash)",
+    ],
+}
+"""
+每个数据库版本要执行的语句, 从当前版本 +1 一直执行到 DB_VERSION
+"""
+TELEMETRY_BATCH_SIZE = 500
+TELEMETRY_FLUSH_INTERVAL = 2.0
+TELEMETRY_WRITER: TelemetryWriter | None = None
+
+
+class TelemetryRecord(NamedTuple):
+    created: datetime
+    command: str
+    input_hash: str
+    engine: str
+    rounds: int
+    result: str
+    latency: float
+    cached: bool
+    diff: str
+    version: str
+
+
+class TelemetryWriter:
+    """
+    遥测写入
+    消息处理线程只往有界队列里塞记录, 塞不下就丢掉并计数, 不会阻塞
+    后台线程攒一批之后用 COPY 写进 PostgreSQL
+    """
+
+    COLUMNS = TelemetryRecord._fields
+
+    def __init__(self, dsn: str, queue_size: int, version: str) -> None:
+        self.dsn = dsn
+        self.version = version
+        """
+        插件版本号, 每条记录都带上
+        """
+        self.queue: queue.Queue[TelemetryRecord] = queue.Queue(maxsize=queue_size)
+        self.stopping = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.written = 0
+        self.dropped_full = 0
+        self.dropped_error = 0
+        self.last_error = ""
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, record: TelemetryRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped_full += 1
+
+    def _connect(self):
+        conn = psycopg.connect(self.dsn)
+        with conn.cursor() as cur:
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS namer_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            cur.execute("SELECT value FROM namer_meta WHERE key = 'db_version'")
+            row = cur.fetchone()
+            current = int(row[0]) if row is not None else 0
+            for version in range(current + 1, DB_VERSION + 1):
+                for statement in DB_MIGRATIONS.get(version, []):
+                    cur.execute(statement)
+                cur.execute(
+                    "INSERT INTO namer_meta (key, value) VALUES ('db_version', %s) "
+                    "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
+                    (str(version),),
+                )
+        conn.commit()
+        return conn
+
+    def _take_batch(self) -> list[TelemetryRecord]:
+        batch = []
+        deadline = time.time() + TELEMETRY_FLUSH_INTERVAL
+        while len(batch) < TELEMETRY_BATCH_SIZE:
+            wait = deadline - time.time()
+            if wait <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch: list[TelemetryRecord]) -> None:
+        with conn.cursor() as cur:
+            with cur.copy(
+                f"COPY namer_eval ({', '.join(self.COLUMNS)}) FROM STDIN"
+            ) as copy:
+                for record in batch:
+                    copy.write_row(record)
+        conn.commit()
+
+    def _loop(self) -> None:
+        conn = None
+        retry_delay = 1.0
+        while not (self.stopping.is_set() and self.queue.empty()):
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                if conn is None:
+                    conn = self._connect()
+                self._write(conn, batch)
+                self.written += len(batch)
+                retry_delay = 1.0
+            except Exception as e:
+                # 数据库出问题了, 这一批直接丢掉, 别让队列越积越多
+                self.dropped_error += len(batch)
+                self.last_error = str(e).strip().splitlines()[0] if str(e) else repr(e)
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                    conn = None
+                if self.stopping.wait(retry_delay):
+                    break
+                retry_delay = min(retry_delay * 2, 60.0)
+        if conn is not None:
+            conn.close()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self.stopping.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+
+    def describe(self) -> str:
+        lines = [
+            f"遥测: 已写入 {self.written} 条, 排队 {self.queue.qsize()} 条",
+            f"丢弃: 队列满 {self.dropped_full} 条 / 数据库出错 {self.dropped_error} 条",
+        ]
+        if self.last_error:
+            lines.append(f"最近错误: {self.last_error}")
+        return "\n".join(lines)
+
+
+def start_telemetry(version: str) -> None:
+    global TELEMETRY_WRITER
+
+    stop_telemetry()
+    if not (TELEMETRY and config.TELEMETRY_ENABLED and config.TELEMETRY_DSN):
+        return
+    TELEMETRY_WRITER = TelemetryWriter(
+        config.TELEMETRY_DSN, config.TELEMETRY_QUEUE_SIZE, version
+    )
+    TELEMETRY_WRITER.start()
+
+
+def stop_telemetry() -> None:
+    global TELEMETRY_WRITER
+
+    writer = TELEMETRY_WRITER
+    TELEMETRY_WRITER = None
+    if writer is not None:
+        writer.stop()
+
+
+def _output_rounds(output: str, default: int) -> int:
+    """从输出里找实际跑的轮数, 如 '(2300轮)'"""
+    match = re.search(r"\((\d+)轮\)", output)
+    return int(match.group(1)) if match is not None else default
+
+
+def record_eval(
+    command: str,
+    input_text: str,
+    engine: str,
+    result: records.EvalResult | None,
+    diff: str = "",
+) -> None:
+    """记一条遥测, 没开遥测就什么都不做"""
+    writer = TELEMETRY_WRITER
+    if writer is None or result is None:
+        return
+    default_rounds = config.TSWN_COMPARE_ROUNDS if records.is_bench_input(input_text) else 1
+    writer.submit(
+        TelemetryRecord(
+            created=datetime.now(timezone.utc),
+            command=command,
+            input_hash=hashlib.sha256(
+                records.normalize_input(input_text).encode("utf-8")
+            ).hexdigest(),
+            engine=engine,
+            rounds=int((result.data or {}).get("round") or 0)
+            or _output_rounds(result.output, default_rounds),
+            result=result.output[:1000],
+            latency=result.cost,
+            cached=result.cached,
+            diff=diff,
+            version=writer.version,
+        )
+    )
@@ -0,0 +1,667 @@
+"""
+tswn-cli 对比: 找到 tswn-cli, 常驻的 serve 进程, 解析输出
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import sys
+import time
+import threading
+import traceback
+
+from pathlib import Path
+
+from . import (
+    PLUGIN_ROOT,
+    config,
+    distributed,
+    process,
+    records,
+    result_cache,
+    runtimes,
+)
+
+TSWN_RUNNER: tuple[list[str], str | None] | None = None
+TSWN_RUNNER_FAILED = False
+TSWN_JSON_SUPPORT: dict[str, bool | None] = {}
+"""
+tswn-cli 各个子命令认不认 --json, 看一次 "<子命令> --help" 就记住, None 表示看不出来
+"""
+TSWN_JSON_LOCK = threading.Lock()
+TSWN_JSON_MODE_LOCKS: dict[str, threading.Lock] = {}
+"""
+每个子命令一把锁, 同一个子命令的 --help 同时只跑一次, 不同子命令互不等待
+"""
+TSWN_UNKNOWN_ARGUMENT = re.compile(
+    r"unexpected argument|unknown argument|unrecognized|wasn't expected", re.IGNORECASE
+)
+"""
+旧版本不认 --json 时的报错 (clap / argparse 之类)
+"""
+TSWN_SERVERS: list[TswnServer] = []
+"""
+空闲的 tswn-cli serve 进程, 最多和对比线程池一样多, 每个同时只跑一个请求
+"""
+TSWN_SERVER_BUSY = 0
+"""
+借出去的 + 正在启动的
+"""
+TSWN_SERVER_READY = False
+"""
+已经有一个启动成功了, 之后才允许同时拉起多个 (cargo run 第一次要编译)
+"""
+TSWN_SERVER_GENERATION = 0
+TSWN_SERVER_FAILED = False
+TSWN_SERVER_LOCK = threading.Lock()
+TSWN_SERVER_START_TIMEOUT = 10.0
+"""
+tswn-cli serve 启动后第一次 ping 的超时, cargo run 要先编译, 会另外放宽
+"""
+
+
+def _resolve_tswn_runner_candidate(
+    raw_path: str,
+) -> tuple[list[str], str | None] | None:
+    candidate = Path(raw_path)
+    if candidate.exists():
+        if candidate.is_file():
+            return [str(candidate)], None
+
+        crate_dir = candidate
+        if not (crate_dir / "Cargo.toml").exists():
+            nested_crate = candidate / "crates" / "tswn_core"
+            if (nested_crate / "Cargo.toml").exists():
+                crate_dir = nested_crate
+
+        workspace_dir = crate_dir
+        if crate_dir.name == "tswn_core" and crate_dir.parent.name == "crates":
+            workspace_dir = crate_dir.parent.parent
+
+        exe_name = "tswn-cli.exe" if sys.platform.startswith("win") else "tswn-cli"
+        for exe_path in (
+            workspace_dir / "target" / "debug" / exe_name,
+            workspace_dir / "target" / "release" / exe_name,
+        ):
+            if exe_path.exists():
+                return [str(exe_path)], None
+
+        if (crate_dir / "Cargo.toml").exists():
+            return ["cargo", "run", "--bin", "tswn-cli", "--"], str(crate_dir)
+
+    resolved = shutil.which(raw_path)
+    if resolved is not None:
+        return [resolved], None
+
+    return None
+
+
+def resolve_tswn_runner() -> tuple[list[str], str | None] | None:
+    global TSWN_RUNNER, TSWN_RUNNER_FAILED
+
+    if TSWN_RUNNER is not None:
+        return TSWN_RUNNER
+    if TSWN_RUNNER_FAILED:
+        return None
+
+    if config.TSWN_CLI_PATH.strip():
+        resolved = _resolve_tswn_runner_candidate(config.TSWN_CLI_PATH.strip())
+        if resolved is not None:
+            TSWN_RUNNER = resolved
+            return resolved
+
+    exe_name = "tswn-cli.exe" if sys.platform.startswith("win") else "tswn-cli"
+    for candidate in (
+        PLUGIN_ROOT / "name_utils" / exe_name,
+        PLUGIN_ROOT / "name_utils" / "tswn-cli",
+    ):
+        resolved = _resolve_tswn_runner_candidate(str(candidate))
+        if resolved is not None:
+            TSWN_RUNNER = resolved
+            return resolved
+
+    path_runner = _resolve_tswn_runner_candidate("tswn-cli")
+    if path_runner is not None:
+        TSWN_RUNNER = path_runner
+        return path_runner
+
+    tswn_repo = PLUGIN_ROOT.parent.parent.parent / "namer" / "tswn-core"
+    for candidate in (
+        tswn_repo / "target" / "debug" / exe_name,
+        tswn_repo / "target" / "release" / exe_name,
+        tswn_repo / "crates" / "tswn_core",
+        tswn_repo,
+    ):
+        resolved = _resolve_tswn_runner_candidate(str(candidate))
+        if resolved is not None:
+            TSWN_RUNNER = resolved
+            return resolved
+
+    TSWN_RUNNER_FAILED = True
+    return None
+
+
+def run_tswn_cli(input_text: str, *args: str) -> records.EvalResult | None:
+    result = _exec_tswn_json(input_text, *args)
+    if result is None:
+        return None
+    return decode_tswn(args[0], records.EvalResult(result[0], result[1]))
+
+
+def tswn_supports_json(mode: str) -> bool | None:
+    """看一次 "<子命令> --help" 里有没有 --json, 看不出来 (help 跑不起来) 返回 None"""
+    if mode in TSWN_JSON_SUPPORT:
+        return TSWN_JSON_SUPPORT[mode]
+
+    with TSWN_JSON_LOCK:
+        mode_lock = TSWN_JSON_MODE_LOCKS.setdefault(mode, threading.Lock())
+    with mode_lock:
+        if mode in TSWN_JSON_SUPPORT:
+            return TSWN_JSON_SUPPORT[mode]
+        runner = resolve_tswn_runner()
+        if runner is None:
+            return None
+        command, cwd = runner
+        supported = None
+        try:
+            # 和 --version 一样: cargo run 要编译, 不能套资源上限; 超时连 cargo 起的子进程一起杀
+            returncode, stdout, stderr = process.run_child(
+                [*command, mode, "--help"],
+                "",
+                cwd,
+                None,
+                "version",
+                1 if cwd is None else 12,
+                limits=cwd is None,
+                group=True,
+            )
+            if returncode == 0:
+                supported = "--json" in stdout or "--json" in stderr
+        except process.JobCancelled:
+            raise
+        except (OSError, process.WorkerError):
+            pass
+        with TSWN_JSON_LOCK:
+            TSWN_JSON_SUPPORT[mode] = supported
+        return supported
+
+
+def _exec_tswn_json(input_text: str, *args: str) -> tuple[str, float, bool] | None:
+    """
+    带上 --json 跑 tswn-cli, 旧版本不认这个参数就用文本输出
+    认不认先看 --help; 看不出来的话只有报错明确是不认识参数才换文本重跑一次
+    普通的失败 (超时 / 崩溃) 不重跑
+    """
+    if not config.TSWN_JSON or not args:
+        return _exec_tswn_cli(input_text, *args)
+    mode = args[0]
+    supported = tswn_supports_json(mode)
+    if supported is False:
+        return _exec_tswn_cli(input_text, *args)
+    result = _exec_tswn_cli(input_text, *args, "--json")
+    if supported is None and result is not None and not result[2]:
+        if "--json" in result[0] and TSWN_UNKNOWN_ARGUMENT.search(result[0]):
+            with TSWN_JSON_LOCK:
+                TSWN_JSON_SUPPORT[mode] = False
+            return _exec_tswn_cli(input_text, *args)
+    return result
+
+
+def _exec_tswn_cli(input_text: str, *args: str) -> tuple[str, float, bool] | None:
+    """跑一次 tswn-cli, 返回 (输出, 耗时, 是否成功), 有远程 agent 能跑的话交给分布式执行器"""
+    if not config.USE_TSWN_COMPARE or resolve_tswn_runner() is None:
+        return None
+
+    backend = distributed.EVAL_BACKEND
+    if backend is not None and backend.has_remote_tswn():
+        return backend.run_tswn(input_text, *args)
+    return _exec_tswn_local(input_text, *args)
+
+
+def _exec_tswn_local(input_text: str, *args: str) -> tuple[str, float, bool] | None:
+    """在本机跑一次 tswn-cli, 返回 (输出, 耗时, 是否成功)"""
+    global TSWN_RUNNER_FAILED
+
+    if not config.USE_TSWN_COMPARE:
+        return None
+
+    runner = resolve_tswn_runner()
+    if runner is None:
+        return None
+
+    kind, count = tswn_kind(input_text, *args)
+    server = acquire_tswn_server(runner) if config.USE_TSWN_SERVER else None
+    if server is not None:
+        start_time = time.time()
+        try:
+            with process.kill_on_cancel(server.kill):
+                response = server.call(
+                    input_text, *args, timeout=process.eval_timeout(kind, count)
+                )
+            release_tswn_server(server, True)
+            return (
+                str(response.get("output") or response.get("error") or "").strip(),
+                time.time() - start_time,
+                bool(response.get("ok")),
+            )
+        except process.WorkerTimeout as e:
+            # 卡住了, 这个进程扔掉; 单独启动多半也会卡住, 就不再试了
+            release_tswn_server(server, False)
+            process.count_kill("timeout", kind)
+            return f"发生错误: {e}", time.time() - start_time, False
+        except process.WorkerError as e:
+            # 常驻进程挂了, 这次退回单独启动, 下次再拉一个新的
+            release_tswn_server(server, False)
+            if process.is_cancelled():
+                process.count_kill("cancel", kind)
+                return f"发生错误: {e}", time.time() - start_time, False
+
+    command, cwd = runner
+    start_time = time.time()
+    ok = False
+    try:
+        # cargo run 要编译, 不能套资源上限
+        returncode, stdout, stderr = process.run_child(
+            [*command, *args], input_text, cwd, None, kind, count, limits=cwd is None
+        )
+        ok = returncode == 0
+        output = stdout if ok else (stderr or stdout)
+    except FileNotFoundError:
+        TSWN_RUNNER_FAILED = True
+        return None
+    except process.WorkerError as e:
+        output = f"发生错误: {e}"
+    except Exception as e:
+        output = f"发生错误: {e}\n{traceback.format_exc()}"
+    return output.strip(), time.time() - start_time, ok
+
+
+def tswn_kind(input_text: str, *args: str) -> tuple[str, int]:
+    """tswn-cli 的模式 -> (超时按哪种模式算, 一次里面跑几个)"""
+    if args and args[0] == "namer-pf":
+        # 每个名字四项评分
+        return "score", 4 * max(len([line for line in input_text.split("\n") if line.strip()]), 1)
+    if args and args[0] == "raw":
+        # raw 跑的是原样的输入, !test! 开头的就是胜率 / 评分, 和 namerena 一样算超时
+        return records.bench_kind(input_text), 1
+    return "fight", 1
+
+
+def get_tswn_version() -> str | None:
+    if not config.USE_TSWN_COMPARE:
+        return None
+
+    runner = resolve_tswn_runner()
+    if runner is None:
+        return None
+
+    command, cwd = runner
+    version = runtimes.resolve_command_version(command, cwd)
+    if version is None:
+        return None
+    if version.startswith("tswn-cli "):
+        return version[len("tswn-cli ") :]
+    return version
+
+
+def parse_tswn_winner_names(output: str) -> list[str]:
+    winners = []
+    in_winner_block = False
+    for raw_line in output.splitlines():
+        line = raw_line.strip()
+        if line == "赢家:":
+            in_winner_block = True
+            continue
+        if not in_winner_block:
+            continue
+        if line.startswith("总战斗分:") or line.startswith("win_idx="):
+            break
+        if line.startswith("- "):
+            winners.append(line[2:].split(" (", 1)[0])
+    return winners
+
+
+def summarize_tswn_fight(output: str) -> str:
+    winners = parse_tswn_winner_names(output)
+    win_idx = ""
+    unresolved = ""
+    for raw_line in output.splitlines():
+        line = raw_line.strip()
+        if line.startswith("win_idx="):
+            win_idx = line
+        elif "未分出胜负" in line:
+            unresolved = line
+
+    parts = []
+    if winners:
+        parts.append(f"赢家={'|'.join(winners)}")
+    elif unresolved:
+        parts.append(unresolved)
+    if win_idx:
+        parts.append(win_idx)
+    if parts:
+        return ", ".join(parts)
+    return records.last_non_empty_line(output) or "无结果"
+
+
+def summarize_tswn_bench(output: str) -> str:
+    normal_score = ""
+    bang_score = ""
+    win_rate = ""
+    for raw_line in output.splitlines():
+        line = raw_line.strip()
+        normal_match = re.search(r"普通评分:\s*[^\r\n(]+", line)
+        bang_match = re.search(r"!评分:\s*[^\r\n(]+", line)
+        win_rate_match = re.search(r"胜率:\s*[^\r\n(]+", line)
+
+        if normal_match is not None:
+            normal_score = normal_match.group(0).strip()
+        if bang_match is not None:
+            bang_score = bang_match.group(0).strip()
+        if win_rate_match is not None:
+            win_rate = win_rate_match.group(0).strip()
+
+    if normal_score or bang_score:
+        return " / ".join(part for part in (normal_score, bang_score) if part)
+    if win_rate:
+        return win_rate
+    return records.last_non_empty_line(output) or "无结果"
+
+
+def _parse_win_rate_pct(text: str) -> float | None:
+    """从文本中提取胜率百分比数值, 如 '45.63%' -> 45.63"""
+    # 匹配 namerena 输出: 45.63%(10000) 或 最终胜率:|45.6300%|(10000轮)
+    m = re.search(r"(\d+\.?\d*)%", text)
+    if m is None:
+        return None
+    try:
+        return float(m.group(1))
+    except ValueError:
+        return None
+
+
+def _compute_bench_diff(
+    namerena_result: records.EvalResult, tswn_result: records.EvalResult
+) -> str | None:
+    """计算 namerena 与 tswn 在胜率模式下的差值, 返回 'diff! = 2' 或 None"""
+    rates = []
+    for data in (namerena_result.data, tswn_result.data):
+        if not data or data.get("kind") != "win-rate" or "value" not in data:
+            return None
+        rates.append(float(data["value"]))
+
+    diff = round(abs(rates[0] - rates[1]) * 100)
+    return f"diff! = {diff}"
+
+
+def summarize_tswn_record(data: dict) -> str:
+    """tswn 的 JSON 结果里拿出要展示的那一点"""
+    kind = data.get("kind")
+    if kind == "fight":
+        parts = []
+        if data.get("winners"):
+            parts.append(f"赢家={'|'.join(data['winners'])}")
+        if data.get("win_idx") is not None:
+            parts.append(f"win_idx={data['win_idx']}")
+        if parts:
+            return ", ".join(parts)
+    elif kind in ("score", "win-rate") and "value" in data:
+        label = "胜率" if kind == "win-rate" else "评分"
+        return f"{label}: {records.format_record_value(data)}"
+    elif kind == "pf" and "rows" in data:
+        return "\n".join(
+            ["pp|pd|qp|qd"]
+            + ["|".join(str(value) for value in row[:4]) for row in data["rows"]]
+        )
+    return records.last_non_empty_line(str(data.get("text", ""))) or "无结果"
+
+
+def _legacy_tswn_record(mode: str, output: str) -> dict:
+    """旧版本 tswn-cli 没有 --json, 只能从文本里抠出同样的结构"""
+    if mode == "fight":
+        return {"kind": "fight", "text": output, "winners": parse_tswn_winner_names(output)}
+    if mode == "namer-pf":
+        return {"kind": "pf", "text": output, "rows": _parse_tswn_pf_rows(output)}
+    summary = summarize_tswn_bench(output)
+    win_rate = _parse_win_rate_pct(summary) if summary.startswith("胜率") else None
+    if win_rate is not None:
+        return {"kind": "win-rate", "text": output, "value": win_rate}
+    return {"kind": "score", "text": output}
+
+
+def decode_tswn(mode: str, result: records.EvalResult) -> records.EvalResult:
+    """tswn 的输出 -> (展示用的摘要, 结构化数据)"""
+    data = records.parse_record(result.output)
+    if data is not None:
+        return result._replace(output=summarize_tswn_record(data), data=data)
+    data = _legacy_tswn_record(mode, result.output)
+    if mode == "fight":
+        summary = summarize_tswn_fight(result.output)
+    elif mode == "namer-pf":
+        summary = result.output
+    else:
+        summary = summarize_tswn_bench(result.output)
+    return result._replace(output=summary, data=data)
+
+
+def tswn_fight_for_names(result: records.EvalResult, names: list[str]) -> str:
+    winners = (result.data or {}).get("winners") or []
+    if len(winners) == 1 and winners[0] in names:
+        return str(names.index(winners[0]))
+    if winners:
+        return "|".join(winners)
+    return result.output
+
+
+def _parse_pf_score_row(text: str) -> list[int] | None:
+    parts = text.strip().split("|")
+    if len(parts) < len(records.PF_LABELS) - 1:
+        return None
+    try:
+        return records._complete_pf_row([part.strip() for part in parts])
+    except ValueError:
+        return None
+
+
+def _parse_tswn_pf_rows(output: str) -> list[list[int]]:
+    rows = []
+    for raw_line in output.splitlines():
+        line = raw_line.strip()
+        if not line or line == "pp|pd|qp|qd":
+            continue
+        row = _parse_pf_score_row(line)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+def _compute_pf_diff_lines(
+    md5_score_rows: list[str], tswn_result: records.EvalResult
+) -> list[str]:
+    tswn_rows = [
+        records._complete_pf_row(row) for row in (tswn_result.data or {}).get("rows", [])
+    ]
+    diff_lines = []
+    multi_row = len(md5_score_rows) > 1
+
+    for idx, md5_score in enumerate(md5_score_rows):
+        md5_row = _parse_pf_score_row(md5_score)
+        tswn_row = tswn_rows[idx] if idx < len(tswn_rows) else None
+        if md5_row is None or tswn_row is None:
+            prefix = f"diff[{idx + 1}]" if multi_row else "diff"
+            diff_lines.append(f"{prefix}: 无法解析")
+            continue
+
+        diffs = [
+            (label, abs(md5_value - tswn_value))
+            for label, md5_value, tswn_value in zip(records.PF_LABELS, md5_row, tswn_row)
+            if md5_value != tswn_value
+        ]
+        if diffs:
+            prefix = f"diff[{idx + 1}]" if multi_row else "diff"
+            diff_lines.append(
+                f"{prefix}: "
+                + ", ".join(f"{label}={diff}" for label, diff in diffs)
+            )
+
+    if not diff_lines:
+        return ["diff = 0"]
+    return diff_lines
+
+
+def run_tswn_fight_compare(input_text: str) -> records.EvalResult | None:
+    return run_tswn_cli(input_text, "fight")
+
+
+def run_tswn_bench_compare(input_text: str) -> records.EvalResult | None:
+    if not config.USE_TSWN_COMPARE:
+        return None
+    result = result_cache.cached_eval(
+        result_cache.cache_key("tswn-raw", input_text, tswn=True),
+        lambda: _exec_tswn_json(input_text, "raw", "-n", str(config.TSWN_COMPARE_ROUNDS)),
+    )
+    if result is None:
+        return None
+    return decode_tswn("raw", result)
+
+
+def run_tswn_pf_compare(input_text: str) -> records.EvalResult | None:
+    if not config.USE_TSWN_COMPARE:
+        return None
+    result = result_cache.cached_eval(
+        result_cache.cache_key("tswn-namer-pf", input_text, tswn=True),
+        lambda: _exec_tswn_json(
+            input_text, "namer-pf", "-n", str(config.TSWN_COMPARE_ROUNDS)
+        ),
+    )
+    if result is None:
+        return None
+    return decode_tswn("namer-pf", result)
+
+
+def run_tswn_compare(input_text: str) -> records.EvalResult | None:
+    if records.is_bench_input(input_text):
+        return run_tswn_bench_compare(input_text)
+    return run_tswn_fight_compare(input_text)
+
+
+class TswnServer(process.JsWorker):
+    """
+    常驻的 tswn-cli serve 进程, 协议和 md5-api.js serve 一样
+    请求: {"id", "mode": "fight" | "raw" | "namer-pf", "args": [...], "input"}
+    回复: {"id", "ok", "output" | "error"}
+    一个进程同时只跑一个请求, 由 acquire_tswn_server 借出去, 用完还回来
+    """
+
+    def __init__(self, runner: tuple[list[str], str | None], generation: int = 0) -> None:
+        command, cwd = runner
+        super().__init__(command[0], Path(command[0]))
+        self.runner = runner
+        self.cwd = cwd
+        # cargo run 要编译, 不能套资源上限
+        self.limits = cwd is None
+        self.generation = generation
+        self.mtime = self.binary_mtime()
+
+    def command(self) -> list[str]:
+        return [*self.runner[0], "serve"]
+
+    def binary_mtime(self) -> float | None:
+        """直接跑 exe 的时候记下 mtime, cargo run 会自己重新编译, 不用管"""
+        command, cwd = self.runner
+        if cwd is not None:
+            return None
+        try:
+            return os.stat(command[0]).st_mtime
+        except OSError:
+            return None
+
+    def stale(self) -> bool:
+        return self.mtime is not None and self.binary_mtime() != self.mtime
+
+    def call(self, input_text: str, *args: str, timeout: float | None = None) -> dict:
+        mode, *rest = args
+        return self.request({"mode": mode, "args": rest, "input": input_text}, timeout)
+
+
+def acquire_tswn_server(runner: tuple[list[str], str | None]) -> TswnServer | None:
+    """
+    借一个空闲的 tswn 常驻进程, 用完要 release_tswn_server
+    没有空闲的就在池子没满的时候拉一个新的, 满了 / 不支持 serve 的旧版本返回 None (单独启动)
+    启动和第一次 ping 不占着锁, cargo run 编译的时候别的对比照样能跑
+    """
+    global TSWN_SERVER_BUSY, TSWN_SERVER_READY, TSWN_SERVER_FAILED
+
+    size = distributed.eval_parallelism()
+    discarded = []
+    server = None
+    with TSWN_SERVER_LOCK:
+        if TSWN_SERVER_FAILED:
+            return None
+        while TSWN_SERVERS:
+            idle = TSWN_SERVERS.pop()
+            if idle.runner == runner and idle.alive() and not idle.stale():
+                TSWN_SERVER_BUSY += 1
+                return idle
+            if idle.stale():
+                # 换了新的 exe, 版本号也得重新查
+                runtimes.VERSION_CACHE.clear()
+                TSWN_JSON_SUPPORT.clear()
+            discarded.append(idle)
+        # 第一个还没启动成功的时候只拉一个, 其它的先单独启动
+        starting = TSWN_SERVER_BUSY > 0 and not TSWN_SERVER_READY
+        if TSWN_SERVER_BUSY < size and not starting:
+            TSWN_SERVER_BUSY += 1
+            server = TswnServer(runner, TSWN_SERVER_GENERATION)
+    for idle in discarded:
+        idle.stop(timeout=1.0)
+    if server is None:
+        return None
+
+    timeout = TSWN_SERVER_START_TIMEOUT * (1 if runner[1] is None else 12)
+    try:
+        server.start()
+        ok = server.ping(timeout)
+    except OSError:
+        ok = False
+    with TSWN_SERVER_LOCK:
+        if server.generation == TSWN_SERVER_GENERATION:
+            if ok:
+                TSWN_SERVER_READY = True
+            else:
+                TSWN_SERVER_BUSY -= 1
+                TSWN_SERVER_FAILED = True
+    if not ok:
+        server.stop(timeout=1.0)
+        return None
+    return server
+
+
+def release_tswn_server(server: TswnServer, ok: bool) -> None:
+    """还回池子, 出过错的 (或者池子已经重置过了) 直接停掉"""
+    global TSWN_SERVER_BUSY
+
+    with TSWN_SERVER_LOCK:
+        if server.generation == TSWN_SERVER_GENERATION:
+            TSWN_SERVER_BUSY -= 1
+            if ok:
+                TSWN_SERVERS.append(server)
+                return
+    server.stop(timeout=1.0)
+
+
+def stop_tswn_server() -> None:
+    """停掉所有空闲的, 借出去的还回来的时候停"""
+    global TSWN_SERVER_BUSY, TSWN_SERVER_READY, TSWN_SERVER_GENERATION, TSWN_SERVER_FAILED
+
+    with TSWN_SERVER_LOCK:
+        servers = list(TSWN_SERVERS)
+        TSWN_SERVERS.clear()
+        TSWN_SERVER_BUSY = 0
+        TSWN_SERVER_READY = False
+        TSWN_SERVER_GENERATION += 1
+        TSWN_SERVER_FAILED = False
+    for server in servers:
+        server.stop(timeout=1.0)
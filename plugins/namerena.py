@@ -1,15 +1,14 @@
 from __future__ import annotations
 
 import io
-import re
-import shutil
+import os
 import sys
 import time
-import traceback
-import subprocess
+import threading
 
+from concurrent.futures import Future
 from pathlib import Path
-from typing import TYPE_CHECKING, TypeVar
+from typing import TYPE_CHECKING, Callable, TypeVar
 from shenbot_api import PluginManifest, ConfigStorage
 
 if str(Path(__file__).parent.absolute()) not in sys.path:
@@ -17,14 +16,22 @@ if str(Path(__file__).parent.absolute()) not in sys.path:
 
 import name_utils
 import sqrtools
-
-TELEMETRY = False
-try:
-    import psycopg
-
-    TELEMETRY = True
-except ImportError:
-    pass
+import sqrtools.search
+from namer_eval import (
+    config,
+    distributed,
+    eta_model,
+    evaluation,
+    job_queue,
+    js_pool,
+    process,
+    records,
+    result_cache,
+    runtimes,
+    scores,
+    telemetry,
+    tswn_cli,
+)
 
 if TYPE_CHECKING:
     from ica_typing import (
@@ -40,7 +47,7 @@ else:
     ReciveMessage = TypeVar("ReciveMessage")
     TailchatReciveMessage = TypeVar("TailchatReciveMessage")
 
-_version_ = "0.10.4"
+_version_ = "0.11.0"
 
 CMD_PREFIX = "/namer"
 
@@ -56,6 +63,13 @@ CONVERT_CMD = f"{CMD_PREFIX}-peek"
 BASE_CMD = f"{CMD_PREFIX}-base"
 FIGHT_CMD = f"{CMD_PREFIX}-fight"
 HELP_CMD = f"{CMD_PREFIX}-help"
+CACHE_CMD = f"{CMD_PREFIX}-cache"
+STATS_CMD = f"{CMD_PREFIX}-stats"
+QUEUE_CMD = f"{CMD_PREFIX}-queue"
+CANCEL_CMD = f"{CMD_PREFIX}-cancel"
+TOP_CMD = f"{CMD_PREFIX}-top"
+LOOKUP_CMD = f"{CMD_PREFIX}-lookup"
+SEARCH_CMD = f"{CMD_PREFIX}-search"
 
 HELP_MSG = f"""namerena-v[{_version_}]
 名字竞技场 一款不建议入坑的文字类游戏
@@ -67,29 +81,118 @@ PF
     - 一行一个名字/+连接的多个名字
 - {EVAL_PF_CMD} - 一下子全评
     - 一行一个名字/+连接的多个名字
+    - 结果会记到评分索引里
+- {TOP_CMD} - 评分索引里的排行榜
+    - 例如: "{TOP_CMD} qp 20" 表示按 qp 排前 20, 默认按 sum 排前 10
+- {LOOKUP_CMD} - 从评分索引里直接查名字的评分, 不重新跑
+    - 一行一个名字
+- 评分/胜率命令后面可以跟一个精度, 跑到 95% 置信区间够窄就提前停
+    - 例如: "{EVAL_PP_CMD} 0.5" 表示跑到 ±0.5% 为止, 最多跑 10000 轮
 - {CONVERT_CMD} - 查看一个名字的属性, 每一行一个名字
 - {BASE_CMD} - base 工具, 只支持单个名字 (避免刷屏)
+- {SEARCH_CMD} - 在后台暴力搜名字, 每一行一个 key=value
+    - charset=字符集 length=1-4 (或者 words=词1,词2) prefix= suffix= team=
+    - where=速>=60 (可以写多行) sort=八围 top=10
+    - 每次搜有上限, 再发一次同样的命令会从上次停下的地方接着搜
 - {FIGHT_CMD} - 1v1 战斗, 格式是 "AAA+BBB+[seed]"
     - 例如: "AAA+BBB+seed:123@!" 表示 AAA 和 BBB 以 123@! 为种子进行战斗
-    - 可以输入多行"""
+    - 可以输入多行
+- {CACHE_CMD} - 查看结果缓存的命中率
+- {STATS_CMD} - 查看运行统计
+- {QUEUE_CMD} - 查看排队情况
+    - 跑得久的命令会排队执行, 每个人同时只跑有限个
+- {CANCEL_CMD} - 取消自己正在跑和排队的命令"""
 
 bun_hint = "bun\npowered by https://bun.sh"
 
-DB_VERSION = 1
-"""
-数据库版本号
-- 1: 20250504 初始版本
-"""
-
 cfg = ConfigStorage(
-    # 是否启用 bun
+    # 是否启用 bun (等同于 js_runtime="bun")
     use_bun=False,
+    # 指定 JS 运行时 "node" / "bun", 留空表示按测速结果分模式自动选择
+    js_runtime="",
+    # 加载时是否对每个可用的运行时跑一遍小测速
+    runtime_calibration=True,
+    # 加载时是否在后台找好 tswn-cli, 查好版本号, 把 tswn 常驻进程拉起来
+    background_discovery=True,
     # 是否启用遥测
     telemetry=True,
+    # 遥测数据库连接串 (PostgreSQL), 留空表示不写
+    telemetry_dsn="",
+    # 遥测队列长度, 满了之后新的记录直接丢弃
+    telemetry_queue_size=10000,
     # 是否启用 tswn-cli 对比
     use_tswn_compare=True,
     # tswn-cli 路径, 支持直接填 exe / 仓库根目录 / crates/tswn_core
     tswn_cli_path="",
+    # 是否让 tswn-cli 以 serve 模式常驻, 不用每次对比都重新启动 (最多和对比线程一样多个进程)
+    use_tswn_server=True,
+    # 是否让 tswn-cli 输出 JSON (旧版本不支持的话会自动退回文本)
+    tswn_json=True,
+    # 是否使用常驻的 md5-api.js 进程池
+    use_worker_pool=True,
+    # 常驻进程数量, 0 表示按 CPU 核数自动选择
+    worker_count=0,
+    # 测速以后某些模式换了运行时, 另一个运行时的进程池开几个, 0 表示主进程池的四分之一 (至少 1 个)
+    sibling_worker_count=0,
+    # 是否缓存 md5.js 的编译结果 (放在 md5/.code-cache 里), 加快进程启动
+    code_cache=True,
+    # 远程 agent 地址, 逗号分隔, 例如 "10.0.0.2:9400,10.0.0.3:9400"
+    # agent 用 "node md5-api.js agent --port=9400" 启动
+    remote_agents="",
+    # 和 agent 约定的共享密钥, 留空表示不检查
+    remote_token="",
+    # 在本机起几个 agent 子进程, 用来在单机上试分布式, 0 表示不起
+    local_agents=0,
+    # 每个本机 agent 的并发数
+    local_agent_workers=1,
+    # 单个评分/胜率拆成几段在不同进程里并行跑, 0 表示按进程池大小, 1 表示不拆
+    bench_shards=0,
+    # 评分/胜率的目标置信区间半宽 (百分比), 0 表示固定跑满轮数
+    bench_precision=0.0,
+    # 长任务的进度回报间隔 (秒), 0 表示不回报
+    progress_interval=15,
+    # 同时执行几个跑 namerena 的命令, 其他的排队
+    job_workers=2,
+    # 排队上限, 满了之后新的命令直接拒绝
+    job_queue_size=20,
+    # 每个用户同时执行的命令数
+    job_user_limit=1,
+    # 每个用户最多排队的命令数
+    job_user_queue=3,
+    # 每个房间同时执行的命令数, 0 表示不限
+    job_room_limit=0,
+    # 一场战斗的超时 (秒), 0 表示不限
+    fight_timeout=60,
+    # 一次胜率的超时 (秒), 0 表示不限
+    win_rate_timeout=600,
+    # 一次评分的超时 (秒), 0 表示不限
+    score_timeout=600,
+    # 单独启动的子进程最多用多少 CPU 秒 (RLIMIT_CPU), 0 表示不限
+    # 常驻进程会一直累计 CPU 时间, 只靠上面的超时
+    child_cpu_limit=900,
+    # 子进程最多用多少 MB 地址空间 (RLIMIT_AS), 0 表示不限, 最少 1024 (太小的话 node 启动就会崩)
+    # bun 启动时会预留很大的地址空间, 用 bun 的话可能要调大或者关掉
+    child_memory_limit=4096,
+    # 是否启用结果缓存
+    use_cache=True,
+    # 内存缓存条数
+    cache_memory_size=1024,
+    # 磁盘 (SQLite) 缓存条数
+    cache_disk_size=100000,
+    # 是否把 pf 的结果记到评分索引里
+    score_index=True,
+    # 评分索引里的结果多少天内算新的, 0 表示一直有效
+    score_max_age=30,
+    # /namer-search 用几个进程, 0 表示 CPU 核数的一半, 最多不超过 CPU 核数
+    search_workers=0,
+    # /namer-search 每次最多搜多少个名字
+    search_max_candidates=200000,
+    # /namer-search 每次最多搜多少秒
+    search_max_seconds=300,
+    # /namer-search 最多列出前多少个
+    search_top_k=20,
+    # 搜索进程的启动方式 "fork" / "spawn" / "forkserver", 留空用 Python 的默认
+    search_start_method="",
 )
 
 PLUGIN_MANIFEST = PluginManifest(
@@ -100,26 +203,32 @@ PLUGIN_MANIFEST = PluginManifest(
     authors=["shenjack"],
     config={"main": cfg},
 )
-
-USE_BUN = False
-USE_TSWN_COMPARE = True
-TSWN_CLI_PATH = ""
-TSWN_RUNNER: tuple[list[str], str | None] | None = None
-TSWN_RUNNER_FAILED = False
-TSWN_COMPARE_ROUNDS = 10000
-VERSION_CACHE: dict[tuple[str, ...], str | None] = {}
+SCORE_TOP_LIMIT = 50
+SEARCH_RUNNING: set[str] = set()
+"""
+正在跑的搜索 (按搜索条件的 key), 同一个断点同时只能有一个搜索在写
+"""
+SEARCH_RUNNING_LOCK = threading.Lock()
+SEARCH_CHECKPOINT_ROOT = Path(__file__).parent / "md5" / "search"
+"""
+/namer-search 的断点, 按搜索条件的 hash 存, 同样的命令再发一次就接着搜
+"""
+LAST_SEARCH: sqrtools.search.NameSearcher | None = None
 
 
-def out_msg(cost_time: float) -> str:
-    runtime = get_js_runtime()
+def out_msg(cost_time: float, cached: bool = False) -> str:
+    runtime = runtimes.get_js_runtime()
     use_bun = runtime == "bun"
-    lines = [f"耗时: {cost_time:.3f}s", f"版本: {_version_}-{runtime}"]
+    lines = [
+        f"耗时: {cost_time:.3f}s" + (" (缓存)" if cached else ""),
+        f"版本: {_version_}-{runtime}",
+    ]
 
-    runtime_version = get_runtime_version()
+    runtime_version = runtimes.get_runtime_version()
     if runtime_version:
         lines.append(f"{runtime}: {runtime_version}")
 
-    tswn_version = get_tswn_version()
+    tswn_version = tswn_cli.get_tswn_version()
     if tswn_version:
         lines.append(f"tswn: {tswn_version}")
 
@@ -133,384 +242,26 @@ def join_non_empty(*parts: str) -> str:
     return "\n".join(part for part in parts if part)
 
 
-def _resolve_tswn_runner_candidate(
-    raw_path: str,
-) -> tuple[list[str], str | None] | None:
-    candidate = Path(raw_path)
-    if candidate.exists():
-        if candidate.is_file():
-            return [str(candidate)], None
-
-        crate_dir = candidate
-        if not (crate_dir / "Cargo.toml").exists():
-            nested_crate = candidate / "crates" / "tswn_core"
-            if (nested_crate / "Cargo.toml").exists():
-                crate_dir = nested_crate
-
-        workspace_dir = crate_dir
-        if crate_dir.name == "tswn_core" and crate_dir.parent.name == "crates":
-            workspace_dir = crate_dir.parent.parent
-
-        exe_name = "tswn-cli.exe" if sys.platform.startswith("win") else "tswn-cli"
-        for exe_path in (
-            workspace_dir / "target" / "debug" / exe_name,
-            workspace_dir / "target" / "release" / exe_name,
-        ):
-            if exe_path.exists():
-                return [str(exe_path)], None
-
-        if (crate_dir / "Cargo.toml").exists():
-            return ["cargo", "run", "--bin", "tswn-cli", "--"], str(crate_dir)
-
-    resolved = shutil.which(raw_path)
-    if resolved is not None:
-        return [resolved], None
-
-    return None
-
-
-def resolve_tswn_runner() -> tuple[list[str], str | None] | None:
-    global TSWN_RUNNER, TSWN_RUNNER_FAILED
-
-    if TSWN_RUNNER is not None:
-        return TSWN_RUNNER
-    if TSWN_RUNNER_FAILED:
-        return None
-
-    if TSWN_CLI_PATH.strip():
-        resolved = _resolve_tswn_runner_candidate(TSWN_CLI_PATH.strip())
-        if resolved is not None:
-            TSWN_RUNNER = resolved
-            return resolved
-
-    plugin_root = Path(__file__).resolve().parent
-    exe_name = "tswn-cli.exe" if sys.platform.startswith("win") else "tswn-cli"
-    for candidate in (
-        plugin_root / "name_utils" / exe_name,
-        plugin_root / "name_utils" / "tswn-cli",
-    ):
-        resolved = _resolve_tswn_runner_candidate(str(candidate))
-        if resolved is not None:
-            TSWN_RUNNER = resolved
-            return resolved
-
-    path_runner = _resolve_tswn_runner_candidate("tswn-cli")
-    if path_runner is not None:
-        TSWN_RUNNER = path_runner
-        return path_runner
-
-    workspace_root = Path(__file__).resolve().parent.parent
-    tswn_repo = workspace_root.parent.parent / "namer" / "tswn-core"
-    for candidate in (
-        tswn_repo / "target" / "debug" / exe_name,
-        tswn_repo / "target" / "release" / exe_name,
-        tswn_repo / "crates" / "tswn_core",
-        tswn_repo,
-    ):
-        resolved = _resolve_tswn_runner_candidate(str(candidate))
-        if resolved is not None:
-            TSWN_RUNNER = resolved
-            return resolved
-
-    TSWN_RUNNER_FAILED = True
-    return None
-
-
-def run_tswn_cli(input_text: str, *args: str) -> tuple[str, float] | None:
-    global TSWN_RUNNER_FAILED
-
-    if not USE_TSWN_COMPARE:
-        return None
-
-    runner = resolve_tswn_runner()
-    if runner is None:
-        return None
-
-    command, cwd = runner
-    start_time = time.time()
-    try:
-        result = subprocess.run(
-            [*command, *args],
-            input=input_text,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=False,
-            text=True,
-            encoding="utf-8",
-            cwd=cwd,
-        )
-        output = (
-            result.stdout
-            if result.returncode == 0
-            else (result.stderr or result.stdout)
-        )
-    except FileNotFoundError:
-        TSWN_RUNNER_FAILED = True
-        return None
-    except Exception as e:
-        output = f"发生错误: {e}\n{traceback.format_exc()}"
-    return output.strip(), time.time() - start_time
-
-
-def last_non_empty_line(output: str) -> str:
-    for line in reversed(output.splitlines()):
-        if line.strip():
-            return line.strip()
-    return ""
-
-
-def resolve_command_version(command: list[str], cwd: str | None = None) -> str | None:
-    cache_key = tuple([*command, f"cwd={cwd or ''}"])
-    if cache_key in VERSION_CACHE:
-        return VERSION_CACHE[cache_key]
-
-    try:
-        result = subprocess.run(
-            [*command, "--version"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=False,
-            text=True,
-            encoding="utf-8",
-            cwd=cwd,
-        )
-    except Exception:
-        VERSION_CACHE[cache_key] = None
-        return None
-
-    output = result.stdout or result.stderr
-    version = last_non_empty_line(output)
-    VERSION_CACHE[cache_key] = version or None
-    return VERSION_CACHE[cache_key]
-
-
-def get_runtime_version() -> str | None:
-    return resolve_command_version([get_js_runtime()])
-
-
-def get_js_runtime() -> str:
-    return "node" if shutil.which("node") is not None else "bun"
-
-
-def get_tswn_version() -> str | None:
-    if not USE_TSWN_COMPARE:
-        return None
-
-    runner = resolve_tswn_runner()
-    if runner is None:
-        return None
-
-    command, cwd = runner
-    version = resolve_command_version(command, cwd)
-    if version is None:
-        return None
-    if version.startswith("tswn-cli "):
-        return version[len("tswn-cli ") :]
-    return version
-
+def cost_str(cost_time: float, cached: bool = False) -> str:
+    return f"{cost_time:.2f}s" + ("(缓存)" if cached else "")
 
-def is_bench_input(input_text: str) -> bool:
-    raw = input_text.lstrip("\ufeff").lstrip()
-    return raw.startswith("!test!")
 
-
-def parse_tswn_winner_names(output: str) -> list[str]:
-    winners = []
-    in_winner_block = False
-    for raw_line in output.splitlines():
-        line = raw_line.strip()
-        if line == "赢家:":
-            in_winner_block = True
-            continue
-        if not in_winner_block:
-            continue
-        if line.startswith("总战斗分:") or line.startswith("win_idx="):
-            break
-        if line.startswith("- "):
-            winners.append(line[2:].split(" (", 1)[0])
-    return winners
-
-
-def summarize_tswn_fight(output: str) -> str:
-    winners = parse_tswn_winner_names(output)
-    win_idx = ""
-    unresolved = ""
-    for raw_line in output.splitlines():
-        line = raw_line.strip()
-        if line.startswith("win_idx="):
-            win_idx = line
-        elif "未分出胜负" in line:
-            unresolved = line
-
-    parts = []
-    if winners:
-        parts.append(f"赢家={'|'.join(winners)}")
-    elif unresolved:
-        parts.append(unresolved)
-    if win_idx:
-        parts.append(win_idx)
-    if parts:
-        return ", ".join(parts)
-    return last_non_empty_line(output) or "无结果"
-
-
-def summarize_tswn_fight_for_names(output: str, names: list[str]) -> str:
-    winners = parse_tswn_winner_names(output)
-    if len(winners) == 1 and winners[0] in names:
-        return str(names.index(winners[0]))
-    if winners:
-        return "|".join(winners)
-    return summarize_tswn_fight(output)
-
-
-def summarize_tswn_bench(output: str) -> str:
-    normal_score = ""
-    bang_score = ""
-    win_rate = ""
-    for raw_line in output.splitlines():
-        line = raw_line.strip()
-        normal_match = re.search(r"普通评分:\s*[^\r\n(]+", line)
-        bang_match = re.search(r"!评分:\s*[^\r\n(]+", line)
-        win_rate_match = re.search(r"胜率:\s*[^\r\n(]+", line)
-
-        if normal_match is not None:
-            normal_score = normal_match.group(0).strip()
-        if bang_match is not None:
-            bang_score = bang_match.group(0).strip()
-        if win_rate_match is not None:
-            win_rate = win_rate_match.group(0).strip()
-
-    if normal_score or bang_score:
-        return " / ".join(part for part in (normal_score, bang_score) if part)
-    if win_rate:
-        return win_rate
-    return last_non_empty_line(output) or "无结果"
-
-
-def _parse_win_rate_pct(text: str) -> float | None:
-    """从文本中提取胜率百分比数值, 如 '45.63%' -> 45.63"""
-    # 匹配 namerena 输出: 45.63%(10000) 或 最终胜率:|45.6300%|(10000轮)
-    m = re.search(r"(\d+\.?\d*)%", text)
-    if m is None:
+def parse_precision(content: str, cmd: str) -> float | None:
+    """
+    从命令第一行取精度, 例如 "/namer-pp 0.5" / "/namer-pp ±0.5%"
+    没写或者写错了就返回 None (用配置里的)
+    """
+    first_line = content[len(cmd) :].split("\n", 1)[0]
+    raw = first_line.strip().lstrip("±").rstrip("%").strip()
+    if not raw:
         return None
     try:
-        return float(m.group(1))
+        precision = float(raw)
     except ValueError:
         return None
-
-
-def _compute_bench_diff(
-    namerena_output: str, tswn_summary: str
-) -> str | None:
-    """计算 namerena 与 tswn 在胜率模式下的差值, 返回 'diff! = 2' 或 None"""
-    # 从 namerena 输出提取胜率: 优先取 最终胜率 行, 否则取最后一行
-    namerena_rate: float | None = None
-    for raw_line in namerena_output.splitlines():
-        line = raw_line.strip()
-        if line.startswith("最终胜率:"):
-            namerena_rate = _parse_win_rate_pct(line)
-            break
-    if namerena_rate is None:
-        # 取最后非空行
-        last = last_non_empty_line(namerena_output)
-        if last:
-            namerena_rate = _parse_win_rate_pct(last)
-
-    # 从 tswn 汇总提取胜率
-    tswn_rate = _parse_win_rate_pct(tswn_summary)
-
-    if namerena_rate is None or tswn_rate is None:
+    if precision < 0:
         return None
-
-    diff = round(abs(namerena_rate - tswn_rate) * 100)
-    return f"diff! = {diff}"
-
-
-PF_LABELS = ("pp", "pd", "qp", "qd", "sum")
-
-
-def _parse_pf_score_row(text: str) -> list[int] | None:
-    parts = text.strip().split("|")
-    if len(parts) < len(PF_LABELS) - 1:
-        return None
-    try:
-        values = [int(float(part.strip())) for part in parts[: len(PF_LABELS)]]
-    except ValueError:
-        return None
-    if len(values) == len(PF_LABELS) - 1:
-        values.append(sum(values))
-    return values
-
-
-def _parse_tswn_pf_rows(output: str) -> list[list[int]]:
-    rows = []
-    for raw_line in output.splitlines():
-        line = raw_line.strip()
-        if not line or line == "pp|pd|qp|qd":
-            continue
-        row = _parse_pf_score_row(line)
-        if row is not None:
-            rows.append(row)
-    return rows
-
-
-def _compute_pf_diff_lines(
-    md5_score_rows: list[str], tswn_output: str
-) -> list[str]:
-    tswn_rows = _parse_tswn_pf_rows(tswn_output)
-    diff_lines = []
-    multi_row = len(md5_score_rows) > 1
-
-    for idx, md5_score in enumerate(md5_score_rows):
-        md5_row = _parse_pf_score_row(md5_score)
-        tswn_row = tswn_rows[idx] if idx < len(tswn_rows) else None
-        if md5_row is None or tswn_row is None:
-            prefix = f"diff[{idx + 1}]" if multi_row else "diff"
-            diff_lines.append(f"{prefix}: 无法解析")
-            continue
-
-        diffs = [
-            (label, abs(md5_value - tswn_value))
-            for label, md5_value, tswn_value in zip(PF_LABELS, md5_row, tswn_row)
-            if md5_value != tswn_value
-        ]
-        if diffs:
-            prefix = f"diff[{idx + 1}]" if multi_row else "diff"
-            diff_lines.append(
-                f"{prefix}: "
-                + ", ".join(f"{label}={diff}" for label, diff in diffs)
-            )
-
-    if not diff_lines:
-        return ["diff = 0"]
-    return diff_lines
-
-
-def run_tswn_fight_compare(input_text: str) -> tuple[str, float] | None:
-    result = run_tswn_cli(input_text, "fight")
-    if result is None:
-        return None
-    return summarize_tswn_fight(result[0]), result[1]
-
-
-def run_tswn_bench_compare(input_text: str) -> tuple[str, float] | None:
-    result = run_tswn_cli(input_text, "raw", "-n", str(TSWN_COMPARE_ROUNDS))
-    if result is None:
-        return None
-    return summarize_tswn_bench(result[0]), result[1]
-
-
-def run_tswn_pf_compare(input_text: str) -> tuple[str, float] | None:
-    result = run_tswn_cli(input_text, "namer-pf", "-n", str(TSWN_COMPARE_ROUNDS))
-    if result is None:
-        return None
-    return result[0], result[1]
-
-
-def run_tswn_compare(input_text: str) -> tuple[str, float] | None:
-    if is_bench_input(input_text):
-        return run_tswn_bench_compare(input_text)
-    return run_tswn_fight_compare(input_text)
+    return precision
 
 
 def convert_name(msg: ReciveMessage, client) -> None:
@@ -528,13 +279,12 @@ def convert_name(msg: ReciveMessage, client) -> None:
     names = names[names.find("\n") + 1 :]
     cache = io.StringIO()
     raw_players = [x for x in names.split("\n") if x != ""]
-    players = [name_utils.Player() for _ in raw_players]
+    players = name_utils.load_many(raw_players)
     for i, player in enumerate(players):
-        if not player.load(raw_players[i]):
+        if player is None:
             cache.write(f"{i + 1} {raw_players[i]} 无法解析\n")
-            raw_players[i] = ""
-    for i, player in enumerate(players):
-        if raw_players[i] == "":
+    for player in players:
+        if player is None:
             continue
         cache.write(player.display())
         cache.write("\n")
@@ -581,10 +331,10 @@ def convert_base(msg: ReciveMessage, client) -> None:
         cache.write("-> " + str(r[i + 1] + 36) + " / " + str(r[i + 2] + 36) + "\n")
         propcnt += 1
     cache.write("\n")
-    current_player.calcskill(False)
+    skills = current_player.skills(False)
     doubleflag = -1
     for i in range(15, -1, -1):
-        if current_player.nameskill[i][1] > 0 and current_player.nameskill[i][0] < 25:
+        if skills[i][1] > 0 and skills[i][0] < 25:
             doubleflag = i
             break
     for i in range(16):
@@ -592,9 +342,9 @@ def convert_base(msg: ReciveMessage, client) -> None:
             "#"
             + str(i).zfill(2)
             + " "
-            + sqrtools.sklname[current_player.nameskill[i][0]]
+            + sqrtools.sklname[skills[i][0]]
         )
-        if current_player.nameskill[i][0] >= 35:
+        if skills[i][0] >= 35:
             _ = cache.write("\n")
         else:
             r = current_player.namebase[i * 4 + 64 : i * 4 + 68]
@@ -602,7 +352,7 @@ def convert_base(msg: ReciveMessage, client) -> None:
                 ": "
                 + " ".join(str(j).zfill(2) for j in r)
                 + " -> "
-                + str(current_player.nameskill[i][1]).zfill(2)
+                + str(skills[i][1]).zfill(2)
                 + " / "
             )
             r = sorted(r)
@@ -615,7 +365,7 @@ def convert_base(msg: ReciveMessage, client) -> None:
                 else:
                     cache.write(str(r[1] - 10 if r[1] > 10 else 0).zfill(2) + "\n")
             else:
-                if current_player.nameskill[i][1] > 0:
+                if skills[i][1] > 0:
                     if doubleflag == i:
                         cache.write(
                             str((r[1] - 10) * 2 if r[1] > 10 else 0).zfill(2)
@@ -626,8 +376,8 @@ def convert_base(msg: ReciveMessage, client) -> None:
                             r[1]
                             - 10
                             + min(
-                                [r[1] - 10]
-                                + current_player.namebase[32 + i * 2 : 34 + i * 2]
+                                r[1] - 10,
+                                *current_player.namebase[32 + i * 2 : 34 + i * 2],
                             )
                         )
                         b = (
@@ -658,36 +408,312 @@ def convert_base(msg: ReciveMessage, client) -> None:
     client.send_message(reply)
 
 
-def run_namerena(input_text: str, fight_mode: bool = False) -> tuple[str, float]:
-    """运行namerena"""
-    root_path = Path(__file__).parent
-    runner_path = (root_path / "md5" / "md5-api.js").resolve()
-    if not runner_path.exists():
-        return "未找到namerena运行文件", 0.0
-    run_cmd = [get_js_runtime(), str(runner_path), "any", str(TSWN_COMPARE_ROUNDS)]
-    if fight_mode:
-        run_cmd[2] = "fight"
+def parse_search_spec(body: str) -> sqrtools.search.SearchSpec:
+    """把 /namer-search 后面的 key=value 行拼成搜索条件, 有问题抛 ValueError"""
+    options: dict[str, str] = {}
+    conditions = []
+    for line in body.split("\n"):
+        if not line.strip():
+            continue
+        key, sep, value = line.partition("=")
+        key = key.strip().lower()
+        if not sep:
+            raise ValueError(f"看不懂这一行: {line}")
+        if key == "where":
+            conditions.append(sqrtools.search.parse_condition(value))
+        elif key in ("charset", "length", "words", "prefix", "suffix", "team", "sort", "top"):
+            options[key] = value.strip()
+        else:
+            raise ValueError(f"不认识的参数: {key}")
+
+    words = tuple(word.strip() for word in options.get("words", "").split(",") if word.strip())
+    charset = "".join(dict.fromkeys(options.get("charset", "").replace("@", "")))
+    if not words and not charset:
+        raise ValueError("需要 charset= 或者 words=")
+    min_length, max_length = sqrtools.search.parse_length(options.get("length") or "1")
+    sort_by = options.get("sort") or sqrtools.search.TOTAL_FIELD
+    if sort_by not in sqrtools.search.field_names():
+        raise ValueError(f"没有这个排序字段: {sort_by}")
+    top_k = int(options.get("top") or 10)
+    if top_k < 1 or top_k > config.SEARCH_TOP_K:
+        raise ValueError(f"top 只能是 1~{config.SEARCH_TOP_K}")
+    return sqrtools.search.SearchSpec(
+        team=options.get("team", ""),
+        charset=charset,
+        min_length=min_length,
+        max_length=max_length,
+        prefix=options.get("prefix", ""),
+        suffix=options.get("suffix", ""),
+        words=words,
+        conditions=tuple(conditions),
+        sort_by=sort_by,
+        top_k=top_k,
+    )
+
+
+def search_names(msg: ReciveMessage, client) -> None:
+    """
+    有上限地搜一段, 断点按搜索条件存盘
+    同样的条件再发一次就从断点接着搜, 排行也接着上次的
+    """
+    body = msg.content[msg.content.find("\n") + 1 :] if "\n" in msg.content else ""
+    if not body.strip():
+        client.send_message(
+            msg.reply_with(
+                f"请使用 {SEARCH_CMD} 命令, 然后换行输入搜索条件, 例如:\n"
+                f"{SEARCH_CMD}\ncharset=abcdefg\nlength=1-4\nwhere=速>=60\nsort=八围"
+            )
+        )
+        return
+    try:
+        spec = parse_search_spec(body)
+    except ValueError as e:
+        client.send_message(msg.reply_with(f"搜索条件有误: {e}"))
+        return
+
+    searcher = sqrtools.search.NameSearcher(spec, 1)
+    if searcher.total == 0:
+        client.send_message(msg.reply_with("没有要搜的名字"))
+        return
+    key = spec.key()
+    with SEARCH_RUNNING_LOCK:
+        if key in SEARCH_RUNNING:
+            client.send_message(msg.reply_with("同样的搜索正在跑, 等它跑完再发"))
+            return
+        SEARCH_RUNNING.add(key)
+    try:
+        run_search(msg, client, searcher, SEARCH_CHECKPOINT_ROOT / f"{key}.json")
+    finally:
+        with SEARCH_RUNNING_LOCK:
+            SEARCH_RUNNING.discard(key)
+
+
+def search_workers() -> int:
+    """配置的进程数, 0 表示一半的核, 怎么都不超过核数"""
+    cpu_count = os.cpu_count() or 1
+    workers = config.SEARCH_WORKERS if config.SEARCH_WORKERS > 0 else cpu_count // 2
+    return max(min(workers, cpu_count), 1)
+
+
+def search_command(spec: sqrtools.search.SearchSpec, checkpoint: Path) -> list[str]:
+    """python -m sqrtools.search 的命令行, 参数都用 --key=value, 免得值以 - 开头"""
+    command = [
+        sys.executable or "python",
+        "-m",
+        "sqrtools.search",
+        f"--team={spec.team}",
+        f"--charset={spec.charset}",
+        f"--length={spec.min_length}-{spec.max_length}",
+        f"--prefix={spec.prefix}",
+        f"--suffix={spec.suffix}",
+        f"--sort={spec.sort_by}",
+        f"--top={spec.top_k}",
+        f"--workers={search_workers()}",
+        f"--limit={config.SEARCH_MAX_CANDIDATES}",
+        f"--seconds={config.SEARCH_MAX_SECONDS:g}",
+        f"--checkpoint={checkpoint}",
+    ]
+    command.extend(f"--word={word}" for word in spec.words)
+    command.extend(f"--where={condition}" for condition in spec.conditions)
+    if config.SEARCH_START_METHOD:
+        command.append(f"--start-method={config.SEARCH_START_METHOD}")
+    return command
+
+
+def load_search(
+    spec: sqrtools.search.SearchSpec, checkpoint: Path, start_index: int, start_time: float
+) -> sqrtools.search.NameSearcher:
+    """从子进程写的断点读出进度, 这一次的速度按 start_index / start_time 算"""
+    searcher = sqrtools.search.NameSearcher(spec, 1)
+    searcher.load(checkpoint)
+    searcher.scanned = max(searcher.next_index - start_index, 0)
+    searcher.started = start_time
+    searcher.ended = time.time()
+    return searcher
+
+
+def run_search(
+    msg: ReciveMessage, client, searcher: sqrtools.search.NameSearcher, checkpoint: Path
+) -> None:
+    """
+    搜索在 python -m sqrtools.search 子进程里跑, 超时 / 取消 / 资源上限和别的子进程一样
+    子进程每隔几秒存一次断点, 进度和结果都从断点读
+    """
+    global LAST_SEARCH
+
+    spec = searcher.spec
+    resumed = searcher.load(checkpoint)
+    if searcher.finished:
+        client.send_message(
+            msg.reply_with(f"这个搜索已经搜完了\n{format_search(searcher)}")
+        )
+        return
+    client.send_message(
+        msg.reply_with(
+            f"开始搜索, 一共 {searcher.total} 个名字"
+            + (f", 从断点 {searcher.next_index} 继续" if resumed else "")
+            + f"\n本次最多搜 {config.SEARCH_MAX_CANDIDATES} 个 / {config.SEARCH_MAX_SECONDS:.0f}s"
+            + f", {search_workers()} 个进程"
+        )
+    )
 
+    start_index = searcher.next_index
     start_time = time.time()
+    progress = ProgressReporter(msg, client, config.PROGRESS_INTERVAL)
+    report = progress.callback("搜索")
+    done = threading.Event()
+
+    def poll() -> None:
+        while report is not None and not done.wait(config.PROGRESS_INTERVAL):
+            report(load_search(spec, checkpoint, start_index, start_time).describe())
+
+    threading.Thread(target=poll, daemon=True).start()
     try:
-        result = subprocess.run(
-            run_cmd,
-            input=input_text,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=False,
-            text=True,
-            encoding="utf-8",
-            cwd=root_path / "md5",
+        returncode, _, stderr = process.run_child(
+            search_command(spec, checkpoint),
+            "",
+            Path(__file__).parent,
+            None,
+            "search",
+            group=True,
         )
-        if result.returncode == 0:
-            result = result.stdout
-        else:
-            result = result.stderr
-    except Exception as e:
-        result = f"发生错误: {e}\n{traceback.format_exc()}"
-    end_time = time.time()
-    return result.strip(), end_time - start_time
+    except process.JobCancelled:
+        # 进程组已经杀掉了, 断点停在最后一次存盘的位置
+        return
+    except process.WorkerTimeout as e:
+        returncode, stderr = -1, str(e)
+    finally:
+        done.set()
+        progress.finish()
+    searcher = load_search(spec, checkpoint, start_index, start_time)
+    LAST_SEARCH = searcher
+    if returncode != 0:
+        error = records.last_non_empty_line(stderr) or f"返回码 {returncode}"
+        client.send_message(
+            msg.reply_with(f"搜索进程出错了: {error}\n{format_search(searcher)}")
+        )
+        return
+    tail = "搜完了" if searcher.finished else "还没搜完, 再发一次同样的命令接着搜"
+    client.send_message(msg.reply_with(f"{format_search(searcher)}\n{tail}"))
+
+
+def format_search(searcher: sqrtools.search.NameSearcher) -> str:
+    hits = searcher.hits()
+    lines = [searcher.describe()]
+    if searcher.spec.conditions:
+        lines.append("条件: " + ", ".join(str(condition) for condition in searcher.spec.conditions))
+    if not hits:
+        lines.append("还没有符合条件的名字")
+    for rank, hit in enumerate(hits, 1):
+        lines.append(f"{rank}. {hit.describe()}")
+    return "\n".join(lines)
+
+
+def predict_search() -> float:
+    """按上次搜索的速度估计一次 /namer-search 要跑多久, 最多跑满时间上限"""
+    searcher = LAST_SEARCH
+    rate = searcher.rate if searcher is not None else 0.0
+    if rate <= 0:
+        return config.SEARCH_MAX_SECONDS
+    return min(config.SEARCH_MAX_CANDIDATES / rate, config.SEARCH_MAX_SECONDS)
+
+
+def format_score_row(row: scores.ScoreRow) -> str:
+    age = (time.time() - row.created) / 86400
+    return f"{'|'.join(map(str, row.values))} ({row.rounds}轮, {age:.1f}天前)"
+
+
+def show_top(msg: ReciveMessage, client) -> None:
+    index = scores.SCORE_INDEX
+    if index is None:
+        client.send_message(msg.reply_with("评分索引未启用"))
+        return
+    label = "sum"
+    limit = 10
+    for part in msg.content[len(TOP_CMD) :].split("\n", 1)[0].split():
+        if part.lower() in records.PF_LABELS:
+            label = part.lower()
+        elif part.isdigit():
+            limit = max(1, min(int(part), SCORE_TOP_LIMIT))
+    rows = index.top(label, "namerena", scores.score_version(), limit)
+    if not rows:
+        client.send_message(msg.reply_with(f"评分索引里还没有记录, 先用 {EVAL_PF_CMD} 算一些"))
+        return
+    lines = [f"按 {label} 排行 (共 {index.count()} 条记录)", "pp|pd|qp|qd|sum"]
+    lines.extend(
+        f"{rank}. {row.name}: {format_score_row(row)}" for rank, row in enumerate(rows, 1)
+    )
+    client.send_message(msg.reply_with("\n".join(lines)))
+
+
+def lookup_scores(msg: ReciveMessage, client) -> None:
+    index = scores.SCORE_INDEX
+    if index is None:
+        client.send_message(msg.reply_with("评分索引未启用"))
+        return
+    names = [
+        name.strip()
+        for name in msg.content[len(LOOKUP_CMD) :].split("\n")
+        if name.strip()
+    ]
+    if not names:
+        client.send_message(msg.reply_with("请输入名字"))
+        return
+    version = scores.score_version()
+    tswn_version = tswn_cli.get_tswn_version()
+    lines = ["pp|pd|qp|qd|sum"]
+    missing = 0
+    for name in names:
+        row = index.lookup(name, "namerena", version)
+        if row is None or not scores.score_fresh(row):
+            missing += 1
+            lines.append(f"{name}: 没有够新的记录")
+            continue
+        lines.append(f"{name}: {format_score_row(row)}")
+        if tswn_version:
+            tswn_row = index.lookup(name, "tswn", tswn_version)
+            if tswn_row is not None and scores.score_fresh(tswn_row):
+                lines.append(f"  tswn: {format_score_row(tswn_row)}")
+    if missing:
+        lines.append(f"没有记录的可以用 {EVAL_PF_CMD} 算一下")
+    client.send_message(msg.reply_with("\n".join(lines)))
+
+
+class ProgressReporter:
+    """
+    长任务的进度回报
+    每个子任务报自己最新的进度, 每 interval 秒最多往群里发一条汇总
+    """
+
+    def __init__(self, msg: ReciveMessage, client, interval: float) -> None:
+        self.msg = msg
+        self.client = client
+        self.interval = interval
+        self.latest: dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.last_post = time.time()
+        self.finished = False
+
+    def callback(self, label: str) -> Callable[[str], None] | None:
+        if self.interval <= 0:
+            return None
+        return lambda checkpoint: self.update(label, checkpoint)
+
+    def update(self, label: str, checkpoint: str) -> None:
+        with self.lock:
+            if self.finished:
+                return
+            self.latest[label] = checkpoint
+            now = time.time()
+            if now - self.last_post < self.interval:
+                return
+            self.last_post = now
+            body = "\n".join(f"{key}: {value}" for key, value in self.latest.items())
+        self.client.send_message(self.msg.reply_with(f"进度:\n{body}"))
+
+    def finish(self) -> None:
+        with self.lock:
+            self.finished = True
 
 
 def eval_fight(msg: ReciveMessage, client) -> None:
@@ -701,11 +727,8 @@ def eval_fight(msg: ReciveMessage, client) -> None:
             )
             return
     # 去掉 prefix, 先判断是完整的还是短的
-    names = (
-        msg.content[len(EVAL_CMD) :]
-        if msg.content.startswith(EVAL_CMD)
-        else msg.content[len(EVAL_SIMPLE_CMD) :]
-    )
+    command = EVAL_CMD if msg.content.startswith(EVAL_CMD) else EVAL_SIMPLE_CMD
+    names = msg.content[len(command) :]
     # 去掉第一个 \n
     names = names[names.find("\n") + 1 :]
     # 判空, 别报错了
@@ -713,20 +736,36 @@ def eval_fight(msg: ReciveMessage, client) -> None:
         client.send_message(msg.reply_with("请输入名字"))
         return
 
-    result = run_namerena(names)
-    tswn_result = run_tswn_compare(names)
+    precision = parse_precision(msg.content, command)
+    # 两个引擎同时跑, 各算各的时间
+    tswn_future = evaluation.submit_tswn(tswn_cli.run_tswn_compare, names)
+    progress = ProgressReporter(msg, client, config.PROGRESS_INTERVAL)
+    result = evaluation.run_namerena(
+        names, precision=precision, on_progress=progress.callback("namerena")
+    )
+    progress.finish()
+    tswn_result = evaluation.tswn_result_of(tswn_future)
     compare_line = (
-        f"tswn: {tswn_result[0]}-{tswn_result[1]:.2f}s"
+        f"tswn: {tswn_result.output}-{cost_str(tswn_result.cost, tswn_result.cached)}"
         if tswn_result is not None
         else ""
     )
     diff_line = (
-        _compute_bench_diff(result[0], tswn_result[0]) or ""
+        tswn_cli._compute_bench_diff(result, tswn_result) or ""
         if tswn_result is not None
         else ""
     )
+    telemetry.record_eval(command, names, "namerena", result, diff_line)
+    telemetry.record_eval(command, names, "tswn", tswn_result, diff_line)
     client.send_message(
-        msg.reply_with(join_non_empty(result[0], compare_line, diff_line, out_msg(result[1])))
+        msg.reply_with(
+            join_non_empty(
+                result.output,
+                compare_line,
+                diff_line,
+                out_msg(result.cost, result.cached),
+            )
+        )
     )
 
 
@@ -745,38 +784,59 @@ def run_fights(msg: ReciveMessage, client) -> None:
     # 以换行分割
     fights = content.split("\n")
     results = []
+    all_cached = True
     tswn_results = []
-    tswn_total_time = 0.0
-    has_tswn_compare = USE_TSWN_COMPARE and resolve_tswn_runner() is not None
+    has_tswn_compare = config.USE_TSWN_COMPARE and tswn_cli.resolve_tswn_runner() is not None
     start_time = time.time()
-    for fight in fights:
-        # 以 + 分割
-        names = fight.split("+")
+    # 以 + 分割
+    fight_names = [fight.split("+") for fight in fights]
+    # tswn 先在后台全部跑起来
+    tswn_futures = [
+        evaluation.submit_tswn(tswn_cli.run_tswn_cli, "\n".join(names), "fight")
+        if len(names) >= 2
+        else None
+        for names in fight_names
+    ]
+    # tswn 的耗时按墙钟算: 从提交第一个到最后一个跑完, 并发跑的不能加起来
+    tswn_end_time = start_time
+
+    def tswn_done(_: Future) -> None:
+        nonlocal tswn_end_time
+        tswn_end_time = max(tswn_end_time, time.time())
+
+    for tswn_future in tswn_futures:
+        if tswn_future is not None:
+            tswn_future.add_done_callback(tswn_done)
+    # namerena 那边所有对战一次性批量跑完
+    fight_results = iter(
+        evaluation.run_namerena_fights([names for names in fight_names if len(names) >= 2])
+    )
+    for names, tswn_future in zip(fight_names, tswn_futures):
         if len(names) < 2:
             results.append(f"输入错误, 只有{len(names)} 个部分")
             if has_tswn_compare:
                 tswn_results.append(f"输入错误, 只有{len(names)} 个部分")
             continue
-        result = run_namerena("\n".join(names), fight_mode=True)[0]
+        eval_result = next(fight_results)
+        telemetry.record_eval(FIGHT_CMD, "\n".join(names), "namerena", eval_result)
+        all_cached = all_cached and eval_result.cached
+        result = eval_result.output
         if result in names:
             results.append(f"{names.index(result)}")
         else:
             results.append(result)
-        tswn_result = (
-            run_tswn_cli("\n".join(names), "fight") if has_tswn_compare else None
-        )
+        tswn_result = evaluation.tswn_result_of(tswn_future)
         if tswn_result is not None:
-            tswn_results.append(summarize_tswn_fight_for_names(tswn_result[0], names))
-            tswn_total_time += tswn_result[1]
+            tswn_results.append(tswn_cli.tswn_fight_for_names(tswn_result, names))
     # 输出
     end_time = time.time()
     reply = msg.reply_with(
         join_non_empty(
             "|".join(results),
-            f"tswn: {'|'.join(tswn_results)}-{tswn_total_time:.2f}s"
+            f"tswn: {'|'.join(tswn_results)}-{tswn_end_time - start_time:.2f}s"
             if tswn_results
             else "",
-            out_msg(end_time - start_time),
+            out_msg(end_time - start_time, all_cached and bool(results)),
         )
     )
     client.send_message(reply)
@@ -791,32 +851,49 @@ def eval_score(msg: ReciveMessage, client, template: str) -> None:
         client.send_message(msg.reply_with("请输入名字"))
         return
     names = content.split("\n")
+    precision = parse_precision(msg.content, EVAL_PP_CMD)
+    command = msg.content.split()[0]
     results = []
     start_time = time.time()
-    for name in names:
-        if name.strip() == "":
-            continue
-        name = name.split("+")
-        name = "\n".join(name)
-        runs = template.format(test=name)
-        result = run_namerena(runs)
-        tswn_result = run_tswn_bench_compare(runs)
-        # 只取最后一行括号之前的内容
-        last_line = result[0].split("\n")[-1]
-        last_line = last_line.split("(")[0]
-
-        tswn_score = tswn_result[0] if tswn_result is not None else ""
-        tswn_cost = tswn_result[1] if tswn_result is not None else 0.0
+    names = [name for name in names if name.strip() != ""]
+    all_runs = [template.format(test="\n".join(name.split("+"))) for name in names]
+    # tswn 在后台跑, namerena 在池子里并行跑
+    tswn_futures = [
+        evaluation.submit_tswn(tswn_cli.run_tswn_bench_compare, runs) for runs in all_runs
+    ]
+    progress = ProgressReporter(msg, client, config.PROGRESS_INTERVAL)
+    namerena_results = evaluation.run_namerena_many(
+        all_runs, precision, [progress.callback(name) for name in names]
+    )
+    progress.finish()
+    for runs, result, tswn_future in zip(all_runs, namerena_results, tswn_futures):
+        tswn_result = evaluation.tswn_result_of(tswn_future)
+        if result.data is not None and "value" in result.data:
+            last_line = records.format_record_value(result.data)
+            ci = records.format_record_ci(result.data)
+            if ci:
+                last_line += f"({ci})"
+        else:
+            last_line = records.last_non_empty_line(result.output)
+
+        tswn_score = tswn_result.output if tswn_result is not None else ""
+        tswn_cost = (
+            cost_str(tswn_result.cost, tswn_result.cached)
+            if tswn_result is not None
+            else ""
+        )
         diff_line = (
-            _compute_bench_diff(result[0], tswn_score)
+            tswn_cli._compute_bench_diff(result, tswn_result)
             if tswn_result is not None
             else ""
         )
+        telemetry.record_eval(command, runs, "namerena", result, diff_line or "")
+        telemetry.record_eval(command, runs, "tswn", tswn_result, diff_line or "")
 
         results.append(
             [
                 last_line,
-                result[1],
+                cost_str(result.cost, result.cached),
                 tswn_score,
                 tswn_cost,
                 diff_line,
@@ -825,8 +902,8 @@ def eval_score(msg: ReciveMessage, client, template: str) -> None:
     end_time = time.time()
     content = "\n".join(
         join_non_empty(
-            f"{score}-{cost_time:.2f}s",
-            f"tswn: {tswn_score}-{tswn_cost:.2f}s" if tswn_score else "",
+            f"{score}-{cost_time}",
+            f"tswn: {tswn_score}-{tswn_cost}" if tswn_score else "",
             diff_line if diff_line else "",
         )
         for (score, cost_time, tswn_score, tswn_cost, diff_line) in results
@@ -844,66 +921,109 @@ def score_all(msg: ReciveMessage, client) -> None:
         client.send_message(msg.reply_with("请输入名字"))
         return
     names = content.split("\n")
+    precision = parse_precision(msg.content, EVAL_PF_CMD)
     results = []
-    has_tswn_compare = USE_TSWN_COMPARE and resolve_tswn_runner() is not None
+    has_tswn_compare = config.USE_TSWN_COMPARE and tswn_cli.resolve_tswn_runner() is not None
+    runs = records.PF_RUNS
+    # 所有 (名字, 模板) 一起丢进池子里跑, 之后再按顺序拼回去
+    benches = [
+        [run.format(test="\n".join(name.split("+"))) for run in runs]
+        if name.strip() != ""
+        else []
+        for name in names
+    ]
+    job_count = sum(len(bench) for bench in benches)
+    parallel = distributed.eval_parallelism()
+    eta = eta_model.predict_inputs(
+        [("any", bench) for name_benches in benches for bench in name_benches], parallel
+    )
     client.send_message(
         msg.reply_with(
-            f"开始计算, 预计一个至少需要11s的时间, 大约需要 {len(names) * 11}s"
+            f"开始计算, 共 {job_count} 项, 同时跑 {parallel} 个, 预计需要 {eta:.0f}s"
             + ("\n已启用 tswn 对比, 总耗时会更久" if has_tswn_compare else "")
         )
     )
     start_time = time.time()
-    tswn_pf_result = run_tswn_pf_compare(content) if has_tswn_compare else None
-    runs = [
-        "!test!\n\n{test}",
-        "!test!\n\n{test}\n{test}",
-        "!test!\n!\n\n{test}",
-        "!test!\n!\n\n{test}\n{test}",
-    ]
-    for name in names:
-        scores = []
+    tswn_pf_future = evaluation.submit_tswn(tswn_cli.run_tswn_pf_compare, content)
+    progress = ProgressReporter(msg, client, config.PROGRESS_INTERVAL)
+    flat_results = iter(
+        evaluation.run_namerena_many(
+            [bench for name_benches in benches for bench in name_benches],
+            precision,
+            [
+                progress.callback(f"{name} {label}")
+                for name, name_benches in zip(names, benches)
+                for label, _ in zip(records.PF_LABELS, name_benches)
+            ],
+        )
+    )
+    progress.finish()
+    tswn_pf_result = evaluation.tswn_result_of(tswn_pf_future)
+    telemetry.record_eval(EVAL_PF_CMD, content, "tswn", tswn_pf_result)
+    # tswn 的 namer-pf 跳过空行, 按非空的名字对上
+    tswn_rows = iter(
+        (tswn_pf_result.data or {}).get("rows") or [] if tswn_pf_result is not None else []
+    )
+    for name, name_benches in zip(names, benches):
+        row_scores = []
+        name_results = []
         all_time = 0
+        cached_count = 0
+        cis = []
         tswn_scores = []
         tswn_all_time = 0.0
         diffs = []
-        for run in runs:
-            if name.strip() == "":
-                continue
-            name = name.split("+")
-            name = "\n".join(name)
-            bench = run.format(test=name)
-            result = run_namerena(bench)
+        for bench in name_benches:
+            result = next(flat_results)
+            name_results.append(result)
+            telemetry.record_eval(EVAL_PF_CMD, bench, "namerena", result)
             cost_time = result[1]
             all_time += cost_time
-            # 只取最后一行括号之前的内容
-            last_line = result[0].split("\n")[-1]
-            last_line = last_line.split("(")[0]
-            if last_line.endswith(".00"):
-                last_line = last_line[:-3]
-            scores.append(last_line)
+            cached_count += result.cached
+            if result.data is not None and "value" in result.data:
+                last_line = records.format_record_value(result.data)
+                if last_line.endswith(".00"):
+                    last_line = last_line[:-3]
+                ci = records.format_record_ci(result.data)
+                if ci:
+                    # 按精度跑的轮数不是整的, 分数取整方便求和
+                    last_line = str(round(result.data["value"]))
+                    cis.append(ci)
+            else:
+                last_line = records.last_non_empty_line(result.output)
+            row_scores.append(last_line)
             diffs.append("")
-        if all(x.isdigit() for x in scores):
-            scores.append(str(sum(map(int, scores))))
-        results.append(["|".join(scores), all_time, tswn_scores, tswn_all_time, diffs])
+        if all(x.isdigit() for x in row_scores):
+            row_scores.append(str(sum(map(int, row_scores))))
+        if name_benches:
+            scores.index_pf_result(name.strip(), name_results, next(tswn_rows, None))
+        cost_text = f"{all_time:.2f}s"
+        if cached_count == len(name_benches) and cached_count:
+            cost_text += "(缓存)"
+        elif cached_count:
+            cost_text += f"(缓存 {cached_count}/{len(name_benches)})"
+        results.append(
+            ["|".join(row_scores), cost_text, tswn_scores, tswn_all_time, diffs, cis]
+        )
     end_time = time.time()
     content = "\n".join(
         join_non_empty(
-            f"{score}-{cost_time:.2f}s",
-            "",
+            f"{score}-{cost_time}",
+            f"置信区间: {' | '.join(cis)}" if cis else "",
             f"diff: {' | '.join(diffs)}" if any(diffs) else "",
         )
-        for (score, cost_time, tswn_scores, tswn_cost, diffs) in results
+        for (score, cost_time, tswn_scores, tswn_cost, diffs, cis) in results
     )
     tswn_line = (
-        f"tswn:\n{tswn_pf_result[0]}-{tswn_pf_result[1]:.2f}s"
+        f"tswn:\n{tswn_pf_result.output}-{cost_str(tswn_pf_result.cost, tswn_pf_result.cached)}"
         if tswn_pf_result is not None
         else ""
     )
     pf_diff_line = (
         "\n".join(
-            _compute_pf_diff_lines(
+            tswn_cli._compute_pf_diff_lines(
                 [score for (score, *_rest) in results],
-                tswn_pf_result[0],
+                tswn_pf_result,
             )
         )
         if tswn_pf_result is not None
@@ -920,35 +1040,144 @@ def score_all(msg: ReciveMessage, client) -> None:
     client.send_message(reply)
 
 
+def command_inputs(command: str, content: str, args: tuple) -> list[tuple[str, str]]:
+    """一条命令会跑哪些 (md5-api 模式, 输入), 用来在跑之前估计耗时"""
+    body = content[content.find("\n") + 1 :] if "\n" in content else ""
+    lines = [line for line in body.split("\n") if line.strip()]
+    if command == EVAL_PF_CMD:
+        return [
+            ("any", run.format(test="\n".join(line.split("+"))))
+            for line in lines
+            for run in records.PF_RUNS
+        ]
+    if command in (EVAL_PP_CMD, EVAL_PD_CMD, EVAL_QP_CMD, EVAL_QD_CMD) and args:
+        return [("any", args[0].format(test="\n".join(line.split("+")))) for line in lines]
+    if command == FIGHT_CMD:
+        return [("fight", "\n".join(line.split("+"))) for line in lines]
+    if not body.strip():
+        return []
+    mode = "fight" if records.bench_kind(body) == "fight" else "any"
+    return [(mode, body)]
+
+
+def submit_job(
+    msg: ReciveMessage, client, command: str, func: Callable[..., None], *args
+) -> None:
+    """把跑得久的命令交给调度器, 没有调度器 (没加载) 就直接跑"""
+    scheduler = job_queue.JOB_SCHEDULER
+    if scheduler is None:
+        func(msg, client, *args)
+        return
+    predicted = (
+        predict_search()
+        if command == SEARCH_CMD
+        else eta_model.predict_inputs(
+            command_inputs(command, msg.content, args), distributed.eval_parallelism()
+        )
+    )
+    scheduler.submit(job_queue.NamerJob(msg, client, command, func, args, predicted))
+
+
+def cancel_jobs(msg: ReciveMessage, client) -> None:
+    scheduler = job_queue.JOB_SCHEDULER
+    if scheduler is None:
+        client.send_message(msg.reply_with("调度器未启动"))
+        return
+    running, queued = scheduler.cancel(job_queue.msg_user(msg))
+    if running == 0 and queued == 0:
+        client.send_message(msg.reply_with("你没有正在跑或者排队的命令"))
+        return
+    client.send_message(
+        msg.reply_with(f"已取消 {running} 个正在跑的命令, {queued} 个排队的命令")
+    )
+
+
+def show_queue(msg: ReciveMessage, client) -> None:
+    scheduler = job_queue.JOB_SCHEDULER
+    if scheduler is None:
+        client.send_message(msg.reply_with("调度器未启动"))
+        return
+    client.send_message(msg.reply_with(f"命令队列\n{scheduler.describe()}"))
+
+
+def show_cache(msg: ReciveMessage, client) -> None:
+    cache = result_cache.EVAL_CACHE
+    if cache is None:
+        client.send_message(msg.reply_with("结果缓存未启用"))
+        return
+    client.send_message(msg.reply_with(f"结果缓存\n{cache.describe()}"))
+
+
+def show_stats(msg: ReciveMessage, client) -> None:
+    lines = []
+    writer = telemetry.TELEMETRY_WRITER
+    if writer is not None:
+        lines.append(writer.describe())
+    elif not telemetry.TELEMETRY:
+        lines.append("遥测: 未安装 psycopg")
+    else:
+        lines.append("遥测: 未启用")
+    lines.append(process.describe_kills())
+    model = eta_model.ETA_MODEL
+    if model is not None:
+        lines.append(model.describe())
+    pool = js_pool.JS_POOL
+    if pool is not None:
+        lines.append(pool.describe())
+    backend = distributed.EVAL_BACKEND
+    if backend is not None:
+        lines.append(backend.describe())
+    searcher = LAST_SEARCH
+    if searcher is not None:
+        lines.append(f"上次搜索: {searcher.describe()}")
+    client.send_message(msg.reply_with(f"运行统计\n{chr(10).join(lines)}"))
+
+
 def dispatch_msg(msg: ReciveMessage, client) -> None:
     if msg.is_reply or msg.is_from_self:
         return
     if msg.content == HELP_CMD:
-        reply = msg.reply_with(HELP_MSG)
+        reply = msg.reply_with(f"{HELP_MSG}\n{js_pool.describe_runtimes()}")
         client.send_message(reply)
     elif msg.content.startswith(EVAL_CMD):
-        eval_fight(msg, client)
+        submit_job(msg, client, EVAL_CMD, eval_fight)
     elif msg.content.startswith(FIGHT_CMD):
-        run_fights(msg, client)
+        submit_job(msg, client, FIGHT_CMD, run_fights)
     elif msg.content.startswith(CONVERT_CMD):
         convert_name(msg, client)
     elif msg.content.startswith(BASE_CMD):
         convert_base(msg, client)
     elif msg.content.startswith(EVAL_PP_CMD):
-        eval_score(msg, client, "!test!\n\n{test}")
+        submit_job(msg, client, EVAL_PP_CMD, eval_score, "!test!\n\n{test}")
     elif msg.content.startswith(EVAL_PD_CMD):
-        eval_score(msg, client, "!test!\n\n{test}\n{test}")
+        submit_job(msg, client, EVAL_PD_CMD, eval_score, "!test!\n\n{test}\n{test}")
     elif msg.content.startswith(EVAL_QP_CMD):
-        eval_score(msg, client, "!test!\n!\n\n{test}")
+        submit_job(msg, client, EVAL_QP_CMD, eval_score, "!test!\n!\n\n{test}")
     elif msg.content.startswith(EVAL_QD_CMD):
-        eval_score(msg, client, "!test!\n!\n\n{test}\n{test}")
+        submit_job(
+            msg, client, EVAL_QD_CMD, eval_score, "!test!\n!\n\n{test}\n{test}"
+        )
     elif msg.content.startswith(EVAL_PF_CMD):
-        score_all(msg, client)
+        submit_job(msg, client, EVAL_PF_CMD, score_all)
+    elif msg.content == CACHE_CMD:
+        show_cache(msg, client)
+    elif msg.content == STATS_CMD:
+        show_stats(msg, client)
+    elif msg.content == QUEUE_CMD:
+        show_queue(msg, client)
+    elif msg.content == CANCEL_CMD:
+        cancel_jobs(msg, client)
+    elif msg.content.startswith(TOP_CMD):
+        show_top(msg, client)
+    elif msg.content.startswith(LOOKUP_CMD):
+        lookup_scores(msg, client)
+    elif msg.content.startswith(SEARCH_CMD):
+        submit_job(msg, client, SEARCH_CMD, search_names)
     elif msg.content.startswith(EVAL_SIMPLE_CMD):
         # 放在最后, 避免覆盖 前面的命令
         # 同时过滤掉别的 /namer-xxxxx
         if not msg.content.startswith(f"{EVAL_SIMPLE_CMD}-"):
-            eval_fight(msg, client)
+            submit_job(msg, client, EVAL_SIMPLE_CMD, eval_fight)
 
 
 def on_ica_message(msg: IcaNewMessage, client: IcaClient) -> None:
@@ -960,21 +1189,103 @@ def on_tailchat_message(msg: TailchatReciveMessage, client) -> None:
 
 
 def on_load() -> None:
-    global \
-        USE_BUN, \
-        USE_TSWN_COMPARE, \
-        TSWN_CLI_PATH, \
-        TSWN_RUNNER, \
-        TSWN_RUNNER_FAILED, \
-        VERSION_CACHE
-
     main_cfg = PLUGIN_MANIFEST.config_unchecked("main")
-    USE_BUN = main_cfg.get_value("use_bun") or False
+    config.USE_BUN = main_cfg.get_value("use_bun") or False
+    config.JS_RUNTIME = str(main_cfg.get_value("js_runtime") or "").strip().lower()
+    runtime_calibration = main_cfg.get_value("runtime_calibration")
+    config.RUNTIME_CALIBRATION = (
+        True if runtime_calibration is None else bool(runtime_calibration)
+    )
+    background_discovery = main_cfg.get_value("background_discovery")
+    config.BACKGROUND_DISCOVERY = (
+        True if background_discovery is None else bool(background_discovery)
+    )
     use_tswn_compare = main_cfg.get_value("use_tswn_compare")
-    USE_TSWN_COMPARE = True if use_tswn_compare is None else bool(use_tswn_compare)
-    TSWN_CLI_PATH = str(main_cfg.get_value("tswn_cli_path") or "")
-    TSWN_RUNNER = None
-    TSWN_RUNNER_FAILED = False
-    VERSION_CACHE = {}
-    # conn = get_db_connection()
-    # conn.close()
+    config.USE_TSWN_COMPARE = True if use_tswn_compare is None else bool(use_tswn_compare)
+    config.TSWN_CLI_PATH = str(main_cfg.get_value("tswn_cli_path") or "")
+    tswn_cli.TSWN_RUNNER = None
+    tswn_cli.TSWN_RUNNER_FAILED = False
+    runtimes.VERSION_CACHE = {}
+    use_tswn_server = main_cfg.get_value("use_tswn_server")
+    config.USE_TSWN_SERVER = True if use_tswn_server is None else bool(use_tswn_server)
+    tswn_cli.stop_tswn_server()
+    tswn_json = main_cfg.get_value("tswn_json")
+    config.TSWN_JSON = True if tswn_json is None else bool(tswn_json)
+    tswn_cli.TSWN_JSON_SUPPORT.clear()
+    use_worker_pool = main_cfg.get_value("use_worker_pool")
+    config.USE_WORKER_POOL = True if use_worker_pool is None else bool(use_worker_pool)
+    config.WORKER_COUNT = int(main_cfg.get_value("worker_count") or 0)
+    config.SIBLING_WORKER_COUNT = int(main_cfg.get_value("sibling_worker_count") or 0)
+    code_cache = main_cfg.get_value("code_cache")
+    config.USE_CODE_CACHE = True if code_cache is None else bool(code_cache)
+    config.BENCH_SHARDS = int(main_cfg.get_value("bench_shards") or 0)
+    config.REMOTE_AGENTS = str(main_cfg.get_value("remote_agents") or "")
+    config.REMOTE_TOKEN = str(main_cfg.get_value("remote_token") or "")
+    config.LOCAL_AGENTS = int(main_cfg.get_value("local_agents") or 0)
+    config.LOCAL_AGENT_WORKERS = int(main_cfg.get_value("local_agent_workers") or 1)
+    config.BENCH_PRECISION = float(main_cfg.get_value("bench_precision") or 0.0)
+    progress_interval = main_cfg.get_value("progress_interval")
+    config.PROGRESS_INTERVAL = 15.0 if progress_interval is None else float(progress_interval)
+    config.JOB_WORKERS = int(main_cfg.get_value("job_workers") or 2)
+    config.JOB_QUEUE_SIZE = int(main_cfg.get_value("job_queue_size") or 20)
+    config.JOB_USER_LIMIT = int(main_cfg.get_value("job_user_limit") or 1)
+    job_user_queue = main_cfg.get_value("job_user_queue")
+    config.JOB_USER_QUEUE = 3 if job_user_queue is None else int(job_user_queue)
+    config.JOB_ROOM_LIMIT = int(main_cfg.get_value("job_room_limit") or 0)
+    fight_timeout = main_cfg.get_value("fight_timeout")
+    config.FIGHT_TIMEOUT = 60.0 if fight_timeout is None else float(fight_timeout)
+    win_rate_timeout = main_cfg.get_value("win_rate_timeout")
+    config.WIN_RATE_TIMEOUT = 600.0 if win_rate_timeout is None else float(win_rate_timeout)
+    score_timeout = main_cfg.get_value("score_timeout")
+    config.SCORE_TIMEOUT = 600.0 if score_timeout is None else float(score_timeout)
+    child_cpu_limit = main_cfg.get_value("child_cpu_limit")
+    config.CHILD_CPU_LIMIT = 900 if child_cpu_limit is None else int(child_cpu_limit)
+    child_memory_limit = main_cfg.get_value("child_memory_limit")
+    config.CHILD_MEMORY_LIMIT = 4096 if child_memory_limit is None else int(child_memory_limit)
+    if 0 < config.CHILD_MEMORY_LIMIT < config.CHILD_MEMORY_LIMIT_MIN:
+        print(
+            f"[namer] child_memory_limit={config.CHILD_MEMORY_LIMIT} 太小, js 运行时会直接崩, "
+            f"按 {config.CHILD_MEMORY_LIMIT_MIN} 算"
+        )
+        config.CHILD_MEMORY_LIMIT = config.CHILD_MEMORY_LIMIT_MIN
+    use_cache = main_cfg.get_value("use_cache")
+    config.USE_CACHE = True if use_cache is None else bool(use_cache)
+    config.CACHE_MEMORY_SIZE = int(main_cfg.get_value("cache_memory_size") or 1024)
+    config.CACHE_DISK_SIZE = int(main_cfg.get_value("cache_disk_size") or 100000)
+    score_index = main_cfg.get_value("score_index")
+    config.USE_SCORE_INDEX = True if score_index is None else bool(score_index)
+    score_max_age = main_cfg.get_value("score_max_age")
+    config.SCORE_MAX_AGE = 30.0 if score_max_age is None else float(score_max_age)
+    config.SEARCH_WORKERS = int(main_cfg.get_value("search_workers") or 0)
+    config.SEARCH_MAX_CANDIDATES = int(main_cfg.get_value("search_max_candidates") or 200000)
+    config.SEARCH_MAX_SECONDS = float(main_cfg.get_value("search_max_seconds") or 300)
+    config.SEARCH_TOP_K = int(main_cfg.get_value("search_top_k") or 20)
+    config.SEARCH_START_METHOD = str(main_cfg.get_value("search_start_method") or "").strip()
+    telemetry_enabled = main_cfg.get_value("telemetry")
+    config.TELEMETRY_ENABLED = True if telemetry_enabled is None else bool(telemetry_enabled)
+    config.TELEMETRY_DSN = str(main_cfg.get_value("telemetry_dsn") or "")
+    config.TELEMETRY_QUEUE_SIZE = int(main_cfg.get_value("telemetry_queue_size") or 10000)
+    evaluation.stop_eval_executor()
+    js_pool.start_js_pool()
+    distributed.start_eval_backend()
+    result_cache.start_eval_cache()
+    scores.start_score_index()
+    eta_model.start_eta_model()
+    telemetry.start_telemetry(_version_)
+    js_pool.start_runtime_calibration()
+    evaluation.start_discovery()
+    job_queue.start_job_scheduler()
+
+
+def on_unload() -> None:
+    job_queue.stop_job_scheduler()
+    js_pool.stop_runtime_calibration()
+    evaluation.stop_discovery()
+    evaluation.stop_eval_executor()
+    distributed.stop_eval_backend()
+    js_pool.stop_js_pool()
+    result_cache.stop_eval_cache()
+    scores.stop_score_index()
+    eta_model.stop_eta_model()
+    telemetry.stop_telemetry()
+    tswn_cli.stop_tswn_server()
@@ -1,15 +1,35 @@
+from array import array
+from functools import lru_cache
 SQRTOOLS_VERSION="3.3.2"
 propname=["HP","攻","防","速","敏","魔","抗","智"]
 sklname=["火球","冰冻","雷击","地裂","吸血","投毒","连击","会心","瘟疫","命轮","狂暴","魅惑","加速","减速","诅咒","治愈","苏生","净化","铁壁","蓄力","聚气","潜行","血祭","分身","幻术","防御","守护","反弹","护符","护盾","反击","吞噬","亡灵","垂死","隐匿","空技能","空技能","空技能","空技能","空技能"]
+TEAM_CACHE_SIZE=1024
+@lru_cache(maxsize=TEAM_CACHE_SIZE)
+def teamval(team:bytes)->bytes:
+    # 战队那一遍打乱只和战队名有关, 同一个战队只算一次
+    teamstr=[0,*team]
+    teamlen=len(teamstr)
+    val=bytearray(range(256))
+    s=0
+    for i in range(256):
+        s+=(teamstr[i%teamlen]+val[i])
+        s%=256
+        val[i],val[s]=val[s],val[i]
+    return bytes(val)
 class Name:
+    # 打乱结果和 base 都是 0~255, 存 bytearray, 每个名字只占几百字节
+    # props()/skills() 算过就缓存, base 的只在 load 时失效, bonus 的在 namebonus 变了的时候失效
+    __slots__=("__val","namebase","namebonus","nameprop","nameskill","__sklid","__props","__skills","__bonuskey")
     def __init__(self):
-        self.__val=[]
-        self.namebase:list[int]=[0]*128
-        self.namebonus:list[int]=[0]*128
-        self.nameprop:list[int]=[0]*8
-        self.__sklid=[]
-        self.__sklfreq=[]
+        self.__val=bytearray()
+        self.namebase:bytearray=bytearray(128)
+        self.namebonus:bytearray=bytearray(128)
+        self.nameprop:array=array("H",[0]*8)
         self.nameskill:list[tuple[int,int]]=[(0,0)]*16
+        self.__sklid:bytes|None=None
+        self.__props:list[tuple[int,...]|None]=[None,None]
+        self.__skills:list[tuple[tuple[int,int],...]|None]=[None,None]
+        self.__bonuskey=b""
     def load(self,namein:str)->bool:
         if namein=="" or namein.count('@')>1:
             return False
@@ -20,57 +40,65 @@ class Name:
         else:
             namein[0]=namein[2]
         namestr=list(namein[0].encode())
-        teamstr=list(namein[2].encode())
+        team=namein[2].encode()
         namestr.insert(0,0)
-        teamstr.insert(0,0)
         namelen=len(namestr)
-        teamlen=len(teamstr)
-        if namelen>256 or teamlen>256:
+        if namelen>256 or len(team)+1>256:
             return False
-        self.__val=list(range(256))
-        s=0
-        for i in range(256):
-            s+=(teamstr[i%teamlen]+self.__val[i])
-            s%=256
-            self.__val[i],self.__val[s]=self.__val[s],self.__val[i]
+        # 在 list 上打乱比 bytearray 快, 打乱完再存成 bytearray
+        val=list(teamval(team))
         for i in range(2):
             s=0
             for j in range(256):
-                s+=(namestr[j%namelen]+self.__val[j])
+                s+=(namestr[j%namelen]+val[j])
                 s%=256
-                self.__val[j],self.__val[s]=self.__val[s],self.__val[j]
-        s=0
+                val[j],val[s]=val[s],val[j]
+        self.__val=bytearray(val)
+        namebase=[]
         for i in range(256):
-            m=(self.__val[i]*181+160)%256
+            m=(val[i]*181+160)%256
             if m>=89 and m<217:
-                self.namebase[s]=m&63
-                s+=1
-        self.namebonus[:]=self.namebase[:]
+                namebase.append(m&63)
+        self.namebase=bytearray(namebase)
+        self.namebonus=bytearray(namebase)
+        self.__sklid=None
+        self.__props=[None,None]
+        self.__skills=[None,None]
+        self.__bonuskey=b""
         return True
-    def calcprops(self,usebonus:bool)->None:
+    def __checkbonus(self)->None:
+        # namebonus 是可以直接改的 bytearray, 拿一份快照比一下就知道改没改过
+        key=bytes(self.namebonus)
+        if key!=self.__bonuskey:
+            self.__bonuskey=key
+            self.__props[1]=None
+            self.__skills[1]=None
+    def props(self,bonus:bool=False)->tuple[int,...]:
+        # HP,攻,防,速,敏,魔,抗,智, 只用到 base, 不用跑技能那一段随机数
+        bonus=bonus==True
+        if bonus:
+            self.__checkbonus()
+        cached=self.__props[bonus]
+        if cached is not None:
+            return cached
+        r=list(self.namebonus[0:32] if bonus else self.namebase[0:32])
+        prop=[0]*8
         propcnt=1
-        if usebonus==True:
-            r=self.namebonus[0:32]
-        else:
-            r=self.namebase[0:32]
         for i in range(10,31,3):
             r[i:i+3]=sorted(r[i:i+3])
-            self.nameprop[propcnt]=r[i+1]
+            prop[propcnt]=r[i+1]+36
             propcnt+=1
         r[0:10]=sorted(r[0:10])
-        self.nameprop[0]=154
-        for i in range(3,7):
-            self.nameprop[0]+=r[i]
-        for i in range(1,8):
-            self.nameprop[i]+=36
-        return
-    def calcskill(self,usebonus:bool)->None:
-        self.__sklid=list(range(0,40))
-        self.__sklfreq=[0]*16
-        sklflag=[True,True]
+        prop[0]=154+sum(r[3:7])
+        self.__props[bonus]=tuple(prop)
+        return self.__props[bonus]
+    def sklorder(self)->bytes:
+        # 技能顺序只和打乱结果有关, base 和 bonus 共用一份
+        if self.__sklid is not None:
+            return self.__sklid
+        sklid=list(range(40))
         a=b=0
-        randbase=[]
-        randbase[:]=self.__val[:]
+        randbase=list(self.__val)
         def randgen():
             nonlocal a,b,randbase
             def m():
@@ -83,36 +111,55 @@ class Name:
         s=0
         for i in range(2):
             for j in range(40):
-                s=(s+randgen()+self.__sklid[j])%40
-                self.__sklid[j],self.__sklid[s]=self.__sklid[s],self.__sklid[j]
+                s=(s+randgen()+sklid[j])%40
+                sklid[j],sklid[s]=sklid[s],sklid[j]
+        self.__sklid=bytes(sklid)
+        return self.__sklid
+    def skills(self,bonus:bool=False)->tuple[tuple[int,int],...]:
+        # 16 个技能位的 (技能编号, 熟练度)
+        bonus=bonus==True
+        if bonus:
+            self.__checkbonus()
+        cached=self.__skills[bonus]
+        if cached is not None:
+            return cached
+        sklid=self.sklorder()
+        sklfreq=[0]*16
+        sklflag=[True,True]
         last=-1
         j=0
         for i in range(64,128,4):
             q=min(self.namebase[i:i+4])
-            if usebonus==True:
+            if bonus:
                 p=min(self.namebonus[i:i+4])
             else:
                 p=q
             if p>10:
-                if self.__sklid[j]<35:
-                    self.__sklfreq[j]=p-10
+                if sklid[j]<35:
+                    sklfreq[j]=p-10
                 if q<=10:
                     if j>=14:
                         sklflag[j-14]=False
-                elif self.__sklid[j]<25:
+                elif sklid[j]<25:
                     last=j
             j+=1
         if last!=-1:
             if last>=14:
                 sklflag[last-14]=False
-            self.__sklfreq[last]*=2
-        if usebonus==True:
+            sklfreq[last]*=2
+        if bonus:
             info=self.namebonus
         else:
             info=self.namebase
-        if self.__sklfreq[14]>0 and sklflag[0]:
-            self.__sklfreq[14]+=min(info[60],info[61],self.__sklfreq[14])
-        if self.__sklfreq[15]>0 and sklflag[1]:
-            self.__sklfreq[15]+=min(info[62],info[63],self.__sklfreq[15])
-        self.nameskill=list(zip(self.__sklid[0:16],self.__sklfreq))
+        if sklfreq[14]>0 and sklflag[0]:
+            sklfreq[14]+=min(info[60],info[61],sklfreq[14])
+        if sklfreq[15]>0 and sklflag[1]:
+            sklfreq[15]+=min(info[62],info[63],sklfreq[15])
+        self.__skills[bonus]=tuple(zip(sklid[0:16],sklfreq))
+        return self.__skills[bonus]
+    def calcprops(self,usebonus:bool)->None:
+        self.nameprop=array("H",self.props(usebonus))
+        return
+    def calcskill(self,usebonus:bool)->None:
+        self.nameskill=list(self.skills(usebonus))
         return
@@ -0,0 +1,455 @@
+"""
+在 sqrtools 上面搭的暴力搜名字
+
+- NameGenerator: 候选名字按下标生成, 方便分段给多个进程, 也方便断点续跑
+- 条件: "速>=60" / "会心>=20" / "八围>=600", 字段是 propname / sklname 里的名字或者 "八围"
+- NameSearcher: 多进程分段跑, 只保留排序字段最高的前 K 个
+
+命令行:
+python -m sqrtools.search --charset abc --length 1-4 --where "速>=60" --checkpoint search.json
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import json
+import time
+import heapq
+import hashlib
+import argparse
+import threading
+import multiprocessing
+
+from pathlib import Path
+from typing import Callable, NamedTuple, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from . import Name, propname, sklname
+
+TOTAL_FIELD = "八围"
+CONDITION_RE = re.compile(r"^\s*(\S+?)\s*(>=|<=|==|!=|>|<|=)\s*(-?\d+)\s*$")
+OPERATORS: dict[str, Callable[[int, int], bool]] = {
+    ">=": lambda left, right: left >= right,
+    "<=": lambda left, right: left <= right,
+    ">": lambda left, right: left > right,
+    "<": lambda left, right: left < right,
+    "==": lambda left, right: left == right,
+    "=": lambda left, right: left == right,
+    "!=": lambda left, right: left != right,
+}
+
+
+class Condition(NamedTuple):
+    field: str
+    op: str
+    value: int
+
+    def __str__(self) -> str:
+        return f"{self.field}{self.op}{self.value}"
+
+
+class SearchSpec(NamedTuple):
+    """一次搜索要搜什么, 断点文件靠 key() 认是不是同一次搜索"""
+
+    team: str = ""
+    charset: str = ""
+    min_length: int = 1
+    max_length: int = 1
+    prefix: str = ""
+    suffix: str = ""
+    words: tuple[str, ...] = ()
+    """
+    给了词表就只搜 prefix + 词 + suffix, 不再按字符集枚举
+    """
+    conditions: tuple[Condition, ...] = ()
+    sort_by: str = TOTAL_FIELD
+    top_k: int = 10
+
+    def key(self) -> str:
+        data = json.dumps(self.to_json(), ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def to_json(self) -> dict:
+        data = self._asdict()
+        data["words"] = list(self.words)
+        data["conditions"] = [str(condition) for condition in self.conditions]
+        return data
+
+
+class SearchHit(NamedTuple):
+    score: int
+    index: int
+    name: str
+    props: list[int]
+    skills: list[tuple[int, int]]
+
+    def describe(self) -> str:
+        props = " ".join(f"{propname[i]}{value}" for i, value in enumerate(self.props))
+        skills = " ".join(f"{sklname[skill]}{freq}" for skill, freq in self.skills)
+        return f"{self.name} [{self.score}] {props} {TOTAL_FIELD}{total_props(self.props)}\n  {skills}"
+
+
+def field_names() -> list[str]:
+    return [*propname, TOTAL_FIELD, *sklname[0:35]]
+
+
+def parse_condition(text: str) -> Condition:
+    matched = CONDITION_RE.match(text)
+    if matched is None:
+        raise ValueError(f"看不懂的条件: {text}")
+    field, op, value = matched.groups()
+    if field not in field_names():
+        raise ValueError(f"没有这个属性或技能: {field}")
+    return Condition(field, op, int(value))
+
+
+def total_props(props: Sequence[int]) -> int:
+    """和 /namer-peek 的八围一样: 七项属性加上三分之一的 HP"""
+    return sum(props[1:8]) + round(props[0] / 3)
+
+
+class NameGenerator:
+    """把下标映射成名字: 先按长度从短到长, 同一长度内按字符集顺序, 和数数一样"""
+
+    def __init__(self, spec: SearchSpec) -> None:
+        self.spec = spec
+        self.charset = spec.charset
+        self.buckets: list[tuple[int, int]] = []
+        """
+        (长度, 这个长度的名字个数)
+        """
+        if not spec.words:
+            for length in range(spec.min_length, spec.max_length + 1):
+                self.buckets.append((length, len(self.charset) ** length))
+
+    def total(self) -> int:
+        if self.spec.words:
+            return len(self.spec.words)
+        return sum(count for _, count in self.buckets)
+
+    def __getitem__(self, index: int) -> str:
+        if self.spec.words:
+            return f"{self.spec.prefix}{self.spec.words[index]}{self.spec.suffix}"
+        for length, count in self.buckets:
+            if index < count:
+                break
+            index -= count
+        else:
+            raise IndexError(index)
+        base = len(self.charset)
+        chars = [""] * length
+        for position in range(length - 1, -1, -1):
+            index, digit = divmod(index, base)
+            chars[position] = self.charset[digit]
+        return f"{self.spec.prefix}{''.join(chars)}{self.spec.suffix}"
+
+
+def field_value(name: Name, field: str) -> int:
+    """属性直接取值, 技能取熟练度 (没有就是 0), 只用到属性的时候不会去算技能"""
+    if field == TOTAL_FIELD:
+        return total_props(name.props())
+    if field in propname:
+        return name.props()[propname.index(field)]
+    skill = sklname.index(field)
+    for skill_id, freq in name.skills():
+        if skill_id == skill:
+            return freq
+    return 0
+
+
+def evaluate(spec: SearchSpec, candidate: str) -> tuple[Name, int] | None:
+    """满足条件的话返回 (名字, 排序分数)"""
+    name = Name()
+    if not name.load(f"{candidate}@{spec.team}" if spec.team else candidate):
+        return None
+    for condition in spec.conditions:
+        if not OPERATORS[condition.op](field_value(name, condition.field), condition.value):
+            return None
+    return name, field_value(name, spec.sort_by)
+
+
+def make_hit(name: Name, score: int, index: int, candidate: str) -> SearchHit:
+    return SearchHit(
+        score,
+        index,
+        candidate,
+        list(name.props()),
+        [(skill, freq) for skill, freq in name.skills() if freq > 0],
+    )
+
+
+def search_chunk(spec: SearchSpec, start: int, end: int) -> list[SearchHit]:
+    """子进程里跑的一段, 只回这一段里的前 K 个, 进不了前 K 的不去算技能"""
+    generator = NameGenerator(spec)
+    heap: list[tuple[int, int, SearchHit]] = []
+    for index in range(start, end):
+        candidate = generator[index]
+        result = evaluate(spec, candidate)
+        if result is None:
+            continue
+        name, score = result
+        if len(heap) >= spec.top_k and (score, -index) <= heap[0][:2]:
+            continue
+        push_hit(heap, make_hit(name, score, index, candidate), spec.top_k)
+    return [item[2] for item in heap]
+
+
+def push_hit(heap: list[tuple[int, int, SearchHit]], hit: SearchHit, top_k: int) -> None:
+    """小根堆, 分数一样的时候下标小的排前面"""
+    item = (hit.score, -hit.index, hit)
+    if len(heap) < top_k:
+        heapq.heappush(heap, item)
+    elif item[:2] > heap[0][:2]:
+        heapq.heapreplace(heap, item)
+
+
+class NameSearcher:
+    """
+    按下标分段交给进程池, 主进程合并前 K 个
+    next_index 之前的下标都已经搜完了, 断点只记这个和当前的前 K 个
+    """
+
+    def __init__(
+        self,
+        spec: SearchSpec,
+        workers: int = 0,
+        chunk_size: int = 2000,
+        mp_context: multiprocessing.context.BaseContext | None = None,
+    ) -> None:
+        self.spec = spec
+        self.workers = workers if workers > 0 else (multiprocessing.cpu_count() or 1)
+        self.chunk_size = max(chunk_size, 1)
+        self.mp_context = mp_context
+        self.generator = NameGenerator(spec)
+        self.total = self.generator.total()
+        self.next_index = 0
+        self.heap: list[tuple[int, int, SearchHit]] = []
+        self.seen: set[int] = set()
+        self.elapsed = 0.0
+        """
+        之前几次 (断点之前) 一共花的时间
+        """
+        self.scanned = 0
+        self.started = 0.0
+        self.ended = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.next_index >= self.total
+
+    @property
+    def rate(self) -> float:
+        """这一次运行的 每秒候选数"""
+        with self.lock:
+            if self.started <= 0:
+                return 0.0
+            return self.scanned / max((self.ended or time.time()) - self.started, 1e-6)
+
+    def total_seconds(self) -> float:
+        """加上断点之前的, 一共搜了多久"""
+        if self.started <= 0 or self.ended:
+            return self.elapsed
+        return self.elapsed + time.time() - self.started
+
+    def hits(self) -> list[SearchHit]:
+        with self.lock:
+            return [item[2] for item in sorted(self.heap, reverse=True)]
+
+    def _merge(self, hits: list[SearchHit]) -> None:
+        for hit in hits:
+            # 上次停下来的时候断点后面可能已经搜过几段, 续跑会再搜一遍
+            if hit.index in self.seen:
+                continue
+            self.seen.add(hit.index)
+            push_hit(self.heap, hit, self.spec.top_k)
+        self.seen.intersection_update(item[2].index for item in self.heap)
+
+    def run(
+        self,
+        max_candidates: int = 0,
+        max_seconds: float = 0.0,
+        stop: threading.Event | None = None,
+        progress: Callable[[NameSearcher], None] | None = None,
+    ) -> None:
+        """
+        从 next_index 开始搜, 到头 / 搜够 max_candidates 个 / 超过 max_seconds 秒 / stop 被设置就停
+        停的时候等正在跑的几段跑完, 没开始的直接取消
+        """
+        end = self.total
+        if max_candidates > 0:
+            end = min(end, self.next_index + max_candidates)
+        deadline = time.time() + max_seconds if max_seconds > 0 else None
+        self.started = time.time()
+        self.ended = 0.0
+        self.scanned = 0
+        if self.next_index >= end:
+            self.ended = self.started
+            return
+
+        cursor = self.next_index
+        pending: dict[Future, tuple[int, int]] = {}
+        done_ranges: dict[int, int] = {}
+        executor = ProcessPoolExecutor(self.workers, mp_context=self.mp_context)
+        try:
+            while True:
+                stopping = (stop is not None and stop.is_set()) or (
+                    deadline is not None and time.time() >= deadline
+                )
+                while not stopping and cursor < end and len(pending) < self.workers * 2:
+                    chunk_end = min(cursor + self.chunk_size, end)
+                    future = executor.submit(search_chunk, self.spec, cursor, chunk_end)
+                    pending[future] = (cursor, chunk_end)
+                    cursor = chunk_end
+                if stopping:
+                    for future in list(pending):
+                        if future.cancel():
+                            del pending[future]
+                if not pending:
+                    break
+                done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, chunk_end = pending.pop(future)
+                    hits = future.result()
+                    with self.lock:
+                        self._merge(hits)
+                        self.scanned += chunk_end - start
+                        done_ranges[start] = chunk_end
+                        while self.next_index in done_ranges:
+                            self.next_index = done_ranges.pop(self.next_index)
+                if done and progress is not None:
+                    progress(self)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.ended = time.time()
+            self.elapsed += self.ended - self.started
+
+    def save(self, path: Path) -> None:
+        with self.lock:
+            data = {
+                "key": self.spec.key(),
+                "spec": self.spec.to_json(),
+                "next_index": self.next_index,
+                "elapsed": self.total_seconds(),
+                "hits": [hit._asdict() for hit in (item[2] for item in self.heap)],
+            }
+        tmp_path = path.with_suffix(".tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(path)
+
+    def load(self, path: Path) -> bool:
+        """断点是同一个搜索的话接着上次的进度, 返回是否续上了"""
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if not isinstance(data, dict) or data.get("key") != self.spec.key():
+            return False
+        with self.lock:
+            self.next_index = min(int(data.get("next_index") or 0), self.total)
+            self.elapsed = float(data.get("elapsed") or 0.0)
+            self.heap = []
+            self.seen = set()
+            hits = [
+                SearchHit(
+                    int(hit["score"]),
+                    int(hit["index"]),
+                    str(hit["name"]),
+                    [int(value) for value in hit["props"]],
+                    [(int(skill), int(freq)) for skill, freq in hit["skills"]],
+                )
+                for hit in data.get("hits") or []
+            ]
+            self._merge(hits)
+        return True
+
+    def describe(self) -> str:
+        percent = self.next_index / self.total * 100 if self.total else 100.0
+        return (
+            f"已搜 {self.next_index}/{self.total} ({percent:.1f}%), "
+            f"{self.rate:.0f} 个/s, 累计 {self.total_seconds():.0f}s"
+        )
+
+
+def parse_length(text: str) -> tuple[int, int]:
+    """"3" 或者 "1-4" """
+    low, _, high = text.partition("-")
+    min_length = int(low)
+    max_length = int(high) if high else min_length
+    if min_length < 1 or max_length < min_length:
+        raise ValueError(f"长度范围不对: {text}")
+    return min_length, max_length
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m sqrtools.search")
+    parser.add_argument("--team", default="", help="战队名, 不给就是名字本身")
+    parser.add_argument("--charset", default="", help="枚举用的字符集")
+    parser.add_argument("--length", default="1", help='名字长度 (不含前后缀), 例如 "1-4"')
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--suffix", default="")
+    parser.add_argument("--words", type=Path, help="词表文件, 一行一个, 给了就不按字符集枚举")
+    parser.add_argument("--word", action="append", default=[], help="直接给一个词, 可以给多个, 跟在词表后面")
+    parser.add_argument("--where", action="append", default=[], help='条件, 例如 "速>=60", 可以给多个')
+    parser.add_argument("--sort", default=TOTAL_FIELD, help="排序字段")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=0, help="这次最多搜多少个, 0 表示搜完")
+    parser.add_argument("--seconds", type=float, default=0.0, help="这次最多搜多少秒")
+    parser.add_argument("--checkpoint", type=Path, help="断点文件, 存在就接着搜")
+    parser.add_argument("--start-method", default="", help='进程启动方式 "fork" / "spawn" / "forkserver"')
+    args = parser.parse_args(argv)
+
+    words: tuple[str, ...] = ()
+    if args.words is not None:
+        words = tuple(
+            line.strip() for line in args.words.read_text(encoding="utf-8").splitlines() if line.strip()
+        )
+    words += tuple(word.strip() for word in args.word if word.strip())
+    min_length, max_length = parse_length(args.length)
+    if args.sort not in field_names():
+        parser.error(f"没有这个排序字段: {args.sort}")
+    spec = SearchSpec(
+        team=args.team,
+        charset="".join(dict.fromkeys(args.charset.replace("@", ""))),
+        min_length=min_length,
+        max_length=max_length,
+        prefix=args.prefix,
+        suffix=args.suffix,
+        words=words,
+        conditions=tuple(parse_condition(text) for text in args.where),
+        sort_by=args.sort,
+        top_k=args.top,
+    )
+    if not spec.words and not spec.charset:
+        parser.error("需要 --charset 或者 --words")
+
+    context = multiprocessing.get_context(args.start_method or None)
+    searcher = NameSearcher(spec, args.workers, mp_context=context)
+    if args.checkpoint is not None and searcher.load(args.checkpoint):
+        print(f"从断点继续: {searcher.next_index}/{searcher.total}")
+    last_report = [time.time()]
+
+    def report(current: NameSearcher) -> None:
+        if time.time() - last_report[0] >= 5.0:
+            last_report[0] = time.time()
+            print(current.describe(), file=sys.stderr)
+            if args.checkpoint is not None:
+                current.save(args.checkpoint)
+
+    try:
+        searcher.run(args.limit, args.seconds, progress=report)
+    except KeyboardInterrupt:
+        pass
+    if args.checkpoint is not None:
+        searcher.save(args.checkpoint)
+    print(searcher.describe())
+    for rank, hit in enumerate(searcher.hits(), 1):
+        print(f"{rank}. {hit.describe()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())